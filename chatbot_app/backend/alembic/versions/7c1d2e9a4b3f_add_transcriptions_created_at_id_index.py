@@ -0,0 +1,27 @@
+"""Add (created_at, id) index to transcriptions for keyset pagination
+
+Revision ID: 7c1d2e9a4b3f
+Revises: 01613eda6ed6
+Create Date: 2026-10-16 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c1d2e9a4b3f'
+down_revision: Union[str, Sequence[str], None] = '01613eda6ed6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_transcriptions_created_at_id', 'transcriptions', ['created_at', 'id'], unique=False, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_transcriptions_created_at_id', table_name='transcriptions', if_exists=True)
@@ -0,0 +1,72 @@
+"""Add transcript_segments with German/English full-text search
+
+Revision ID: 9e4b7a2c5d10
+Revises: 7c1d2e9a4b3f
+Create Date: 2026-10-16 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e4b7a2c5d10'
+down_revision: Union[str, Sequence[str], None] = '7c1d2e9a4b3f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'transcript_segments',
+        sa.Column('id', sa.BigInteger(), nullable=False),
+        sa.Column('transcription_id', sa.Integer(), nullable=False),
+        sa.Column('segment_index', sa.Integer(), nullable=False),
+        sa.Column('start_time', sa.Float(), nullable=True),
+        sa.Column('end_time', sa.Float(), nullable=True),
+        sa.Column('speaker', sa.String(), nullable=True),
+        sa.Column('text', sa.Text(), nullable=False),
+        sa.Column('tsv_de', postgresql.TSVECTOR(), sa.Computed("to_tsvector('german', text)", persisted=True), nullable=True),
+        sa.Column('tsv_en', postgresql.TSVECTOR(), sa.Computed("to_tsvector('english', text)", persisted=True), nullable=True),
+        sa.ForeignKeyConstraint(['transcription_id'], ['transcriptions.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        if_not_exists=True,
+    )
+    op.create_index('ux_transcript_segments_transcription_segment', 'transcript_segments', ['transcription_id', 'segment_index'], unique=True, if_not_exists=True)
+
+    # Backfill from the stored segment arrays (processed when present, raw otherwise)
+    # before building the GIN indexes, which is much faster than indexing row by row.
+    op.execute(
+        """
+        INSERT INTO transcript_segments (transcription_id, segment_index, start_time, end_time, speaker, text)
+        SELECT t.id, s.ord - 1,
+               CASE WHEN json_typeof(s.seg->'start') = 'number' THEN (s.seg->>'start')::float END,
+               CASE WHEN json_typeof(s.seg->'end') = 'number' THEN (s.seg->>'end')::float END,
+               s.seg->>'speaker',
+               coalesce(s.seg->>'text', '')
+        FROM transcriptions t
+        CROSS JOIN LATERAL json_array_elements(
+            CASE
+                WHEN json_typeof(t.processed_segments) = 'array' AND json_array_length(t.processed_segments) > 0 THEN t.processed_segments
+                WHEN json_typeof(t.raw_segments) = 'array' THEN t.raw_segments
+                ELSE '[]'::json
+            END
+        ) WITH ORDINALITY AS s(seg, ord)
+        WHERE json_typeof(s.seg) = 'object'
+        ON CONFLICT DO NOTHING
+        """
+    )
+    op.create_index('ix_transcript_segments_tsv_de', 'transcript_segments', ['tsv_de'], unique=False, postgresql_using='gin', if_not_exists=True)
+    op.create_index('ix_transcript_segments_tsv_en', 'transcript_segments', ['tsv_en'], unique=False, postgresql_using='gin', if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_transcript_segments_tsv_en', table_name='transcript_segments', if_exists=True)
+    op.drop_index('ix_transcript_segments_tsv_de', table_name='transcript_segments', if_exists=True)
+    op.drop_index('ux_transcript_segments_transcription_segment', table_name='transcript_segments', if_exists=True)
+    op.drop_table('transcript_segments', if_exists=True)
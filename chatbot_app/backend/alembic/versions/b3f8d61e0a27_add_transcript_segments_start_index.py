@@ -0,0 +1,27 @@
+"""Add (transcription_id, start_time) index to transcript_segments for time-window reads
+
+Revision ID: b3f8d61e0a27
+Revises: 9e4b7a2c5d10
+Create Date: 2026-10-16 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3f8d61e0a27'
+down_revision: Union[str, Sequence[str], None] = '9e4b7a2c5d10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_transcript_segments_transcription_start', 'transcript_segments', ['transcription_id', 'start_time'], unique=False, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_transcript_segments_transcription_start', table_name='transcript_segments', if_exists=True)
@@ -0,0 +1,41 @@
+"""Add revision numbers to transcriptions and transcript_segments for incremental delivery
+
+Revision ID: d41c7e95b2a8
+Revises: b3f8d61e0a27
+Create Date: 2026-10-16 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd41c7e95b2a8'
+down_revision: Union[str, Sequence[str], None] = 'b3f8d61e0a27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('transcriptions', sa.Column('revision', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('transcript_segments', sa.Column('processed', sa.Boolean(), server_default='false', nullable=False))
+    op.add_column('transcript_segments', sa.Column('revision', sa.Integer(), server_default='0', nullable=False))
+    # Existing rows were written from the processed arrays whenever those existed.
+    op.execute(
+        """
+        UPDATE transcript_segments s SET processed = true
+        FROM transcriptions t
+        WHERE t.id = s.transcription_id
+          AND json_typeof(t.processed_segments) = 'array' AND json_array_length(t.processed_segments) > 0
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('transcript_segments', 'revision')
+    op.drop_column('transcript_segments', 'processed')
+    op.drop_column('transcriptions', 'revision')
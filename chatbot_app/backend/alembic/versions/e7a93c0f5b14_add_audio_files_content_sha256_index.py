@@ -0,0 +1,40 @@
+"""Add expression index on media_pipeline.audio_files (metadata->>'content_sha256')
+
+Revision ID: e7a93c0f5b14
+Revises: d41c7e95b2a8
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7a93c0f5b14'
+down_revision: Union[str, Sequence[str], None] = 'd41c7e95b2a8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # The media_pipeline schema is set up outside these migrations (media_pipeline_psql_setup.md),
+    # so only index it where it exists.
+    op.execute(
+        """
+        DO $$
+        BEGIN
+            IF to_regclass('media_pipeline.audio_files') IS NOT NULL THEN
+                CREATE INDEX IF NOT EXISTS ix_audio_files_content_sha256
+                    ON media_pipeline.audio_files ((metadata->>'content_sha256'));
+            END IF;
+        END
+        $$;
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP INDEX IF EXISTS media_pipeline.ix_audio_files_content_sha256")
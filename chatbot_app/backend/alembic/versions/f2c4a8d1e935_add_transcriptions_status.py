@@ -0,0 +1,35 @@
+"""Add a status column to transcriptions so unfinished runs stay out of the history list
+
+Revision ID: f2c4a8d1e935
+Revises: e7a93c0f5b14
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2c4a8d1e935'
+down_revision: Union[str, Sequence[str], None] = 'e7a93c0f5b14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('transcriptions', sa.Column('status', sa.String(), server_default='completed', nullable=False))
+    # Rows the pipeline created up front and never finished: no stored audio and no processed transcript.
+    op.execute(
+        """
+        UPDATE transcriptions SET status = 'failed'
+        WHERE audio_file_path = '' AND processed_segments IS NULL
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('transcriptions', 'status')
@@ -22,12 +22,129 @@ class Settings:
     # --- LLM Models ---
     MAIN_LLM_MODEL: str = os.getenv("MAIN_LLM_MODEL", "gpt-4o")
     EMBEDDING_MODEL: str = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+    # Embedding cache (memory LRU + SQLite file) and request micro-batching.
+    EMBEDDING_CACHE_SIZE: int = int(os.getenv("EMBEDDING_CACHE_SIZE", "10000"))
+    # Defaults to "<CHROMA_DB_PATH>/embedding_cache.sqlite3".
+    EMBEDDING_CACHE_PATH: str = os.getenv("EMBEDDING_CACHE_PATH", "")
+    EMBEDDING_MAX_BATCH: int = int(os.getenv("EMBEDDING_MAX_BATCH", "64"))
+    EMBEDDING_BATCH_WINDOW_MS: float = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "5"))
+    EMBEDDING_MAX_CONCURRENT_BATCHES: int = int(os.getenv("EMBEDDING_MAX_CONCURRENT_BATCHES", "4"))
     TRANSCRIPTION_MODEL: str = os.getenv("TRANSCRIPTION_MODEL", "whisper-1")
 
+    # --- Chunked Transcription ---
+    # "auto" chunks files that exceed the size limit or TRANSCRIPTION_CHUNK_SECONDS,
+    # "always" chunks every file, "off" sends the whole file in one request.
+    TRANSCRIPTION_CHUNKING: str = os.getenv("TRANSCRIPTION_CHUNKING", "auto").strip().lower()
+    TRANSCRIPTION_CHUNK_SECONDS: int = int(os.getenv("TRANSCRIPTION_CHUNK_SECONDS", "600"))
+    TRANSCRIPTION_CHUNK_OVERLAP_SECONDS: float = float(os.getenv("TRANSCRIPTION_CHUNK_OVERLAP_SECONDS", "1.5"))
+    TRANSCRIPTION_CHUNK_WORKERS: int = int(os.getenv("TRANSCRIPTION_CHUNK_WORKERS", "4"))
+
+    # --- Audio Transcoding ---
+    # "opus" converts recordings to mono 16 kHz Opus/OGG before they are uploaded
+    # and transcribed (the original is kept when ffmpeg fails); "off" uses them as-is.
+    AUDIO_TRANSCODE: str = os.getenv("AUDIO_TRANSCODE", "off").strip().lower()
+    AUDIO_TRANSCODE_BITRATE_KBPS: int = int(os.getenv("AUDIO_TRANSCODE_BITRATE_KBPS", "24"))
+    FFMPEG_BINARY: str = os.getenv("FFMPEG_BINARY", "ffmpeg")
+
+    # --- Windowed Post-Processing ---
+    # "auto" splits transcripts larger than POST_PROCESS_WINDOW_TOKENS into
+    # overlapping windows processed concurrently, "always" windows every
+    # transcript, "off" sends the whole transcript in one LLM request.
+    POST_PROCESS_WINDOWING: str = os.getenv("POST_PROCESS_WINDOWING", "auto").strip().lower()
+    POST_PROCESS_WINDOW_TOKENS: int = int(os.getenv("POST_PROCESS_WINDOW_TOKENS", "2500"))
+    POST_PROCESS_WINDOW_OVERLAP_SEGMENTS: int = int(os.getenv("POST_PROCESS_WINDOW_OVERLAP_SEGMENTS", "4"))
+    POST_PROCESS_WINDOW_WORKERS: int = int(os.getenv("POST_PROCESS_WINDOW_WORKERS", "4"))
+
+    # --- Pipeline Admission ---
+    # Transcription pipelines allowed in each stage at once per worker; tasks
+    # beyond a limit wait in FIFO order and report their queue position through
+    # /tasks/{id}. 0 removes the limit.
+    PIPELINE_UPLOAD_CONCURRENCY: int = int(os.getenv("PIPELINE_UPLOAD_CONCURRENCY", "4"))
+    PIPELINE_TRANSCRIPTION_CONCURRENCY: int = int(os.getenv("PIPELINE_TRANSCRIPTION_CONCURRENCY", "4"))
+    PIPELINE_POST_PROCESS_CONCURRENCY: int = int(os.getenv("PIPELINE_POST_PROCESS_CONCURRENCY", "4"))
+
+    # --- Uploads ---
+    MAX_UPLOAD_MB: int = int(os.getenv("MAX_UPLOAD_MB", "500"))
+    UPLOAD_CHUNK_SIZE_KB: int = int(os.getenv("UPLOAD_CHUNK_SIZE_KB", "1024"))
+    DOWNLOAD_TIMEOUT_SECONDS: float = float(os.getenv("DOWNLOAD_TIMEOUT_SECONDS", "300"))
+
+    # --- Audio Serving ---
+    # "presign" answers /audio/{id} for cloud files with a pre-signed URL the player
+    # fetches directly; "proxy" streams them (with Range support) through a local disk cache.
+    AUDIO_SERVING: str = os.getenv("AUDIO_SERVING", "presign").strip().lower()
+    AUDIO_CACHE_DIR: str = os.getenv("AUDIO_CACHE_DIR", "output/audio_cache")
+    AUDIO_CACHE_MAX_MB: int = int(os.getenv("AUDIO_CACHE_MAX_MB", "2048"))
+    # How long a storage health check and a pre-signed URL are reused.
+    STORAGE_HEALTH_TTL_SECONDS: int = int(os.getenv("STORAGE_HEALTH_TTL_SECONDS", "60"))
+    PRESIGNED_URL_EXPIRATION_SECONDS: int = int(os.getenv("PRESIGNED_URL_EXPIRATION_SECONDS", "3600"))
+
+    # --- Task Store ---
+    # "memory" keeps task state in-process; "postgres" persists it in the task_queue
+    # table so any worker can serve /tasks/{id} and resume tasks from a dead worker.
+    TASK_STORE: str = os.getenv("TASK_STORE", "memory").strip().lower()
+    TASK_TTL_SECONDS: int = int(os.getenv("TASK_TTL_SECONDS", str(24 * 3600)))
+    TASK_LEASE_SECONDS: int = int(os.getenv("TASK_LEASE_SECONDS", "60"))
+    TASK_MAX_ATTEMPTS: int = int(os.getenv("TASK_MAX_ATTEMPTS", "2"))
+    TASK_FLUSH_INTERVAL_SECONDS: float = float(os.getenv("TASK_FLUSH_INTERVAL_SECONDS", "0.25"))
+    TASK_EVENTS_POLL_SECONDS: float = float(os.getenv("TASK_EVENTS_POLL_SECONDS", "1.0"))
+
+    # --- Semantic Cache (chat) ---
+    SEMANTIC_CACHE_ENABLED: bool = os.getenv("SEMANTIC_CACHE_ENABLED", "true").strip().lower() in ("1", "true", "yes")
+    # Minimum cosine similarity for replaying a cached answer to a new question.
+    SEMANTIC_CACHE_THRESHOLD: float = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+    SEMANTIC_CACHE_MAX_ENTRIES: int = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "1000"))
+    SEMANTIC_CACHE_TTL_SECONDS: int = int(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", "3600"))
+
+    # --- Chat Pipeline ---
+    # Search for the raw query while the history is fetched and the query planned;
+    # the results are used when the planned search text is similar enough.
+    SPECULATIVE_RETRIEVAL: bool = os.getenv("SPECULATIVE_RETRIEVAL", "true").strip().lower() in ("1", "true", "yes")
+    SPECULATIVE_MIN_SIMILARITY: float = float(os.getenv("SPECULATIVE_MIN_SIMILARITY", "0.9"))
+    # Unfiltered candidates fetched speculatively; the plan's filters are applied to them afterwards.
+    SPECULATIVE_CANDIDATES: int = int(os.getenv("SPECULATIVE_CANDIDATES", "20"))
+    # Append one JSON line of stage timings per chat request here (empty disables).
+    CHAT_TRACE_PATH: str = os.getenv("CHAT_TRACE_PATH", "")
+
+    # --- Chat History ---
+    # Prompt tokens of conversation history per turn; older turns are folded into a summary.
+    CHAT_HISTORY_TOKEN_BUDGET: int = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "2000"))
+    CHAT_HISTORY_SUMMARY_TOKENS: int = int(os.getenv("CHAT_HISTORY_SUMMARY_TOKENS", "300"))
+    # Tokens of turns outside the budget that trigger a summary update.
+    CHAT_HISTORY_SUMMARIZE_AFTER_TOKENS: int = int(os.getenv("CHAT_HISTORY_SUMMARIZE_AFTER_TOKENS", "500"))
+    CHAT_HISTORY_CACHE_SESSIONS: int = int(os.getenv("CHAT_HISTORY_CACHE_SESSIONS", "1000"))
+    CHAT_HISTORY_CACHE_TTL_SECONDS: int = int(os.getenv("CHAT_HISTORY_CACHE_TTL_SECONDS", "600"))
+
     # --- ChromaDB ---
     CHROMA_DB_PATH: str = os.getenv("CHROMA_DB_PATH", "output/chroma_db")
     CHROMA_COLLECTION_NAME: str = os.getenv("CHROMA_COLLECTION_NAME", "journeys_prod")
+    # Size of the thread pool that runs blocking Chroma queries for async handlers.
+    VECTOR_DB_WORKERS: int = int(os.getenv("VECTOR_DB_WORKERS", "8"))
+    # How long the cached id index and document count are trusted before they are
+    # reloaded; picks up writes made by other processes (e.g. the offline ingest script).
+    VECTOR_DB_INDEX_TTL_SECONDS: int = int(os.getenv("VECTOR_DB_INDEX_TTL_SECONDS", "600"))
+    # "hybrid" fuses BM25 and vector ranks (RRF); "vector" is dense similarity only.
+    SEARCH_MODE: str = os.getenv("SEARCH_MODE", "hybrid").strip().lower()
+    # Candidates taken from each ranking before fusion.
+    HYBRID_CANDIDATES: int = int(os.getenv("HYBRID_CANDIDATES", "50"))
+    # Defaults to "<CHROMA_DB_PATH>/<collection>.bm25.sqlite3".
+    LEXICAL_INDEX_PATH: str = os.getenv("LEXICAL_INDEX_PATH", "")
+    # "chroma" or "local" (memory-mapped numpy store, see app/services/vector_store.py).
+    VECTOR_STORE_BACKEND: str = os.getenv("VECTOR_STORE_BACKEND", "chroma").strip().lower()
+    # Defaults to "<CHROMA_DB_PATH>/<collection>.local".
+    LOCAL_VECTOR_STORE_PATH: str = os.getenv("LOCAL_VECTOR_STORE_PATH", "")
+    # Local stores with at least this many records are IVF-partitioned (0 disables).
+    LOCAL_VECTOR_IVF_MIN_ROWS: int = int(os.getenv("LOCAL_VECTOR_IVF_MIN_ROWS", "100000"))
+    LOCAL_VECTOR_IVF_NPROBE: int = int(os.getenv("LOCAL_VECTOR_IVF_NPROBE", "8"))
+    # Appended segments are merged into the first once they hold this share of its rows,
+    # or into each other once there are more than LOCAL_VECTOR_MAX_SEGMENTS of them.
+    LOCAL_VECTOR_COMPACT_RATIO: float = float(os.getenv("LOCAL_VECTOR_COMPACT_RATIO", "0.25"))
+    LOCAL_VECTOR_MAX_SEGMENTS: int = int(os.getenv("LOCAL_VECTOR_MAX_SEGMENTS", "8"))
     
+    # --- Ingestion ---
+    # Records per upsert when streaming NDJSON into /ingest/stream.
+    INGEST_CHUNK_SIZE: int = int(os.getenv("INGEST_CHUNK_SIZE", "500"))
+    INGEST_MAX_LINE_MB: int = int(os.getenv("INGEST_MAX_LINE_MB", "16"))
+
     # --- Data Paths ---
     EMBEDDINGS_CSV_PATH: str = os.getenv("EMBEDDINGS_CSV_PATH", "output/journeys_with_embeddings.csv")
 
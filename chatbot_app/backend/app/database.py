@@ -1,7 +1,7 @@
 import os
 from urllib.parse import urlparse, parse_qsl, urlencode
-from sqlalchemy import Column, Integer, String, Text, DateTime
-from sqlalchemy.dialects.postgresql import JSON
+from sqlalchemy import Column, Integer, BigInteger, Boolean, Float, String, Text, DateTime, ForeignKey, Index, Computed
+from sqlalchemy.dialects.postgresql import JSON, TSVECTOR
 from sqlalchemy import create_engine
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase, sessionmaker
@@ -67,6 +67,53 @@ class Transcription(Base):
     processed_segments = Column(JSON, nullable=True)
     raw_segments = Column(JSON, nullable=True)
     audio_file_path = Column(String, nullable=False, server_default="")
+    # Bumped on every write to its transcript_segments rows, so clients can fetch deltas.
+    revision = Column(Integer, nullable=False, server_default="0", default=0)
+    # "processing" while the pipeline fills the row in, then "completed" or "failed".
+    status = Column(String, nullable=False, server_default="completed", default="completed")
+
+    # Keyset pagination of the history list walks (created_at, id) newest first.
+    __table_args__ = (Index("ix_transcriptions_created_at_id", "created_at", "id"),)
+
+class TranscriptSegment(Base):
+    """
+    One timestamped segment of a transcription, full-text indexed in German
+    and English. While the pipeline runs, raw segments appear as chunks are
+    transcribed and are replaced by processed ones as those become ready;
+    ``revision`` is the transcription revision that last wrote the row.
+    """
+    __tablename__ = "transcript_segments"
+
+    id = Column(BigInteger, primary_key=True)
+    transcription_id = Column(Integer, ForeignKey("transcriptions.id", ondelete="CASCADE"), nullable=False)
+    segment_index = Column(Integer, nullable=False)
+    start_time = Column(Float, nullable=True)
+    end_time = Column(Float, nullable=True)
+    speaker = Column(String, nullable=True)
+    text = Column(Text, nullable=False, default="")
+    processed = Column(Boolean, nullable=False, server_default="false", default=False)
+    revision = Column(Integer, nullable=False, server_default="0", default=0)
+    tsv_de = Column(TSVECTOR, Computed("to_tsvector('german', text)", persisted=True))
+    tsv_en = Column(TSVECTOR, Computed("to_tsvector('english', text)", persisted=True))
+
+    __table_args__ = (
+        Index("ux_transcript_segments_transcription_segment", "transcription_id", "segment_index", unique=True),
+        # Time-window reads for player-synced views.
+        Index("ix_transcript_segments_transcription_start", "transcription_id", "start_time"),
+        Index("ix_transcript_segments_tsv_de", "tsv_de", postgresql_using="gin"),
+        Index("ix_transcript_segments_tsv_en", "tsv_en", postgresql_using="gin"),
+    )
+
+class TranscriptionCacheEntry(Base):
+    """Maps (audio sha256, pipeline config digest) to the transcription it produced."""
+    __tablename__ = "transcription_cache"
+
+    content_sha256 = Column(String(64), primary_key=True)
+    config_key = Column(String(64), primary_key=True)
+    transcription_id = Column(Integer, ForeignKey("transcriptions.id", ondelete="CASCADE"), nullable=False, index=True)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    hit_count = Column(Integer, nullable=False, default=0, server_default="0")
+    last_hit_at = Column(DateTime, nullable=True)
 
 class ChatLog(Base):
     __tablename__ = "chat_logs"
@@ -77,6 +124,33 @@ class ChatLog(Base):
     role = Column(String) # "user" or "assistant"
     content = Column(Text)
 
+class ChatSummary(Base):
+    """Rolling summary of a chat session's turns up to ``covered_until_id``."""
+    __tablename__ = "chat_summaries"
+
+    session_id = Column(String, primary_key=True)
+    summary = Column(Text, nullable=False, default="")
+    covered_until_id = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+class TaskRecord(Base):
+    __tablename__ = "task_queue"
+
+    id = Column(String, primary_key=True)
+    kind = Column(String, nullable=True, index=True)
+    status = Column(String, nullable=False, index=True)
+    progress = Column(Integer, nullable=False, default=0)
+    message = Column(Text)
+    result = Column(JSON, nullable=True)
+    estimated_time = Column(Integer, nullable=True)
+    payload = Column(JSON, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=1)
+    lease_owner = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True, index=True)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, index=True)
+
 # --- Utility to create tables ---
 
 async def create_db_and_tables():
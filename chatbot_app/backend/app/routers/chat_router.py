@@ -8,6 +8,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import func, desc, select, delete
 
 from app import database
+from app.services.session_history import session_history
 
 # --- Logging Setup ---
 logger = logging.getLogger(__name__)
@@ -90,6 +91,7 @@ async def delete_chat_session(session_id: str, db: AsyncSession = Depends(get_db
         # Delete all logs for the session
         stmt = delete(database.ChatLog).where(database.ChatLog.session_id == session_id)
         await db.execute(stmt)
+        await session_history.reset(db, session_id)
         await db.commit()
         return
     except Exception as e:
@@ -130,7 +132,9 @@ async def delete_chat_message(message_id: int, db: AsyncSession = Depends(get_db
                 database.ChatLog.id >= message_id
             )
             await db.execute(stmt)
-        
+
+        # The cached turns and the summary may include the deleted messages.
+        await session_history.reset(db, session_id)
         await db.commit()
         return
     except Exception as e:
@@ -568,7 +568,7 @@ async def start_transcribe_only(
 
 @router.get("/fusion/{task_id}/artifacts")
 async def list_artifacts(task_id: str):
-    status = task_manager.get_task_status(task_id)
+    status = await task_manager.get_task_status_async(task_id)
     if not status or status.get("status") != "SUCCESS":
         raise HTTPException(status_code=404, detail="Task not successful or not found")
     result = status.get("result") or {}
@@ -582,7 +582,7 @@ async def download_artifact(task_id: str, name: str = Query(..., description="Ar
     if os.path.sep in name or os.path.altsep and os.path.altsep in name:
         raise HTTPException(status_code=400, detail="Invalid filename")
 
-    status = task_manager.get_task_status(task_id)
+    status = await task_manager.get_task_status_async(task_id)
     if not status or status.get("status") != "SUCCESS":
         raise HTTPException(status_code=404, detail="Task not successful or not found")
     result = status.get("result") or {}
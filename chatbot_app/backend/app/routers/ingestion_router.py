@@ -1,9 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Security
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status, Security
+from fastapi.responses import JSONResponse
 from fastapi.security.api_key import APIKeyHeader
-from typing import List, Dict, Any
-from app.services.ingestion import ingestion_service
+from typing import List, Dict, Any, Optional
+from app.services import task_manager
+from app.services.task_store import TERMINAL_STATUSES
+from app.services.ingestion import ingestion_service, IngestionStreamInterrupted
 from app.config import settings
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 api_key_header = APIKeyHeader(name="X-API-Key", auto_error=True)
@@ -42,4 +48,68 @@ async def ingest_documents(documents: List[Dict[str, Any]]):
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"An unexpected error occurred during ingestion: {e}"
-        )
\ No newline at end of file
+        )
+
+@router.post(
+    "/ingest/stream",
+    summary="Stream NDJSON documents into the knowledge base",
+    dependencies=[Depends(get_api_key)]
+)
+async def ingest_stream(
+    request: Request,
+    job_id: Optional[str] = Query(None, description="Names the load; reuse it to resume after an interruption."),
+    chunk_size: int = Query(settings.INGEST_CHUNK_SIZE, ge=1, le=10000),
+    resume: bool = Query(True, description="Skip the lines an earlier run of `job_id` already committed."),
+):
+    """
+    Ingests a newline-delimited JSON body (`application/x-ndjson`) while it is
+    uploaded. Each line is one document in the format of `POST /`, and
+    `metadata.id` is required: documents are upserted by id in chunks of
+    `chunk_size`, so repeating lines never creates duplicates.
+
+    Progress is published as task `job_id` (`/tasks/{job_id}` and
+    `/tasks/{job_id}/events`), with the running report as its result. The
+    response is the final report: line and document counts, `committed_lines`
+    and per-line / per-chunk `errors`. If the upload breaks off, send the
+    whole file again with the same `job_id`; the first `committed_lines`
+    lines are skipped. Only an interrupted run (or one whose worker died
+    mid-load) is resumed; reusing the `job_id` of a finished load starts
+    over, and a load still running in this worker is answered with 409.
+    """
+    start_line = 0
+    if job_id:
+        local = task_manager.get_task_status(job_id)
+        if local is not None and local.get("status") not in TERMINAL_STATUSES:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Ingestion job {job_id} is still running.")
+        previous = await task_manager.get_task_status_async(job_id) if resume else None
+        if previous is not None and previous.get("status") != "SUCCESS":
+            start_line = int((previous.get("result") or {}).get("committed_lines") or 0)
+    job_id = task_manager.create_task(kind="ingest", task_id=job_id)
+    task_manager.update_task_status(
+        job_id, "PROCESSING", f"Ingesting (resuming after line {start_line})." if start_line else "Ingesting.",
+        result={"committed_lines": start_line},
+    )
+
+    def on_progress(report: Dict[str, Any]):
+        task_manager.update_task_status(
+            job_id, "PROCESSING",
+            f"{report['upserted']} documents upserted, {report['failed']} failed, through line {report['committed_lines']}.",
+            result=dict(report),
+        )
+
+    try:
+        report = await ingestion_service.ingest_stream(
+            request.stream(), chunk_size=chunk_size, start_line=start_line, on_progress=on_progress
+        )
+    except IngestionStreamInterrupted as e:
+        logger.warning(f"Ingestion job {job_id} interrupted: {e}")
+        task_manager.update_task_status(job_id, "ERROR", str(e), result=dict(e.report))
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={"job_id": job_id, "status": "interrupted", "detail": str(e), **e.report},
+        )
+    task_manager.update_task_status(
+        job_id, "SUCCESS", f"Ingested {report['upserted']} documents ({report['failed']} failed).",
+        result=dict(report), progress=100,
+    )
+    return {"job_id": job_id, "status": "success" if not report["failed"] else "partial", **report}
@@ -3,14 +3,17 @@ from fastapi.security.api_key import APIKeyHeader
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 from typing import Optional
-import hashlib, json, os, uuid
-import urllib.request
+import hashlib, json, logging, os, uuid
 import urllib.parse
 
 from app import database
 from app.config import settings
+from app.services import uploads, transcription_cache
+from app.services.transcription import pipeline_config_key
 from app.services.storage import get_storage_service
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 api_key_header = APIKeyHeader(name="X-API-Key", auto_error=True)
@@ -160,9 +163,10 @@ async def enqueue_transcription(
             tx2 = r_tx2.first()
             if tx2 and str(tx2[0]) == "completed":
                 return {"audio_file_id": int(af2[0]), "status": "completed", "transcript": tx2[1], "metadata": tx2[2]}
-    except Exception:
+    except Exception as e:
         # If any short-circuit lookup fails, continue with upload path
-        pass
+        logger.warning(f"Existing-transcription lookup failed, enqueueing anyway: {e}")
+        await db.rollback()
 
     # Upload to B2 from the source URL
     storage = get_storage_service()
@@ -170,11 +174,40 @@ async def enqueue_transcription(
     object_key = f"{base_prefix}/{safe_phone}/{uuid.uuid4().hex}{ext}"
     tmp_path = f"/tmp/{uuid.uuid4().hex}{ext}"
     try:
-        with urllib.request.urlopen(source_url) as resp, open(tmp_path, "wb") as out:
-            out.write(resp.read())
+        spooled = await uploads.download_to_file(source_url, tmp_path)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to download url: {e}")
-    ok = storage.upload_file(tmp_path, object_key)
+
+    # --- Short-circuit by content: the same audio may already be transcribed under another id/URL,
+    # but only reuse a transcript made with the same pipeline configuration and request prompt.
+    cfg_key = transcription_cache.config_key({"pipeline": pipeline_config_key(), "prompt": prompt or ""})
+    try:
+        q_af3 = text(
+            """
+            SELECT af.id, tx.status, tx.transcript_text, tx.metadata
+            FROM media_pipeline.audio_files af
+            JOIN media_pipeline.transcriptions tx ON tx.audio_file_id = af.id
+            WHERE af.metadata->>'content_sha256' = :h
+              AND af.metadata->>'pipeline_config_key' = :cfg
+              AND tx.status = 'completed'
+            ORDER BY tx.id DESC
+            LIMIT 1
+            """
+        )
+        tx3 = (await db.execute(q_af3, {"h": spooled.sha256, "cfg": cfg_key})).first()
+        transcription_cache.record_lookup(hit=tx3 is not None)
+        if tx3 is not None:
+            try:
+                os.remove(tmp_path)
+            except Exception:
+                pass
+            return {"audio_file_id": int(tx3[0]), "status": "completed", "transcript": tx3[2], "metadata": tx3[3]}
+    except Exception as e:
+        # A failed statement aborts the transaction; roll back so the upsert below can run.
+        logger.warning(f"Content-hash lookup failed, uploading anyway: {e}")
+        await db.rollback()
+
+    ok = await storage.upload_file_async(tmp_path, object_key)
     try:
         os.remove(tmp_path)
     except Exception:
@@ -185,7 +218,7 @@ async def enqueue_transcription(
     b2_url = f"b2://{object_key}"
 
     url_sha1 = hashlib.sha1((source_url or uuid.uuid4().hex).encode("utf-8")).hexdigest()
-    metadata_obj = {}
+    metadata_obj = {"content_sha256": spooled.sha256, "pipeline_config_key": cfg_key}
     if prompt:
         metadata_obj["prompt"] = prompt
     metadata_json = json.dumps(metadata_obj) if metadata_obj else None
@@ -212,7 +245,7 @@ async def enqueue_transcription(
             b2_object_key = EXCLUDED.b2_object_key,
             phone = COALESCE(EXCLUDED.phone, media_pipeline.audio_files.phone),
             campaign_name = COALESCE(EXCLUDED.campaign_name, media_pipeline.audio_files.campaign_name),
-            metadata = COALESCE(EXCLUDED.metadata, media_pipeline.audio_files.metadata)
+            metadata = COALESCE(media_pipeline.audio_files.metadata, '{}'::jsonb) || COALESCE(EXCLUDED.metadata, '{}'::jsonb)
         RETURNING id
         """
     )
@@ -231,7 +264,7 @@ async def enqueue_transcription(
             "url": source_url,
             "url_sha1": url_sha1,
             "b2_key": b2_key,
-            "size_bytes": None,
+            "size_bytes": spooled.size_bytes,
             "started": row.started if hasattr(row, 'started') else None,
             "stopped": row.stopped if hasattr(row, 'stopped') else None,
             "source_table": "public.recordings",
@@ -1,7 +1,8 @@
+import asyncio
 import logging
 import time
 from fastapi import APIRouter, HTTPException, Request, File, UploadFile, Form, Depends, Query, BackgroundTasks
-from fastapi.responses import StreamingResponse, JSONResponse
+from fastapi.responses import StreamingResponse, JSONResponse, PlainTextResponse
 from pydantic import BaseModel, Field, ConfigDict
 from typing import Optional, Dict, Any, AsyncGenerator, List, Literal, cast
 from app.services import vector_db, prompt_engine, llm_handler, transcription, task_manager
@@ -10,9 +11,16 @@ import os
 import shutil
 from app.services.query_agent import QueryAgent
 from app.services.status_manager import status_manager
+from app.services.semantic_cache import semantic_cache, replay_chunks
+from app.services.embedding_service import embedding_service
+from app.services.stage_timer import StageTimer
+from app.services.chat_metrics import chat_metrics
+from app.services.session_history import session_history
+from app.services.vector_store import matches_where
+from app.config import settings
+import numpy as np
 import json
 import uuid
-from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from app import database
 import datetime
@@ -83,51 +91,155 @@ class ChatLogInfo(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 # --- Helper for Streaming ---
+def _build_where_filter(deconstructed_query) -> Optional[Dict[str, Any]]:
+    """Turns the extracted filters into a Chroma ``where`` clause (None when there are none)."""
+    filters = [{f.field: {f.operator: f.value}} for f in deconstructed_query.extracted_filters]
+    if not filters:
+        return None
+    return {"$and": filters} if len(filters) > 1 else filters[0]
+
+async def _speculative_results(speculative_search: "asyncio.Task", query: str, deconstructed_query) -> Optional[Dict[str, Any]]:
+    """
+    Returns the raw-query search started before planning if the plan would have
+    searched for (nearly) the same thing, trimmed to the plan's filters and
+    ``n_results``; None if it has to be discarded.
+    """
+    n_results = deconstructed_query.n_results
+    if n_results > settings.SPECULATIVE_CANDIDATES:
+        return None
+    search_text = deconstructed_query.hypothetical_document or deconstructed_query.semantic_query
+    if search_text.strip() != query.strip():
+        # Both embeddings are needed anyway: the raw query's by the speculative search, the other by a fresh one.
+        query_vec, search_vec = await embedding_service.embed_async([query, search_text])
+        similarity = float(np.dot(query_vec, search_vec) / (np.linalg.norm(query_vec) * np.linalg.norm(search_vec) or 1.0))
+        if similarity < settings.SPECULATIVE_MIN_SIMILARITY:
+            logger.info(f"Discarding speculative search (similarity {similarity:.3f} to the planned search text).")
+            return None
+    try:
+        results = await speculative_search
+    except Exception as e:
+        logger.warning(f"Speculative search failed, searching again: {e}")
+        return None
+    if not (results and results.get('ids') and results['ids'][0]):
+        return None
+    rows = list(zip(results['ids'][0], results['documents'][0], results['metadatas'][0], results['distances'][0]))
+    where_filter = _build_where_filter(deconstructed_query)
+    if where_filter:
+        rows = [row for row in rows if matches_where(row[2], where_filter)]
+    # n matches within the unfiltered top candidates are exactly the filtered top n.
+    if len(rows) < n_results:
+        return None
+    rows = rows[:n_results]
+    return {
+        'ids': [[r[0] for r in rows]], 'documents': [[r[1] for r in rows]],
+        'metadatas': [[r[2] for r in rows]], 'distances': [[r[3] for r in rows]],
+    }
+
 async def stream_generator(query: str, db: AsyncSession, session_id: str) -> AsyncGenerator[str, None]:
     """
     A generator that yields Server-Sent Events for the RAG pipeline,
     routing based on the user's detected intent and saving the conversation.
-    It fetches the last 10 messages to provide conversational context.
+    The conversational context comes from ``session_history``: the newest turns
+    within CHAT_HISTORY_TOKEN_BUDGET plus a summary of the earlier ones.
+
+    With SPECULATIVE_RETRIEVAL, a search for the raw query runs concurrently
+    with the history fetch and planning, and is used when the planned search
+    is close enough (see ``_speculative_results``). Per-stage timings, token
+    counts and retrieval sizes go to ``chat_metrics`` and are sent with
+    ``stream_end``.
     """
     full_response = ""
+    timer = StageTimer()
+    usage: Dict[str, int] = {}
+    speculative_search: Optional[asyncio.Task] = None
     try:
+        if settings.SPECULATIVE_RETRIEVAL:
+            speculative_search = asyncio.create_task(timer.run(
+                "speculative_search",
+                vector_db.search_journeys_async(query_text=query, n_results=settings.SPECULATIVE_CANDIDATES),
+            ))
+            # Discarded results are never awaited; retrieve failures so they are not reported as unhandled.
+            speculative_search.add_done_callback(lambda task: task.cancelled() or task.exception())
+
         # 1. Fetch conversation history for context
-        stmt = select(database.ChatLog).filter(database.ChatLog.session_id == session_id).order_by(database.ChatLog.id.desc()).limit(10)
-        result = await db.execute(stmt)
-        db_history_messages = list(result.scalars().all())
-        db_history_messages.reverse() # Order from oldest to newest
-        history = [ChatMessage.model_validate(msg) for msg in db_history_messages]
-        history_dicts = [msg.model_dump() for msg in history]
+        with timer.stage("history"):
+            history_dicts = await session_history.get_messages(db, session_id)
 
         # 2. Deconstruct Query to determine intent
         logger.info("STREAM: Yielding status_update: understanding")
         yield f"event: status_update\ndata: {json.dumps({'status': status_manager.get_message('understanding')})}\n\n"
-        deconstructed_query = query_agent.deconstruct_query(query, history=history_dicts)
+        cache_generation = semantic_cache.generation
+
+        # Answers are only replayed for opening questions; later turns depend on the conversation.
+        query_embedding = None
+        if semantic_cache.enabled and len(history_dicts) <= 1:
+            with timer.stage("answer_cache"):
+                query_embedding = await semantic_cache.embed_async(query)
+                cached_answer = semantic_cache.lookup_answer(query_embedding)
+            if cached_answer is not None:
+                logger.info(f"Semantic cache hit (similarity {cached_answer.similarity:.3f}); replaying answer.")
+                timer.info["intent"] = "cached_answer"
+                yield f"event: sources\ndata: {json.dumps({'sources': cached_answer.sources})}\n\n"
+                yield f"event: status_update\ndata: {json.dumps({'status': status_manager.get_message('synthesizing')})}\n\n"
+                for token in replay_chunks(cached_answer.answer):
+                    timer.mark("first_token")
+                    full_response += token
+                    yield f"event: llm_response_chunk\ndata: {json.dumps({'token': token})}\n\n"
+                return
+
+        with timer.stage("planning"):
+            cached_plan = semantic_cache.get_plan(query, history_dicts)
+            if cached_plan is not None:
+                deconstructed_query = cached_plan.plan
+            else:
+                deconstructed_query = await query_agent.deconstruct_query_async(query, history=history_dicts)
+                semantic_cache.put_plan(query, history_dicts, deconstructed_query, cache_generation)
         logger.info(f"Deconstructed query: '{deconstructed_query.semantic_query}' with intent: {deconstructed_query.intent}")
+        timer.info["intent"] = deconstructed_query.intent
+        if speculative_search is not None and deconstructed_query.intent != "question":
+            speculative_search.cancel()
 
         # 2. Route based on intent
         if deconstructed_query.intent == "question":
-            if vector_db.get_collection_count() == 0:
+            if await vector_db.get_collection_count_async() == 0:
                 logger.warning("Attempted to search an empty vector database.")
+                timer.info["error"] = "empty_knowledge_base"
                 yield f"event: error\ndata: {json.dumps({'message': 'The knowledge base is empty. Please transcribe audio files to enable search.'})}\n\n"
                 return
 
             if deconstructed_query.hypothetical_document:
+                timer.info["hyde"] = True
                 logger.info("STREAM: Yielding status_update: hyde")
                 yield f"event: status_update\ndata: {json.dumps({'status': status_manager.get_message('hyde')})}\n\n"
                 logger.info(f"HyDE document generated: {deconstructed_query.hypothetical_document}")
 
             logger.info("STREAM: Yielding status_update: searching")
             yield f"event: status_update\ndata: {json.dumps({'status': status_manager.get_message('searching')})}\n\n"
-            search_text = deconstructed_query.hypothetical_document or deconstructed_query.semantic_query
-            where_filter = {}
-            if deconstructed_query.extracted_filters:
-                filters = [{f.field: {f.operator: f.value}} for f in deconstructed_query.extracted_filters]
-                where_filter = {"$and": filters} if len(filters) > 1 else filters[0]
-            
-            search_results = vector_db.search_journeys(
-                query_text=search_text, n_results=deconstructed_query.n_results, where_filter=where_filter
-            )
+            search_results = None
+            with timer.stage("retrieval"):
+                if cached_plan is not None and cached_plan.ids:
+                    search_results = await vector_db.get_journeys_by_ids_async(cached_plan.ids, cached_plan.distances)
+                    if len(search_results['ids'][0]) < len(cached_plan.ids):
+                        search_results = None
+                elif speculative_search is not None:
+                    search_results = await _speculative_results(speculative_search, query, deconstructed_query)
+                    timer.info["speculative_hit"] = search_results is not None
+                    if search_results is not None:
+                        semantic_cache.put_plan(
+                            query, history_dicts, deconstructed_query, cache_generation,
+                            ids=search_results['ids'][0], distances=search_results['distances'][0],
+                        )
+                if search_results is None:
+                    search_text = deconstructed_query.hypothetical_document or deconstructed_query.semantic_query
+                    where_filter = _build_where_filter(deconstructed_query)
+                    search_results = await vector_db.search_journeys_async(
+                        query_text=search_text, n_results=deconstructed_query.n_results, where_filter=where_filter
+                    )
+                    if search_results and search_results.get('ids'):
+                        semantic_cache.put_plan(
+                            query, history_dicts, deconstructed_query, cache_generation,
+                            ids=search_results['ids'][0], distances=(search_results.get('distances') or [None])[0],
+                        )
 
             documents_list = search_results.get('documents') if search_results else None
             metadatas_list = search_results.get('metadatas') if search_results else None
@@ -135,6 +247,7 @@ async def stream_generator(query: str, db: AsyncSession, session_id: str) -> Asy
 
             if not (documents_list and metadatas_list and distances_list and documents_list[0]):
                 logger.warning("Search returned no relevant documents.")
+                timer.info["error"] = "no_documents"
                 yield f"event: error\ndata: {json.dumps({'message': 'Could not find any relevant documents for your question.'})}\n\n"
                 return
 
@@ -150,6 +263,7 @@ async def stream_generator(query: str, db: AsyncSession, session_id: str) -> Asy
                     distance=dist
                 ) for doc, md, dist in zip(documents, metadatas, distances)
             ]
+            timer.info["retrieved_documents"] = len(source_documents)
             logger.info("STREAM: Yielding sources")
             yield f"event: sources\ndata: {json.dumps({'sources': [doc.model_dump() for doc in source_documents]})}\n\n"
 
@@ -157,30 +271,40 @@ async def stream_generator(query: str, db: AsyncSession, session_id: str) -> Asy
             yield f"event: status_update\ndata: {json.dumps({'status': status_manager.get_message('synthesizing')})}\n\n"
             prompt = prompt_engine.create_prompt(deconstructed_query.semantic_query, [doc.model_dump() for doc in source_documents])
             
-            async for token in llm_handler.get_llm_response_stream(prompt, history=history_dicts):
-                full_response += token
-                logger.debug(f"STREAM: Yielding llm_response_chunk: {token}")
-                yield f"event: llm_response_chunk\ndata: {json.dumps({'token': token})}\n\n"
+            with timer.stage("llm_stream"):
+                async for token in llm_handler.get_llm_response_stream(prompt, history=history_dicts, usage=usage):
+                    timer.mark("first_token")
+                    full_response += token
+                    yield f"event: llm_response_chunk\ndata: {json.dumps({'token': token})}\n\n"
+
+            if query_embedding is not None and full_response and not full_response.endswith(llm_handler.ERROR_RESPONSE):
+                semantic_cache.put_answer(
+                    query_embedding, full_response, [doc.model_dump() for doc in source_documents], cache_generation
+                )
 
         elif deconstructed_query.intent == "chitchat":
             logger.info("STREAM: Yielding status_update: chitchat")
             yield f"event: status_update\ndata: {json.dumps({'status': status_manager.get_message('chitchat')})}\n\n"
             logger.info("STREAM: Yielding sources (empty for chitchat)")
             yield f"event: sources\ndata: {json.dumps({'sources': []})}\n\n"
-            async for token in llm_handler.get_llm_response_stream(deconstructed_query.semantic_query, is_chitchat=True, history=history_dicts):
-                full_response += token
-                logger.debug(f"STREAM: Yielding llm_response_chunk: {token}")
-                yield f"event: llm_response_chunk\ndata: {json.dumps({'token': token})}\n\n"
+            with timer.stage("llm_stream"):
+                async for token in llm_handler.get_llm_response_stream(deconstructed_query.semantic_query, is_chitchat=True, history=history_dicts, usage=usage):
+                    timer.mark("first_token")
+                    full_response += token
+                    yield f"event: llm_response_chunk\ndata: {json.dumps({'token': token})}\n\n"
 
         elif deconstructed_query.intent == "sampling":
             logger.info("STREAM: Yielding status_update: sampling")
             yield f"event: status_update\ndata: {json.dumps({'status': status_manager.get_message('sampling')})}\n\n"
-            search_results = vector_db.get_random_journeys(n_results=deconstructed_query.n_results)
+            search_results = await vector_db.get_random_journeys_async(
+                n_results=deconstructed_query.n_results, where_filter=_build_where_filter(deconstructed_query)
+            )
             documents = search_results.get('documents') if search_results else None
             metadatas = search_results.get('metadatas') if search_results else None
 
             if not (documents and metadatas):
                 logger.warning("Sampling returned no documents.")
+                timer.info["error"] = "no_documents"
                 yield f"event: error\ndata: {json.dumps({'message': 'Could not retrieve a sample of documents.'})}\n\n"
                 return
 
@@ -193,6 +317,7 @@ async def stream_generator(query: str, db: AsyncSession, session_id: str) -> Asy
                     distance=0.0
                 ) for doc, md in zip(documents, metadatas)
             ]
+            timer.info["retrieved_documents"] = len(source_documents)
             logger.info("STREAM: Yielding sources (sampling)")
             yield f"event: sources\ndata: {json.dumps({'sources': [doc.model_dump() for doc in source_documents]})}\n\n"
 
@@ -200,28 +325,35 @@ async def stream_generator(query: str, db: AsyncSession, session_id: str) -> Asy
             yield f"event: status_update\ndata: {json.dumps({'status': status_manager.get_message('synthesizing')})}\n\n"
             prompt = prompt_engine.create_prompt("Summarize the key themes from this random sample of customer interactions.", [doc.model_dump() for doc in source_documents])
             
-            async for token in llm_handler.get_llm_response_stream(prompt, history=history_dicts):
-                full_response += token
-                logger.debug(f"STREAM: Yielding llm_response_chunk: {token}")
-                yield f"event: llm_response_chunk\ndata: {json.dumps({'token': token})}\n\n"
+            with timer.stage("llm_stream"):
+                async for token in llm_handler.get_llm_response_stream(prompt, history=history_dicts, usage=usage):
+                    timer.mark("first_token")
+                    full_response += token
+                    yield f"event: llm_response_chunk\ndata: {json.dumps({'token': token})}\n\n"
             
     except Exception as e:
         logger.error(f"Error during stream generation: {e}", exc_info=True)
         logger.error(f"STREAM: Yielding error: {e}")
+        timer.info["error"] = "exception"
         yield f"event: error\ndata: {json.dumps({'message': str(e)})}\n\n"
     finally:
+        if speculative_search is not None and not speculative_search.done():
+            speculative_search.cancel()
         # 5. Save the assistant's full response
         assistant_log_id = None
         if full_response:
-            assistant_log = database.ChatLog(session_id=session_id, role="assistant", content=full_response)
-            db.add(assistant_log)
-            await db.commit()
-            await db.refresh(assistant_log)
+            assistant_log = await session_history.append(db, session_id, "assistant", full_response)
             assistant_log_id = assistant_log.id
             logger.info(f"Saved assistant response for session {session_id} with ID {assistant_log_id}")
-        # 6. Signal the end of the stream, and send back the session_id and the new message ID
+        timer.info.update(usage)
+        if full_response.endswith(llm_handler.ERROR_RESPONSE):
+            timer.info["error"] = "llm"
+        chat_metrics.observe(timer, session_id)
+        timings = timer.as_dict()
+        logger.debug(f"Chat stage timings for session {session_id}: {timings}")
+        # 6. Signal the end of the stream, and send back the session_id, the new message ID and the stage timings
         logger.info("STREAM: Yielding stream_end")
-        yield f"event: stream_end\ndata: {json.dumps({'session_id': session_id, 'assistant_message_id': assistant_log_id})}\n\n"
+        yield f"event: stream_end\ndata: {json.dumps({'session_id': session_id, 'assistant_message_id': assistant_log_id, 'timings': timings})}\n\n"
 
 
 async def streaming_search_generator(query: str, session_id: Optional[str]):
@@ -230,10 +362,7 @@ async def streaming_search_generator(query: str, session_id: Optional[str]):
         current_session_id = session_id if session_id else str(uuid.uuid4())
         
         # Save user's message before starting the stream
-        user_log = database.ChatLog(session_id=current_session_id, role="user", content=query)
-        db.add(user_log)
-        await db.commit()
-        await db.refresh(user_log)
+        user_log = await session_history.append(db, current_session_id, "user", query)
         logger.info(f"Saved user query for session {current_session_id} with ID {user_log.id}")
 
         # First, yield the user message ID so the frontend can update its state
@@ -269,30 +398,23 @@ async def search(
         try:
             current_session_id = session_id if session_id else str(uuid.uuid4())
             # Save user message first
-            user_log = database.ChatLog(session_id=current_session_id, role="user", content=query)
-            db.add(user_log)
-            await db.commit()
+            await session_history.append(db, current_session_id, "user", query)
             
-            # Fetch history from DB for context
-            stmt = select(database.ChatLog).filter(database.ChatLog.session_id == current_session_id).order_by(database.ChatLog.id.desc()).limit(10)
-            result = await db.execute(stmt)
-            db_history_messages = list(result.scalars().all())
-            db_history_messages.reverse()
-            history = [ChatMessage.model_validate(msg) for msg in db_history_messages]
-            history_dicts = [msg.model_dump() for msg in history]
-
-            deconstructed_query = query_agent.deconstruct_query(query, history=history_dicts)
+            # Token-budgeted history (recent turns + summary) for context
+            history_dicts = await session_history.get_messages(db, current_session_id)
+
+            deconstructed_query = await query_agent.deconstruct_query_async(query, history=history_dicts)
             logger.info(f"Deconstructed query: '{deconstructed_query.semantic_query}' with intent: {deconstructed_query.intent}")
 
             llm_response = ""
             source_documents = []
 
             if deconstructed_query.intent == "question":
-                if vector_db.get_collection_count() == 0:
+                if await vector_db.get_collection_count_async() == 0:
                     return SearchResponse(llm_response="The knowledge base is empty.", source_documents=[])
 
                 search_text = deconstructed_query.hypothetical_document or deconstructed_query.semantic_query
-                search_results = vector_db.search_journeys(query_text=search_text, n_results=deconstructed_query.n_results)
+                search_results = await vector_db.search_journeys_async(query_text=search_text, n_results=deconstructed_query.n_results)
                 
                 documents_list = search_results.get('documents') if search_results else None
                 if documents_list and documents_list[0]:
@@ -323,7 +445,9 @@ async def search(
                 llm_response = await llm_handler.get_llm_response(deconstructed_query.semantic_query, is_chitchat=True, history=history_dicts)
 
             elif deconstructed_query.intent == "sampling":
-                search_results = vector_db.get_random_journeys(n_results=deconstructed_query.n_results)
+                search_results = await vector_db.get_random_journeys_async(
+                    n_results=deconstructed_query.n_results, where_filter=_build_where_filter(deconstructed_query)
+                )
                 documents = search_results.get('documents') if search_results else None
                 metadatas = search_results.get('metadatas') if search_results else None
                 if documents and metadatas:
@@ -342,9 +466,7 @@ async def search(
                     llm_response = "Could not retrieve a sample of documents."
 
             # Save assistant response
-            assistant_log = database.ChatLog(session_id=current_session_id, role="assistant", content=llm_response)
-            db.add(assistant_log)
-            await db.commit()
+            await session_history.append(db, current_session_id, "assistant", llm_response)
             
             return SearchResponse(llm_response=llm_response, source_documents=source_documents)
 
@@ -352,6 +474,26 @@ async def search(
             logger.error(f"An error occurred during non-streaming search: {e}", exc_info=True)
             raise HTTPException(status_code=500, detail="Internal Server Error")
 
+@router.get("/search-cache/stats", tags=["Search"])
+async def get_search_cache_stats():
+    """Hit/miss counters of the chat query-plan and answer cache for this worker."""
+    return semantic_cache.get_stats()
+
+@router.get("/chat-history/stats", tags=["Search"])
+async def get_chat_history_stats():
+    """Cache and summary counters of the chat session history for this worker."""
+    return session_history.get_stats()
+
+@router.get("/metrics", tags=["Search"], response_class=PlainTextResponse)
+async def get_chat_metrics():
+    """Chat latency, token and retrieval metrics of this worker in the Prometheus text format."""
+    return PlainTextResponse(chat_metrics.render(), media_type="text/plain; version=0.0.4")
+
+@router.get("/embedding-cache/stats", tags=["Search"])
+async def get_embedding_cache_stats():
+    """Cache and batching counters of the embedding service for this worker."""
+    return embedding_service.get_stats()
+
 # NOTE:
 # Chat session CRUD and company-name correction are implemented in
 # `chat_router.py` and `transcription_router.py` respectively.
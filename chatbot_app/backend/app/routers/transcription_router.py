@@ -1,21 +1,25 @@
+import asyncio
 import logging
 import os
 import tempfile
 import datetime
 import shutil
 import json
-from fastapi import APIRouter, HTTPException, File, UploadFile, Form, Depends, BackgroundTasks, Request
+import base64
+from fastapi import APIRouter, HTTPException, File, UploadFile, Form, Depends, BackgroundTasks, Request, Response, Query
 from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 import mimetypes
 from pydantic import BaseModel, Field
 from typing import Optional, List, AsyncGenerator, Dict, Any
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, tuple_
 
 from app import database
-from app.services import llm_handler, transcription, prompt_engine, task_manager
+from app.services import admission, live_transcript, llm_handler, transcription, prompt_engine, task_manager, uploads, transcription_cache, transcoding, transcript_search
 from app.services.storage import get_storage_service
+from app.services.audio_cache import audio_cache
+from app.config import settings
 
 # --- Logging Setup ---
 logger = logging.getLogger(__name__)
@@ -48,7 +52,7 @@ class TranscriptionInfo(BaseModel):
 
 # --- Background Tasks ---
 
-async def run_pipeline_task(temp_path: str, audio_source: str, task_id: str):
+async def run_pipeline_task(temp_path: str, audio_source: str, task_id: str, content_sha256: Optional[str] = None):
     """
     Wrapper function to run the TranscriptionPipeline in the background.
     """
@@ -57,32 +61,100 @@ async def run_pipeline_task(temp_path: str, audio_source: str, task_id: str):
             db=db,
             task_id=task_id,
             temp_path=temp_path,
-            audio_source=audio_source
+            audio_source=audio_source,
+            content_sha256=content_sha256,
         )
         await pipeline.run()
 
+async def _resume_pipeline_task(task_id: str, payload: Dict[str, Any]):
+    """Re-runs a transcription task picked up from a worker whose lease expired."""
+    temp_path = payload.get("temp_path") or ""
+    if not os.path.exists(temp_path):
+        task_manager.set_task_error(task_id, "Task was interrupted and its uploaded audio is no longer available.")
+        return
+    await run_pipeline_task(temp_path, payload.get("audio_source") or "", task_id, payload.get("content_sha256"))
+
+task_manager.register_handler("transcription", _resume_pipeline_task)
+
 # --- API Endpoints ---
 class TaskStatus(BaseModel):
     status: str
     progress: int
     message: str
     result: Optional[Dict[str, Any]] = None
+    queue_stage: Optional[str] = None
+    queue_position: Optional[int] = None
+    estimated_wait_seconds: Optional[float] = None
 
 @router.get("/tasks/{task_id}", response_model=TaskStatus, tags=["Transcription"])
 async def get_task_status(task_id: str):
-    """Retrieves the status of a specific transcription task."""
-    status = task_manager.get_task_status(task_id)
+    """
+    Retrieves the status of a specific transcription task. While the task
+    waits for a pipeline stage slot on this worker, ``queue_stage``,
+    ``queue_position`` (1 = next) and ``estimated_wait_seconds`` say where.
+    """
+    status = await task_manager.get_task_status_async(task_id)
     if status is None:
         raise HTTPException(status_code=404, detail="Task not found")
+    queued = admission.queue_status(task_id)
+    if queued is not None:
+        status = dict(status)
+        status.update(
+            queue_stage=queued["stage"],
+            queue_position=queued["position"],
+            estimated_wait_seconds=queued["estimated_wait_seconds"],
+        )
     return status
 
+async def task_event_generator(task_id: str) -> AsyncGenerator[str, None]:
+    """
+    Server-Sent Events for a task: a ``task_update`` event on every status
+    transition until the task finishes, then ``stream_end``. The ``result``
+    field is only included when it changed since the previous event, so
+    partial transcripts are sent once rather than with every progress tick.
+    """
+    last_result: Any = None
+    async for snapshot in task_manager.watch_task(task_id):
+        if snapshot is None:
+            yield ": keepalive\n\n"
+            continue
+        event = {
+            "status": snapshot.get("status"),
+            "progress": snapshot.get("progress") or 0,
+            "message": snapshot.get("message") or "",
+        }
+        result = snapshot.get("result")
+        if result is not None and result != last_result:
+            event["result"] = result
+            last_result = result
+        yield f"event: task_update\ndata: {json.dumps(event, default=str)}\n\n"
+    yield f"event: stream_end\ndata: {json.dumps({'task_id': task_id})}\n\n"
+
+@router.get("/tasks/{task_id}/events", tags=["Transcription"])
+async def stream_task_status(task_id: str):
+    """Streams status transitions and partial results of a task as Server-Sent Events."""
+    if await task_manager.get_task_status_async(task_id) is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return StreamingResponse(
+        task_event_generator(task_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @router.post("/transcribe", tags=["Transcription"], status_code=202)
 async def transcribe(
     background_tasks: BackgroundTasks,
     file: Optional[UploadFile] = File(None),
-    url: Optional[str] = Form(None)
+    url: Optional[str] = Form(None),
+    db: AsyncSession = Depends(get_db),
 ):
-    """Transcribes an audio file from a file upload or a URL."""
+    """
+    Transcribes an audio file from a file upload or a URL.
+
+    If the same audio bytes were already processed with the current pipeline
+    configuration, the stored result is returned through an already-finished
+    task instead of running the pipeline again.
+    """
     if not file and not url:
         raise HTTPException(status_code=400, detail="Either a file or a URL must be provided.")
 
@@ -92,24 +164,50 @@ async def transcribe(
         audio_source = file.filename if file and file.filename else url or ""
         
         if file and file.filename:
-            temp_path = os.path.join(temp_dir, file.filename)
-            with open(temp_path, "wb") as buffer:
-                buffer.write(await file.read())
+            spooled = await uploads.spool_upload(file, os.path.join(temp_dir, os.path.basename(file.filename)))
         elif url:
-            temp_path = transcription.download_file(url, temp_dir, task_id)
+            spooled = await transcription.download_file(url, temp_dir, task_id)
         else:
             shutil.rmtree(temp_dir)
             raise HTTPException(status_code=400, detail="No valid audio source provided.")
-
-        background_tasks.add_task(run_pipeline_task, temp_path, audio_source, task_id)
+        temp_path = spooled.path
+
+        cached = await transcription_cache.lookup(db, spooled.sha256, transcription.pipeline_config_key())
+        if cached is not None:
+            logger.info(f"Transcription cache hit for task {task_id}: reusing transcription {cached.id}")
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            task_manager.set_task_success(task_id, {
+                "transcription_id": cached.id,
+                "raw_segments": cached.raw_segments,
+                "processed_segments": cached.processed_segments,
+                "cached": True,
+            })
+            return {"task_id": task_id, "message": "Transcription served from cache.", "cached": True}
+
+        task_manager.set_task_payload(
+            task_id,
+            "transcription",
+            {"temp_path": temp_path, "audio_source": audio_source, "content_sha256": spooled.sha256},
+        )
+        background_tasks.add_task(run_pipeline_task, temp_path, audio_source, task_id, spooled.sha256)
         return {"task_id": task_id, "message": "Transcription task started."}
 
+    except uploads.UploadTooLargeError as e:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        task_manager.set_task_error(task_id, str(e))
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         logger.error(f"Failed to start transcription task {task_id}: {e}", exc_info=True)
         task_manager.set_task_error(task_id, f"Failed to start task: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to start transcription task: {e}")
 
 
+@router.get("/transcription-cache/stats", tags=["Transcription"])
+async def get_transcription_cache_stats():
+    """Hit/miss counters of the content-hash transcription cache for this worker."""
+    return transcription_cache.get_stats()
+
+
 @router.post("/correct-company-name", tags=["Transcription"], response_model=CorrectedTranscription)
 async def correct_company_name(request: CompanyNameCorrectionRequest, db: AsyncSession = Depends(get_db)):
     """Uses an LLM to replace an incorrect company name in a transcript."""
@@ -141,18 +239,82 @@ async def correct_company_name(request: CompanyNameCorrectionRequest, db: AsyncS
 async def correct_company_name_alias(request: CompanyNameCorrectionRequest, db: AsyncSession = Depends(get_db)):
     return await correct_company_name(request, db)
 
+TRANSCRIPTIONS_PAGE_SIZE = 50
+TRANSCRIPTIONS_MAX_PAGE_SIZE = 200
+
+def _encode_cursor(created_at: Optional[datetime.datetime], transcription_id: int) -> str:
+    raw = json.dumps([created_at.isoformat() if created_at else None, transcription_id])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+def _decode_cursor(cursor: str) -> tuple[datetime.datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        created_at, transcription_id = json.loads(raw)
+        return datetime.datetime.fromisoformat(created_at), int(transcription_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+async def list_transcription_summaries(
+    db: AsyncSession, limit: int, cursor: Optional[str] = None
+) -> tuple[List[TranscriptionInfo], Optional[str]]:
+    """
+    Returns one page of completed transcriptions, newest first, plus the cursor
+    for the next page (running and failed pipelines are left out). Only the
+    summary columns are selected; the transcript texts and segment JSON are
+    left to the detail endpoint.
+    """
+    t = database.Transcription
+    stmt = (
+        select(t.id, t.audio_source, t.created_at, t.audio_file_path)
+        .where(t.status == "completed")
+        .order_by(t.created_at.desc(), t.id.desc())
+        .limit(limit + 1)
+    )
+    if cursor:
+        created_at, transcription_id = _decode_cursor(cursor)
+        stmt = stmt.where(tuple_(t.created_at, t.id) < tuple_(created_at, transcription_id))
+    rows = (await db.execute(stmt)).all()
+    page = [TranscriptionInfo.model_validate(row._mapping) for row in rows[:limit]]
+    next_cursor = _encode_cursor(page[-1].created_at, page[-1].id) if len(rows) > limit else None
+    return page, next_cursor
+
 @router.get("/transcriptions", tags=["Transcription"], response_model=List[TranscriptionInfo])
-async def get_transcriptions(db: AsyncSession = Depends(get_db)):
-    """Retrieves a list of all past transcriptions."""
-    logger.info("Received request to /transcriptions")
+async def get_transcriptions(
+    response: Response,
+    limit: int = Query(TRANSCRIPTIONS_PAGE_SIZE, ge=1, le=TRANSCRIPTIONS_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Retrieves a page of past transcriptions, newest first. When more rows exist,
+    the ``X-Next-Cursor`` response header holds the ``cursor`` for the next page.
+    """
+    logger.info(f"Received request to /transcriptions (limit={limit}, cursor={'yes' if cursor else 'no'})")
     try:
-        stmt = select(database.Transcription).order_by(database.Transcription.created_at.desc())
-        result = await db.execute(stmt)
-        transcriptions = result.scalars().all()
-        return [TranscriptionInfo.from_orm(t) for t in transcriptions]
+        page, next_cursor = await list_transcription_summaries(db, limit, cursor)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"An error occurred while fetching transcriptions: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Internal Server Error")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return page
+
+@router.get("/transcriptions/search", tags=["Transcription"])
+async def search_transcriptions(
+    q: str = Query(..., min_length=2, max_length=500, description='Web search syntax: words, "exact phrase", or, -exclude'),
+    language: str = Query("auto", pattern="^(auto|de|en)$"),
+    order: str = Query("relevance", pattern="^(relevance|recent)$"),
+    limit: int = Query(20, ge=1, le=200),
+    offset: int = Query(0, ge=0, le=10000),
+    transcription_id: Optional[int] = Query(None, description="Only search within this transcription"),
+    db: AsyncSession = Depends(get_db),
+):
+    """Full-text search over stored transcript segments; hits include start/end times for seeking."""
+    return await transcript_search.search(
+        db, q, language=language, order=order, limit=limit, offset=offset, transcription_id=transcription_id
+    )
 
 @router.get("/transcriptions/{transcription_id}", tags=["Transcription"], response_model=Dict[str, Any])
 async def get_transcription(transcription_id: int, db: AsyncSession = Depends(get_db)):
@@ -190,6 +352,60 @@ async def get_transcription(transcription_id: int, db: AsyncSession = Depends(ge
 
     return response_data
 
+@router.get("/transcriptions/{transcription_id}/segments", tags=["Transcription"])
+async def get_transcription_segments(
+    transcription_id: int,
+    start: Optional[float] = Query(None, ge=0, description="Window start in seconds"),
+    end: Optional[float] = Query(None, gt=0, description="Window end in seconds (default: start + window)"),
+    around: Optional[float] = Query(None, ge=0, description="Center the window on this time instead"),
+    window: float = Query(30.0, gt=0, le=3600, description="Window length in seconds"),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Only the segments overlapping a time window (e.g. 30 s around the player
+    position), instead of the whole segment arrays of /transcriptions/{id}.
+    """
+    if around is not None:
+        start, end = max(0.0, around - window / 2), around + window / 2
+    elif start is None:
+        raise HTTPException(status_code=422, detail="Pass either 'start' (and optionally 'end') or 'around'.")
+    else:
+        end = end if end is not None else start + window
+    if end <= start or end - start > 3600:
+        raise HTTPException(status_code=422, detail="The window must be positive and at most 3600 seconds.")
+
+    segments = await transcript_search.segments_in_window(db, transcription_id, start, end)
+    if segments is None:
+        # Not indexed (yet): fall back to the stored arrays.
+        row = (await db.execute(
+            select(database.Transcription.processed_segments, database.Transcription.raw_segments)
+            .where(database.Transcription.id == transcription_id)
+        )).first()
+        if row is None:
+            raise HTTPException(status_code=404, detail="Transcription not found")
+        processed = bool(row.processed_segments)
+        segments = transcript_search.window_from_array(row.processed_segments if processed else row.raw_segments or [], start, end, processed=processed)
+    return {"transcription_id": transcription_id, "start": start, "end": end, "segments": segments}
+
+@router.get("/transcriptions/{transcription_id}/delta", tags=["Transcription"])
+async def get_transcription_delta(
+    transcription_id: int,
+    since_revision: int = Query(0, ge=0, description="Revision the client already has (0 = nothing)"),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Segments changed after ``since_revision``, for following a transcription
+    while it is processed (its id is ``live_transcription_id`` in the task
+    result). Raw segments appear as audio chunks are transcribed and are
+    replaced by processed ones (``processed: true``) from the start. Keep the
+    first ``from_index`` segments, append ``segments``, and ask again with the
+    returned ``revision`` until ``complete`` is true.
+    """
+    delta = await transcript_search.segments_since(db, transcription_id, since_revision)
+    if delta is None:
+        raise HTTPException(status_code=404, detail="Transcription not found")
+    return delta
+
 @router.delete("/transcriptions/{transcription_id}", tags=["Transcription"], status_code=204)
 async def delete_transcription(transcription_id: int, db: AsyncSession = Depends(get_db)):
     """Deletes a transcription by its ID."""
@@ -217,12 +433,129 @@ def _iter_file_segment(path: str, start: int, end: int, chunk_size: int = 1024 *
             bytes_remaining -= len(data)
 
 
+def _range_bounds(range_header: str, file_size: int):
+    """Parses a single ``bytes=start-end`` range; falls back to the whole file on parse errors."""
+    # Example: "bytes=0-1023"
+    try:
+        units, ranges = range_header.split("=", 1)
+        if units != "bytes":
+            raise ValueError("Only bytes unit is supported")
+        start_str, end_str = ranges.split("-", 1)
+        if not start_str:
+            # Suffix range: the last N bytes
+            start, end = max(0, file_size - int(end_str)), file_size - 1
+        else:
+            start = int(start_str)
+            end = int(end_str) if end_str else file_size - 1
+        start = max(0, start)
+        end = min(end, file_size - 1)
+        if start > end:
+            start = 0
+            end = file_size - 1
+    except Exception:
+        start, end = 0, file_size - 1
+    return start, end
+
+
+def _partial_headers(start: int, end: int, file_size: int) -> Dict[str, str]:
+    return {
+        "Content-Range": f"bytes {start}-{end}/{file_size}",
+        "Accept-Ranges": "bytes",
+        "Content-Length": str(end - start + 1),
+        # Let the browser sniff or set a generic audio type; specific type detection could be added
+        "Cache-Control": "no-cache",
+    }
+
+
+def _serve_local_file(path: str, request: Request, media_type: str):
+    file_size = os.path.getsize(path)
+    range_header = request.headers.get("range") or request.headers.get("Range")
+    if range_header:
+        start, end = _range_bounds(range_header, file_size)
+        return StreamingResponse(
+            _iter_file_segment(path, start, end),
+            status_code=206,
+            media_type=media_type,
+            headers=_partial_headers(start, end, file_size),
+        )
+    # No Range header; send entire file but advertise range support
+    response = FileResponse(path, media_type=media_type)
+    response.headers["Accept-Ranges"] = "bytes"
+    return response
+
+
+def _iter_storage_segment(object_key: str, start: int, end: int):
+    storage_service = get_storage_service()
+    for data in storage_service.iter_object_range(object_key, start, end):
+        audio_cache.record_served(from_storage=len(data))
+        yield data
+
+
+async def _proxy_storage_audio(object_key: str, request: Request):
+    """
+    Serves a cloud-stored recording through this server: from the local disk
+    cache when present, otherwise as a ranged read from storage while the whole
+    object is downloaded into the cache in the background.
+    """
+    meta = await asyncio.to_thread(audio_cache.stat, object_key)
+    if meta is None:
+        raise HTTPException(status_code=404, detail="Audio object not found in cloud storage.")
+    media_type = meta.get("content_type") or mimetypes.guess_type(object_key)[0] or "audio/mpeg"
+    if media_type == "binary/octet-stream":
+        media_type = mimetypes.guess_type(object_key)[0] or "audio/mpeg"
+
+    cached_path = await asyncio.to_thread(audio_cache.path_for, object_key)
+    file_size = meta["size"]
+    range_header = request.headers.get("range") or request.headers.get("Range")
+    start, end = _range_bounds(range_header, file_size) if range_header else (0, file_size - 1)
+    if cached_path is not None:
+        audio_cache.record_served(from_cache=end - start + 1)
+        return _serve_local_file(cached_path, request, media_type)
+
+    audio_cache.fill(object_key, file_size)
+    if not range_header:
+        headers = {"Accept-Ranges": "bytes", "Content-Length": str(file_size), "Cache-Control": "no-cache"}
+        return StreamingResponse(_iter_storage_segment(object_key, 0, file_size - 1), media_type=media_type, headers=headers)
+    return StreamingResponse(
+        _iter_storage_segment(object_key, start, end),
+        status_code=206,
+        media_type=media_type,
+        headers=_partial_headers(start, end, file_size),
+    )
+
+
+@router.get("/admission/stats", tags=["Transcription"])
+async def get_admission_stats():
+    """Per-stage limits, running and waiting pipelines and queue wait times for this worker."""
+    return admission.get_stats()
+
+
+@router.get("/live-transcripts/stats", tags=["Transcription"])
+async def get_live_transcript_stats():
+    """Incremental segment writes and time from pipeline start to the first stored segment, by recording length."""
+    return live_transcript.get_stats()
+
+
+@router.get("/transcoding/stats", tags=["Transcription"])
+async def get_transcoding_stats():
+    """Files transcoded to Opus by this worker, with original vs. compressed bytes."""
+    return transcoding.get_stats()
+
+
+@router.get("/audio-cache/stats", tags=["Transcription"])
+async def get_audio_cache_stats():
+    """Hit/miss, eviction and byte counters of the proxied audio disk cache for this worker."""
+    return audio_cache.get_stats()
+
+
 @router.get("/audio/{transcription_id}", tags=["Transcription"])
 async def get_audio_file(transcription_id: int, request: Request, db: AsyncSession = Depends(get_db)):
     """
     Retrieves the audio file for a given transcription ID.
     - If the file is stored locally, it serves the file directly.
-    - If the file is in B2, it returns a secure, temporary pre-signed URL.
+    - If the file is in B2, it returns a secure, temporary pre-signed URL, or
+      with AUDIO_SERVING=proxy streams it (Range-capable) through the local
+      audio cache.
     """
     logger.info(f"Received request for audio for transcription ID: {transcription_id}")
     
@@ -235,57 +568,21 @@ async def get_audio_file(transcription_id: int, request: Request, db: AsyncSessi
     # Check if the path points to a local file
     if os.path.exists(audio_path):
         logger.info(f"Serving local audio file: {audio_path}")
-        file_size = os.path.getsize(audio_path)
-        range_header = request.headers.get("range") or request.headers.get("Range")
         media_type, _ = mimetypes.guess_type(audio_path)
-        if media_type is None:
-            media_type = "audio/mpeg"
-        if range_header:
-            # Example: "bytes=0-1023"
-            try:
-                units, ranges = range_header.split("=", 1)
-                if units != "bytes":
-                    raise ValueError("Only bytes unit is supported")
-                start_str, end_str = ranges.split("-", 1)
-                start = int(start_str) if start_str else 0
-                end = int(end_str) if end_str else file_size - 1
-                start = max(0, start)
-                end = min(end, file_size - 1)
-                if start > end:
-                    start = 0
-                    end = file_size - 1
-            except Exception:
-                # Fallback to full content on parse error
-                start, end = 0, file_size - 1
-
-            content_length = end - start + 1
-            headers = {
-                "Content-Range": f"bytes {start}-{end}/{file_size}",
-                "Accept-Ranges": "bytes",
-                "Content-Length": str(content_length),
-                # Let the browser sniff or set a generic audio type; specific type detection could be added
-                "Cache-Control": "no-cache",
-            }
-            return StreamingResponse(
-                _iter_file_segment(audio_path, start, end),
-                status_code=206,
-                media_type=media_type,
-                headers=headers,
-            )
-        # No Range header; send entire file but advertise range support
-        response = FileResponse(audio_path, media_type=media_type)
-        response.headers["Accept-Ranges"] = "bytes"
-        return response
-
-    # If not a local file, assume it's a B2 object key and generate a pre-signed URL
-    logger.info(f"Generating pre-signed URL for B2 object key: {audio_path}")
+        return _serve_local_file(audio_path, request, media_type or "audio/mpeg")
+
+    # If not a local file, assume it's a B2 object key
     storage_service = get_storage_service()
     
-    if not storage_service.check_connection():
-        logger.error(f"B2 connection is down. Cannot generate pre-signed URL for key: {audio_path}")
+    if not await asyncio.to_thread(storage_service.is_available, settings.STORAGE_HEALTH_TTL_SECONDS):
+        logger.error(f"B2 connection is down. Cannot serve audio for key: {audio_path}")
         raise HTTPException(status_code=503, detail="Cloud storage service is currently unavailable.")
 
-    presigned_url = storage_service.create_presigned_url(audio_path)
+    if settings.AUDIO_SERVING == "proxy":
+        return await _proxy_storage_audio(audio_path, request)
+
+    logger.info(f"Generating pre-signed URL for B2 object key: {audio_path}")
+    presigned_url = storage_service.create_presigned_url(audio_path, expiration=settings.PRESIGNED_URL_EXPIRATION_SECONDS)
 
     if not presigned_url:
         logger.error(f"Could not generate pre-signed URL for object key: {audio_path}")
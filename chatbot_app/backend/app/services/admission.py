@@ -0,0 +1,173 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Weight of the newest observation in the per-stage service time average.
+EWMA_ALPHA = 0.3
+
+
+class StageLimiter:
+    """
+    At most ``limit`` holders at a time (0 = unlimited); everyone else waits in
+    strict FIFO order. Keeps a moving average of how long a slot is held so the
+    wait of a queued task can be estimated.
+    """
+
+    def __init__(self, name: str, limit: int):
+        self.name = name
+        self.limit = max(0, limit)
+        self._waiters: Deque[List[Any]] = deque()  # [task_id, future, queued at]
+        self._running: Dict[int, float] = {}  # token -> start time
+        self._tokens = itertools.count()
+        self.mean_seconds: Optional[float] = None
+        self._stats: Dict[str, Any] = {"admitted": 0, "queued": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0, "max_queue_depth": 0}
+
+    def _has_room(self) -> bool:
+        return not self.limit or len(self._running) < self.limit
+
+    def would_wait(self) -> bool:
+        return bool(self._waiters) or not self._has_room()
+
+    async def acquire(self, task_id: Optional[str] = None, on_queued: Optional[Callable[[int], None]] = None) -> int:
+        """Waits for a slot and returns the token to ``release`` it with."""
+        t0 = time.monotonic()
+        if not self.would_wait():
+            return self._admit(t0)
+        future = asyncio.get_running_loop().create_future()
+        entry = [task_id, future, t0]
+        self._waiters.append(entry)
+        self._stats["queued"] += 1
+        self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], len(self._waiters))
+        if on_queued is not None:
+            on_queued(len(self._waiters))
+        try:
+            return await future
+        except asyncio.CancelledError:
+            if entry in self._waiters:
+                self._waiters.remove(entry)
+            elif future.done() and not future.cancelled():
+                # The slot was handed over just before the cancellation; pass it on.
+                self.release(future.result(), record=False)
+            raise
+
+    def _admit(self, t0: float) -> int:
+        token = next(self._tokens)
+        now = time.monotonic()
+        self._running[token] = now
+        waited = now - t0
+        self._stats["admitted"] += 1
+        self._stats["wait_seconds"] += waited
+        self._stats["max_wait_seconds"] = max(self._stats["max_wait_seconds"], waited)
+        return token
+
+    def release(self, token: int, record: bool = True):
+        started = self._running.pop(token, None)
+        if record and started is not None:
+            held = time.monotonic() - started
+            self.mean_seconds = held if self.mean_seconds is None else (1 - EWMA_ALPHA) * self.mean_seconds + EWMA_ALPHA * held
+        while self._waiters and self._has_room():
+            _, future, t0 = self._waiters.popleft()
+            if not future.done():
+                future.set_result(self._admit(t0))
+
+    def position(self, task_id: str) -> Optional[int]:
+        """1-based place of ``task_id`` in the queue, or None when it is not waiting."""
+        for index, (waiting_id, _, _) in enumerate(self._waiters, start=1):
+            if waiting_id == task_id:
+                return index
+        return None
+
+    def estimated_wait(self, position: int) -> Optional[float]:
+        """
+        Seconds until the task at ``position`` gets a slot, assuming every slot
+        is held for the average service time: running holders free their slot
+        after the rest of that time, then each waiter ahead occupies one.
+        """
+        if self.mean_seconds is None:
+            return None
+        if not self.limit:
+            return 0.0
+        now = time.monotonic()
+        free_at = [max(0.0, self.mean_seconds - (now - started)) for started in self._running.values()]
+        free_at += [0.0] * (self.limit - len(free_at))
+        heapq.heapify(free_at)
+        for _ in range(position - 1):
+            heapq.heappush(free_at, heapq.heappop(free_at) + self.mean_seconds)
+        return round(free_at[0], 1)
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        stats.update({
+            "limit": self.limit,
+            "running": len(self._running),
+            "waiting": len(self._waiters),
+            "mean_seconds": round(self.mean_seconds, 3) if self.mean_seconds is not None else None,
+            "wait_seconds": round(stats["wait_seconds"], 3),
+            "max_wait_seconds": round(stats["max_wait_seconds"], 3),
+        })
+        return stats
+
+
+# Pipeline stages in the order a task passes through them. Speaker labelling
+# is part of the GPT post-processing call, so it runs in "post_processing".
+STAGES = ("upload", "transcription", "post_processing")
+
+_limiters: Dict[str, StageLimiter] = {
+    "upload": StageLimiter("upload", settings.PIPELINE_UPLOAD_CONCURRENCY),
+    "transcription": StageLimiter("transcription", settings.PIPELINE_TRANSCRIPTION_CONCURRENCY),
+    "post_processing": StageLimiter("post_processing", settings.PIPELINE_POST_PROCESS_CONCURRENCY),
+}
+# Stage each waiting task is queued for (tasks queue for one stage at a time).
+_queued: Dict[str, str] = {}
+
+
+def configure(limits: Dict[str, int]):
+    """Replaces the per-stage limits; only for idle workers (benchmarks, tests)."""
+    for stage, limit in limits.items():
+        _limiters[stage] = StageLimiter(stage, limit)
+
+
+@asynccontextmanager
+async def slot(stage: str, task_id: Optional[str] = None, on_queued: Optional[Callable[[int], None]] = None):
+    """
+    Holds one of the ``stage`` slots for the duration of the block, waiting in
+    FIFO order when all are taken. ``on_queued`` is called with the queue
+    position when the task has to wait.
+    """
+    limiter = _limiters[stage]
+    if task_id is not None:
+        _queued[task_id] = stage
+    try:
+        token = await limiter.acquire(task_id, on_queued)
+    finally:
+        if task_id is not None:
+            _queued.pop(task_id, None)
+    try:
+        yield
+    finally:
+        limiter.release(token)
+
+
+def queue_status(task_id: str) -> Optional[Dict[str, Any]]:
+    """The stage ``task_id`` is queued for, its position and estimated wait, or None when it is not waiting."""
+    stage = _queued.get(task_id)
+    if stage is None:
+        return None
+    limiter = _limiters[stage]
+    position = limiter.position(task_id)
+    if position is None:
+        return None
+    return {"stage": stage, "position": position, "estimated_wait_seconds": limiter.estimated_wait(position)}
+
+
+def get_stats() -> Dict[str, Any]:
+    return {stage: _limiters[stage].get_stats() for stage in STAGES}
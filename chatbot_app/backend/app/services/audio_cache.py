@@ -0,0 +1,233 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Set
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class AudioCache:
+    """
+    Size-bounded LRU disk cache of audio objects from cloud storage, used by
+    ``/audio/{id}`` in proxy mode.
+
+    ``path_for`` returns the local copy of a cached object (and marks it as
+    recently used). ``fill`` downloads a missing object in the background,
+    once per key, so the request that missed can be answered with a ranged
+    read from storage while later seeks are served from disk. Files are
+    written to a temporary name and renamed, so a cached file is always
+    complete; least recently used files are deleted when ``max_bytes`` would
+    be exceeded. Object metadata (size, type) is memoized for ``stat``.
+
+    The directory is shared by all workers of a host. The in-memory index is
+    only a hint: a file another worker cached is picked up on lookup, and the
+    index is rebuilt from disk (LRU order from mtimes, which lookups touch)
+    before anything is evicted, so ``max_bytes`` bounds the directory, not
+    one worker's share of it. ``path_for`` and ``stat`` do blocking I/O; call
+    them from a thread.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int,
+        storage_factory: Callable[[], Any],
+        max_object_fraction: float = 0.25,
+        workers: int = 2,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.storage_factory = storage_factory
+        # Larger objects are proxied but never cached, so one file cannot flush the whole cache.
+        self.max_object_bytes = int(max_bytes * max_object_fraction)
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()  # file name -> size, oldest first
+        self._total = 0
+        self._filling: Set[str] = set()
+        self._meta: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._loaded = False
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="audio_cache")
+        self._stats: Dict[str, int] = {
+            "hits": 0, "misses": 0, "fills": 0, "fill_errors": 0, "evictions": 0,
+            "bytes_from_cache": 0, "bytes_from_storage": 0,
+        }
+
+    @staticmethod
+    def _name(key: str) -> str:
+        ext = os.path.splitext(key)[1][:8]
+        return hashlib.sha256(key.encode("utf-8")).hexdigest() + ext
+
+    def _load(self):
+        """Removes downloads abandoned by dead processes and indexes the directory."""
+        if self._loaded:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        for name in os.listdir(self.directory):
+            if name.startswith(".tmp-") and not _process_alive(name.split("-")[1]):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    pass
+        self._loaded = True
+        self._evict(0)
+
+    def _scan(self):
+        """Rebuilds the index from the directory, least recently used first (by mtime)."""
+        found = []
+        for name in os.listdir(self.directory):
+            if name.startswith(".tmp-"):
+                continue
+            try:
+                st = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+            found.append((st.st_mtime, name, st.st_size))
+        self._entries = OrderedDict((name, size) for _, name, size in sorted(found))
+        self._total = sum(size for _, _, size in found)
+
+    def _evict(self, incoming: int):
+        # Other workers fill and evict in the same directory.
+        self._scan()
+        while self._entries and self._total + incoming > self.max_bytes:
+            name, size = self._entries.popitem(last=False)
+            self._total -= size
+            self._stats["evictions"] += 1
+            try:
+                # Readers that already opened the file keep their handle (POSIX).
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+
+    # --- Lookups ---
+
+    def stat(self, key: str) -> Optional[Dict[str, Any]]:
+        """Size, content type and etag of ``key`` (memoized; None if the object does not exist)."""
+        with self._lock:
+            meta = self._meta.get(key)
+            if meta is not None:
+                self._meta.move_to_end(key)
+                return meta
+        meta = self.storage_factory().head_object(key)
+        if meta is not None:
+            with self._lock:
+                self._meta[key] = meta
+                while len(self._meta) > 10000:
+                    self._meta.popitem(last=False)
+        return meta
+
+    def path_for(self, key: str) -> Optional[str]:
+        name = self._name(key)
+        path = os.path.join(self.directory, name)
+        with self._lock:
+            self._load()
+        try:
+            # Persists the LRU order across restarts and workers.
+            os.utime(path)
+            size = os.path.getsize(path)
+        except FileNotFoundError:
+            with self._lock:
+                self._stats["misses"] += 1
+                size = self._entries.pop(name, None)
+                if size is not None:
+                    self._total -= size
+            return None
+        with self._lock:
+            if name in self._entries:
+                self._entries.move_to_end(name)
+            else:
+                # Cached by another worker.
+                self._entries[name] = size
+                self._total += size
+            self._stats["hits"] += 1
+        return path
+
+    def record_served(self, from_cache: int = 0, from_storage: int = 0):
+        with self._lock:
+            self._stats["bytes_from_cache"] += from_cache
+            self._stats["bytes_from_storage"] += from_storage
+
+    # --- Filling ---
+
+    def fill(self, key: str, size: int) -> bool:
+        """Starts a background download of ``key`` unless it is cached, in flight or too large."""
+        if size > self.max_object_bytes:
+            return False
+        with self._lock:
+            self._load()
+            name = self._name(key)
+            if name in self._entries or name in self._filling:
+                return False
+            self._filling.add(name)
+        self._pool.submit(self._fill, key, name)
+        return True
+
+    def _fill(self, key: str, name: str):
+        tmp = os.path.join(self.directory, f".tmp-{os.getpid()}-{threading.get_ident()}-{name}")
+        try:
+            self.storage_factory().download_file(key, tmp)
+            size = os.path.getsize(tmp)
+            with self._lock:
+                self._evict(size)
+                os.replace(tmp, os.path.join(self.directory, name))
+                self._total += size - self._entries.pop(name, 0)
+                self._entries[name] = size
+                self._stats["fills"] += 1
+                self._stats["bytes_from_storage"] += size
+            logger.info(f"Cached audio object {key} ({size} bytes).")
+        except Exception as e:
+            with self._lock:
+                self._stats["fill_errors"] += 1
+            logger.warning(f"Could not cache audio object {key}: {e}")
+            try:
+                os.remove(tmp)
+            except FileNotFoundError:
+                pass
+        finally:
+            with self._lock:
+                self._filling.discard(name)
+
+    def wait_for_fills(self, timeout: float = 30.0):
+        """Blocks until no download is in flight (used by scripts)."""
+        deadline = time.monotonic() + timeout
+        while self._filling and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+                "files": len(self._entries),
+                "bytes": self._total,
+                "max_bytes": self.max_bytes,
+            }
+
+
+def _process_alive(pid: str) -> bool:
+    try:
+        os.kill(int(pid), 0)
+    except (ValueError, ProcessLookupError):
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _storage():
+    from app.services.storage import get_storage_service
+    return get_storage_service()
+
+
+# Singleton instance
+audio_cache = AudioCache(
+    directory=settings.AUDIO_CACHE_DIR,
+    max_bytes=settings.AUDIO_CACHE_MAX_MB * 1024 * 1024,
+    storage_factory=_storage,
+)
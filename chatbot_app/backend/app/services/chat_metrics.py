@@ -0,0 +1,146 @@
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from app.config import settings
+from app.services.stage_timer import StageTimer
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50)
+
+
+def _format_labels(label: Optional[str], value: Optional[str], extra: str = "") -> str:
+    parts = [f'{label}="{value}"'] if label and value is not None else []
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, label: Optional[str] = None):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self._values: Dict[Optional[str], float] = {}
+
+    def inc(self, label_value: Optional[str] = None, amount: float = 1.0):
+        self._values[label_value] = self._values.get(label_value, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for value, total in sorted(self._values.items(), key=lambda kv: str(kv[0])):
+            lines.append(f"{self.name}{_format_labels(self.label, value)} {total:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float], label: Optional[str] = None):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.label = label
+        # label value -> (per-bucket counts, sum, count)
+        self._series: Dict[Optional[str], Tuple[List[int], float, int]] = {}
+
+    def observe(self, value: float, label_value: Optional[str] = None):
+        counts, total, n = self._series.get(label_value, ([0] * len(self.buckets), 0.0, 0))
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+        self._series[label_value] = (counts, total + value, n + 1)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for value, (counts, total, n) in sorted(self._series.items(), key=lambda kv: str(kv[0])):
+            for bound, count in zip(self.buckets, counts):
+                le = f'le="{bound:g}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label, value, le)} {count}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.label, value, le)} {n}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label, value)} {total:.6f}")
+            lines.append(f"{self.name}_count{_format_labels(self.label, value)} {n}")
+        return lines
+
+
+class ChatMetrics:
+    """
+    Process-local latency, token and retrieval metrics of the streaming chat
+    endpoint, rendered in the Prometheus text format by ``GET /metrics``. Each
+    request is recorded once from its StageTimer; with ``trace_path`` set, the
+    timer is also appended there as one JSON line per request.
+    """
+
+    def __init__(self, trace_path: str = ""):
+        self.trace_path = trace_path
+        self._lock = threading.Lock()
+        self.requests = Counter("chat_requests_total", "Chat requests by routed intent.", label="intent")
+        self.errors = Counter("chat_errors_total", "Chat requests that ended with an error event or LLM error.", label="kind")
+        self.stage_seconds = Histogram(
+            "chat_stage_duration_seconds", "Duration of each chat pipeline stage.", LATENCY_BUCKETS, label="stage"
+        )
+        self.ttft_seconds = Histogram(
+            "chat_time_to_first_token_seconds", "Time from request start to the first streamed answer token.",
+            LATENCY_BUCKETS, label="intent",
+        )
+        self.tokens = Counter("chat_llm_tokens_total", "Tokens reported by the answer model.", label="kind")
+        self.retrieved_documents = Histogram(
+            "chat_retrieved_documents", "Source documents passed to the answer prompt.", COUNT_BUCKETS
+        )
+        self.hyde = Counter("chat_hyde_queries_total", "Questions searched with a hypothetical document.")
+        self.speculative = Counter(
+            "chat_speculative_retrievals_total", "Speculative raw-query searches by outcome.", label="outcome"
+        )
+
+    def observe(self, timer: StageTimer, session_id: Optional[str] = None):
+        info = timer.info
+        intent = str(info.get("intent", "unknown"))
+        total_ms = timer.as_dict()["total_ms"]
+        with self._lock:
+            self.requests.inc(intent)
+            for stage, ms in timer.stages.items():
+                self.stage_seconds.observe(ms / 1000, stage)
+            self.stage_seconds.observe(total_ms / 1000, "total")
+            if "first_token" in timer.marks:
+                self.ttft_seconds.observe(timer.marks["first_token"] / 1000, intent)
+            for kind in ("prompt_tokens", "completion_tokens"):
+                if info.get(kind):
+                    self.tokens.inc(kind.removesuffix("_tokens"), info[kind])
+            if "retrieved_documents" in info:
+                self.retrieved_documents.observe(info["retrieved_documents"])
+            if info.get("hyde"):
+                self.hyde.inc()
+            if "speculative_hit" in info:
+                self.speculative.inc("hit" if info["speculative_hit"] else "discarded")
+            if info.get("error"):
+                self.errors.inc(str(info["error"]))
+        if self.trace_path:
+            self._write_trace({"ts": time.time(), "session_id": session_id, **timer.as_dict()})
+
+    def _write_trace(self, record: Dict):
+        try:
+            line = json.dumps(record, default=str)
+            with self._lock:
+                os.makedirs(os.path.dirname(self.trace_path) or ".", exist_ok=True)
+                with open(self.trace_path, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+        except OSError as e:
+            logger.warning(f"Could not write chat trace record to {self.trace_path}: {e}")
+
+    def render(self) -> str:
+        with self._lock:
+            lines: List[str] = []
+            for metric in (
+                self.requests, self.errors, self.stage_seconds, self.ttft_seconds,
+                self.tokens, self.retrieved_documents, self.hyde, self.speculative,
+            ):
+                lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Singleton instance
+chat_metrics = ChatMetrics(trace_path=settings.CHAT_TRACE_PATH)
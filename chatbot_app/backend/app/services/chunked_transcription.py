@@ -0,0 +1,230 @@
+import os
+import re
+import time
+import logging
+import tempfile
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional
+
+from pydub import AudioSegment
+from pydub.silence import detect_silence
+from pydub.utils import mediainfo
+
+logger = logging.getLogger(__name__)
+
+# Chunks are re-encoded before upload so their size is predictable regardless of
+# the source container/codec. 64 kbit/s mono MP3 is ~480 KB per minute.
+CHUNK_EXPORT_FORMAT = "mp3"
+CHUNK_EXPORT_BITRATE_KBPS = 64
+
+# How far back from the hard size/duration boundary we look for a pause to cut on.
+SILENCE_SEARCH_MS = 30_000
+MIN_SILENCE_MS = 400
+
+
+def probe_duration_seconds(audio_path: str) -> Optional[float]:
+    """Returns the duration of an audio file via ffprobe, or None if unknown."""
+    try:
+        return float(mediainfo(audio_path).get("duration") or 0) or None
+    except Exception as e:
+        logger.warning(f"[chunked_transcription] Could not probe duration of {audio_path}: {e}")
+        return None
+
+
+def max_chunk_ms_for_size(max_bytes: int, bitrate_kbps: int = CHUNK_EXPORT_BITRATE_KBPS) -> int:
+    """Longest chunk (in ms) that stays below ``max_bytes`` at the export bitrate."""
+    bytes_per_ms = bitrate_kbps * 1000 / 8 / 1000
+    return int(max_bytes / bytes_per_ms)
+
+
+def plan_chunks(
+    audio: AudioSegment,
+    max_chunk_ms: int,
+    overlap_ms: int = 1500,
+    search_ms: int = SILENCE_SEARCH_MS,
+) -> List[Dict[str, int]]:
+    """
+    Splits the timeline into chunks no longer than ``max_chunk_ms``.
+
+    Each cut point is moved back to the middle of the last pause found within
+    ``search_ms`` before the hard boundary. Every chunk after the first also
+    starts ``overlap_ms`` before its cut point so words straddling a hard cut are
+    heard in full by at least one request; ``own_start_ms``/``own_end_ms`` mark
+    the part of the timeline each chunk is authoritative for when stitching.
+    """
+    total_ms = len(audio)
+    if total_ms <= max_chunk_ms:
+        return [{"index": 0, "start_ms": 0, "end_ms": total_ms, "own_start_ms": 0, "own_end_ms": total_ms}]
+
+    search_ms = min(search_ms, max_chunk_ms // 2)
+    silence_thresh = (audio.dBFS if audio.dBFS != float("-inf") else -60.0) - 16
+
+    cuts = [0]
+    while total_ms - cuts[-1] > max_chunk_ms:
+        # Leave room for the overlap so the exported chunk still fits the limit.
+        hard = cuts[-1] + max_chunk_ms - (overlap_ms if len(cuts) > 1 else 0)
+        window_start = max(cuts[-1] + 1, hard - search_ms)
+        window = audio[window_start:hard]
+        cut = hard
+        try:
+            silences = detect_silence(window, min_silence_len=MIN_SILENCE_MS, silence_thresh=silence_thresh)
+        except Exception:
+            silences = []
+        if silences:
+            s_start, s_end = silences[-1]
+            cut = window_start + (s_start + s_end) // 2
+        cuts.append(cut)
+    cuts.append(total_ms)
+
+    plan = []
+    for i in range(len(cuts) - 1):
+        own_start, own_end = cuts[i], cuts[i + 1]
+        plan.append({
+            "index": i,
+            "start_ms": max(0, own_start - overlap_ms) if i > 0 else 0,
+            "end_ms": own_end,
+            "own_start_ms": own_start,
+            "own_end_ms": own_end,
+        })
+    return plan
+
+
+def export_chunks(audio: AudioSegment, plan: List[Dict[str, int]], out_dir: str) -> List[str]:
+    """Writes each planned chunk to ``out_dir`` and returns the file paths in plan order."""
+    paths = []
+    for chunk in plan:
+        path = os.path.join(out_dir, f"chunk_{chunk['index']:04d}.{CHUNK_EXPORT_FORMAT}")
+        audio[chunk["start_ms"]:chunk["end_ms"]].export(
+            path, format=CHUNK_EXPORT_FORMAT, bitrate=f"{CHUNK_EXPORT_BITRATE_KBPS}k"
+        )
+        paths.append(path)
+    return paths
+
+
+def _normalize_text(text: str) -> str:
+    return re.sub(r"[^\w]+", " ", (text or "").lower()).strip()
+
+
+def stitch_segments(plan: List[Dict[str, int]], chunk_segments: List[List[dict]]) -> List[dict]:
+    """
+    Merges per-chunk ``verbose_json`` segments into a single timeline.
+
+    Segment times are shifted by the chunk's start offset. A segment is kept
+    only by the chunk that owns its midpoint, which removes the duplicate
+    transcription of the overlap region; an identical text at the seam is
+    dropped as a second safeguard.
+    """
+    merged: List[dict] = []
+    for chunk, segments in zip(plan, chunk_segments):
+        offset_s = chunk["start_ms"] / 1000.0
+        own_start_s = chunk["own_start_ms"] / 1000.0
+        own_end_s = chunk["own_end_ms"] / 1000.0
+        is_last = chunk is plan[-1]
+        for seg in segments or []:
+            start = round(seg["start"] + offset_s, 3)
+            end = round(seg["end"] + offset_s, 3)
+            mid = (start + end) / 2
+            if mid < own_start_s or (mid >= own_end_s and not is_last):
+                continue
+            if merged and _normalize_text(merged[-1]["text"]) == _normalize_text(seg["text"]) and start < merged[-1]["end"] + 1.0:
+                continue
+            if merged and start < merged[-1]["end"]:
+                start = merged[-1]["end"]
+            merged.append({"start": start, "end": max(start, end), "text": seg["text"]})
+    return merged
+
+
+def transcribe_file_segments(client, audio_path: str, model: str = "whisper-1") -> List[dict]:
+    """Sends a single file to the transcription API and returns its segments."""
+    with open(audio_path, "rb") as audio_file:
+        response = client.audio.transcriptions.create(
+            model=model,
+            file=audio_file,
+            response_format="verbose_json",
+        )
+    segments = []
+    for segment in response.segments or []:
+        segments.append({
+            "start": round(segment.start, 3),
+            "end": round(segment.end, 3),
+            "text": segment.text,
+        })
+    return segments
+
+
+def transcribe_chunked(
+    audio_path: str,
+    transcribe_file: Callable[[str], List[dict]],
+    max_chunk_ms: int,
+    max_workers: int = 4,
+    overlap_ms: int = 1500,
+    max_attempts: int = 3,
+    on_chunk_done: Optional[Callable[[int, int, List[dict]], None]] = None,
+) -> List[dict]:
+    """
+    Splits ``audio_path`` on silence, transcribes the chunks concurrently with at
+    most ``max_workers`` requests in flight, and returns the stitched segments.
+
+    Each chunk is retried up to ``max_attempts`` times so a single transient
+    API failure does not discard the work already done for the other chunks.
+    ``on_chunk_done(done_count, total, stitched_so_far)`` is called after every
+    completed chunk with the contiguous prefix of the timeline that is final.
+    """
+    audio = AudioSegment.from_file(audio_path).set_channels(1).set_frame_rate(16000)
+    plan = plan_chunks(audio, max_chunk_ms=max_chunk_ms, overlap_ms=overlap_ms)
+    logger.info(
+        f"[chunked_transcription] {len(audio) / 1000:.1f}s of audio split into {len(plan)} chunk(s), "
+        f"workers={max_workers}"
+    )
+
+    work_dir = tempfile.mkdtemp(prefix="chunks_")
+    try:
+        # Each chunk is exported by the worker that sends it, so the first
+        # requests start after one export instead of after all of them; the
+        # decoded audio is released once the last chunk is written.
+        source = {"audio": audio, "pending": len(plan)}
+        del audio
+        export_lock = threading.Lock()
+
+        def _export(index: int) -> str:
+            path = export_chunks(source["audio"], [plan[index]], work_dir)[0]
+            with export_lock:
+                source["pending"] -= 1
+                if not source["pending"]:
+                    source["audio"] = None
+            return path
+
+        def _run(index: int) -> List[dict]:
+            path = _export(index)
+            for attempt in range(1, max_attempts + 1):
+                try:
+                    return transcribe_file(path)
+                except Exception as e:
+                    if attempt == max_attempts:
+                        raise
+                    logger.warning(
+                        f"[chunked_transcription] Chunk {index} failed (attempt {attempt}/{max_attempts}): {e}"
+                    )
+                    time.sleep(2 ** (attempt - 1))
+            return []
+
+        results: List[Optional[List[dict]]] = [None] * len(plan)
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+            futures = {pool.submit(_run, i): i for i in range(len(plan))}
+            done = 0
+            for future in as_completed(futures):
+                index = futures[future]
+                results[index] = future.result()
+                done += 1
+                if on_chunk_done:
+                    ready = 0
+                    while ready < len(results) and results[ready] is not None:
+                        ready += 1
+                    partial = stitch_segments(plan[:ready], results[:ready])  # type: ignore[arg-type]
+                    on_chunk_done(done, len(plan), partial)
+
+        return stitch_segments(plan, results)  # type: ignore[arg-type]
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
@@ -1,4 +1,5 @@
 import os
+import re
 import json
 import logging
 from google.generativeai.client import configure
@@ -6,6 +7,7 @@ from google.generativeai.generative_models import GenerativeModel
 from google.generativeai.types import GenerationConfig, HarmCategory, HarmBlockThreshold
 from app.config import settings
 from app.services.prompt_engine import create_prompt_from_template
+from app.services import windowed_processing
 
 # --- Logging Setup ---
 logger = logging.getLogger(__name__)
@@ -17,19 +19,17 @@ try:
 except Exception as e:
     logger.error(f"Failed to configure Google Generative AI: {e}", exc_info=True)
 
-def process_full_transcript(transcription_segments: list[dict], task_id: str) -> dict:
-    """
-    Formats a list of timestamped transcription segments and sends it to the
-    Gemini model for advanced diarization. Saves the raw response for debugging.
-    """
-    logger.info("Formatting timestamped transcript and sending to Gemini for processing...")
-    
-    # Format the segments into a human-readable, timestamped string
-    formatted_transcript = "\n".join(
+_LINE_PATTERN = re.compile(r"^\s*(\[[^\]]+\])\s*:?\s*(.*)$")
+
+def _format_transcript(segments: list[dict]) -> str:
+    """Formats the segments into a human-readable, timestamped string."""
+    return "\n".join(
         f"[{segment['start']:07.2f} -> {segment['end']:07.2f}] {segment['text']}"
-        for segment in transcription_segments
+        for segment in segments
     )
 
+def _generate_with_gemini(formatted_transcript: str, log_name: str) -> dict:
+    """Sends one formatted transcript to Gemini and returns the parsed JSON response."""
     model = GenerativeModel('gemini-1.5-pro')
     
     # Use the prompt from the file via the prompt engine. This ensures consistency.
@@ -73,7 +73,7 @@ def process_full_transcript(transcription_segments: list[dict], task_id: str) ->
         try:
             logs_dir = os.path.join(os.path.dirname(__file__), '..', 'llm_logs')
             os.makedirs(logs_dir, exist_ok=True)
-            log_file_path = os.path.join(logs_dir, f"{task_id}_gemini_response.txt")
+            log_file_path = os.path.join(logs_dir, f"{log_name}_gemini_response.txt")
             with open(log_file_path, "w", encoding="utf-8") as f:
                 f.write(raw_response_text)
             logger.info(f"Saved Gemini response to {log_file_path}")
@@ -95,4 +95,46 @@ def process_full_transcript(transcription_segments: list[dict], task_id: str) ->
         raw_response_text = response.text if response else "No response"
         logger.error(f"Raw Gemini response was: {raw_response_text}")
         # Re-raise the exception to be handled by the background task manager
-        raise e
\ No newline at end of file
+        raise e
+
+def _transcript_lines(full_transcript: str) -> list[dict]:
+    """Splits a role-labelled ``full_transcript`` into ``{"speaker", "text"}`` entries."""
+    lines = []
+    for line in (full_transcript or "").splitlines():
+        if not line.strip():
+            continue
+        match = _LINE_PATTERN.match(line)
+        if match:
+            lines.append({"speaker": match.group(1), "text": match.group(2).strip()})
+        else:
+            lines.append({"speaker": "", "text": line.strip()})
+    return lines
+
+def process_full_transcript(transcription_segments: list[dict], task_id: str) -> dict:
+    """
+    Formats a list of timestamped transcription segments and sends it to the
+    Gemini model for advanced diarization. Saves the raw response for debugging.
+
+    Transcripts above ``POST_PROCESS_WINDOW_TOKENS`` are diarized in overlapping
+    windows concurrently and merged with reconciled speaker labels, which keeps
+    each response well below the output token limit.
+    """
+    logger.info("Formatting timestamped transcript and sending to Gemini for processing...")
+
+    if not windowed_processing.should_window(
+        transcription_segments, settings.POST_PROCESS_WINDOWING, settings.POST_PROCESS_WINDOW_TOKENS
+    ):
+        return _generate_with_gemini(_format_transcript(transcription_segments), task_id)
+
+    def _diarize_window(index: int, window: list[dict]) -> list[dict]:
+        result = _generate_with_gemini(_format_transcript(window), f"{task_id}_w{index:03d}")
+        return _transcript_lines(result.get("full_transcript", ""))
+
+    merged = windowed_processing.process_windowed(
+        transcription_segments,
+        process_window=_diarize_window,
+        max_tokens=settings.POST_PROCESS_WINDOW_TOKENS,
+        overlap_segments=settings.POST_PROCESS_WINDOW_OVERLAP_SEGMENTS,
+        max_workers=settings.POST_PROCESS_WINDOW_WORKERS,
+    )
+    return {"full_transcript": "\n".join(f"{line['speaker']}: {line['text']}" for line in merged)}
@@ -0,0 +1,254 @@
+import os
+import time
+import queue
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+EmbedFn = Callable[[List[str]], Sequence[Sequence[float]]]
+
+
+def _openai_embed(texts: List[str]) -> Sequence[Sequence[float]]:
+    from app.services import vector_db
+    return vector_db.openai_ef(texts)
+
+
+def cache_key(model: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\x00{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingService:
+    """
+    Embeds texts for the chat and ingestion paths with caching and batching.
+
+    Lookups go through an in-memory LRU, then an SQLite store on disk, both
+    keyed by ``(model, sha256(text))``. Remaining texts are queued for a
+    dispatcher thread that waits up to ``batch_window_ms`` for other callers
+    and sends everything queued (at most ``max_batch`` texts) as one
+    embeddings request; up to ``max_concurrent_batches`` requests run at once,
+    so large ingestion batches are not serialized. A text already in flight
+    is not requested twice; later callers wait for the same result.
+    """
+
+    def __init__(
+        self,
+        embed_fn: Optional[EmbedFn] = None,
+        model: str = settings.EMBEDDING_MODEL,
+        cache_size: int = 10_000,
+        disk_path: Optional[str] = None,
+        max_batch: int = 64,
+        batch_window_ms: float = 5.0,
+        max_concurrent_batches: int = 4,
+    ):
+        self.embed_fn = embed_fn or _openai_embed
+        self.model = model
+        self.cache_size = cache_size
+        self.disk_path = disk_path
+        self.max_batch = max(1, max_batch)
+        self.batch_window_ms = batch_window_ms
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._inflight: Dict[str, Future] = {}
+        self._queue: "queue.Queue[tuple[str, str]]" = queue.Queue()
+        self._dispatcher: Optional[threading.Thread] = None
+        self._pool = ThreadPoolExecutor(max_workers=max(1, max_concurrent_batches), thread_name_prefix="embedding_batch")
+        self._disk_lock = threading.Lock()
+        self._disk: Optional[sqlite3.Connection] = None
+        self._stats: Dict[str, int] = {
+            "requests": 0, "memory_hits": 0, "disk_hits": 0, "coalesced": 0, "misses": 0,
+            "api_calls": 0, "api_texts": 0, "max_batch_size": 0, "errors": 0,
+        }
+
+    # --- Disk store ---
+
+    def _disk_conn(self) -> Optional[sqlite3.Connection]:
+        if self._disk is None and self.disk_path:
+            try:
+                os.makedirs(os.path.dirname(self.disk_path) or ".", exist_ok=True)
+                conn = sqlite3.connect(self.disk_path, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+                conn.commit()
+                self._disk = conn
+            except sqlite3.Error as e:
+                logger.warning(f"Embedding disk cache unavailable at {self.disk_path}: {e}")
+                self.disk_path = None
+        return self._disk
+
+    def _disk_get(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        with self._disk_lock:
+            conn = self._disk_conn()
+            if conn is None or not keys:
+                return {}
+            found = {}
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                rows = conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                found.update({key: np.frombuffer(blob, dtype=np.float32) for key, blob in rows})
+            return found
+
+    def _disk_put(self, items: Dict[str, np.ndarray]):
+        with self._disk_lock:
+            conn = self._disk_conn()
+            if conn is None or not items:
+                return
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                    [(key, vec.astype(np.float32).tobytes()) for key, vec in items.items()],
+                )
+
+    # --- Memory LRU ---
+
+    def _remember(self, key: str, vector: np.ndarray):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.cache_size:
+            self._memory.popitem(last=False)
+
+    # --- Batching ---
+
+    def _ensure_dispatcher(self):
+        if self._dispatcher is None or not self._dispatcher.is_alive():
+            self._dispatcher = threading.Thread(target=self._dispatch_loop, name="embedding_batcher", daemon=True)
+            self._dispatcher.start()
+
+    def _dispatch_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.batch_window_ms / 1000
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._pool.submit(self._run_batch, batch)
+
+    def _release(self, keys: List[str], futures: List[Future]):
+        """Unregisters a batch's futures (under ``_lock``); a newer future for the same key is left alone."""
+        for key, future in zip(keys, futures):
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def _run_batch(self, batch: List[tuple]):
+        keys = [key for key, _ in batch]
+        texts = [text for _, text in batch]
+        with self._lock:
+            owned = [self._inflight[key] for key in keys]
+        try:
+            try:
+                vectors = [np.asarray(v, dtype=np.float32) for v in self.embed_fn(texts)]
+                if len(vectors) != len(texts):
+                    raise ValueError(f"Embedding function returned {len(vectors)} vectors for {len(texts)} texts")
+            except Exception as e:
+                with self._lock:
+                    self._stats["errors"] += 1
+                    self._release(keys, owned)
+                for future in owned:
+                    future.set_exception(e)
+                return
+            with self._lock:
+                self._stats["api_calls"] += 1
+                self._stats["api_texts"] += len(texts)
+                self._stats["max_batch_size"] = max(self._stats["max_batch_size"], len(texts))
+                for key, vector in zip(keys, vectors):
+                    self._remember(key, vector)
+                self._release(keys, owned)
+            for future, vector in zip(owned, vectors):
+                future.set_result(vector)
+            # Best effort: the callers already have their vectors.
+            try:
+                self._disk_put(dict(zip(keys, vectors)))
+            except sqlite3.Error as e:
+                logger.warning(f"Could not write {len(keys)} embedding(s) to the disk cache: {e}")
+        finally:
+            # Whatever went wrong, nobody may wait forever on this batch or attach to its futures later.
+            with self._lock:
+                self._release(keys, owned)
+            for future in owned:
+                if not future.done():
+                    future.set_exception(RuntimeError("Embedding batch failed"))
+
+    # --- Public API ---
+
+    def embed(self, texts: Sequence[str]) -> List[np.ndarray]:
+        """Returns one float32 vector per text, in order. Blocks until all are available."""
+        keys = [cache_key(self.model, t) for t in texts]
+        results: Dict[str, np.ndarray] = {}
+        pending: Dict[str, Future] = {}
+        with self._lock:
+            self._stats["requests"] += len(texts)
+            for key in keys:
+                if key in results or key in pending:
+                    continue
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    results[key] = self._memory[key]
+                    self._stats["memory_hits"] += 1
+        lookup = [key for key in dict.fromkeys(keys) if key not in results]
+        from_disk = self._disk_get(lookup)
+        with self._lock:
+            for key, text in zip(keys, texts):
+                if key in results or key in pending:
+                    continue
+                if key in self._memory:
+                    results[key] = self._memory[key]
+                    self._stats["memory_hits"] += 1
+                elif key in from_disk:
+                    results[key] = from_disk[key]
+                    self._remember(key, from_disk[key])
+                    self._stats["disk_hits"] += 1
+                elif key in self._inflight:
+                    pending[key] = self._inflight[key]
+                    self._stats["coalesced"] += 1
+                else:
+                    future: Future = Future()
+                    self._inflight[key] = future
+                    pending[key] = future
+                    self._queue.put((key, text))
+                    self._stats["misses"] += 1
+            if pending:
+                self._ensure_dispatcher()
+        for key, future in pending.items():
+            results[key] = future.result()
+        return [results[key] for key in keys]
+
+    def embed_one(self, text: str) -> np.ndarray:
+        return self.embed([text])[0]
+
+    async def embed_async(self, texts: Sequence[str]) -> List[np.ndarray]:
+        return await asyncio.to_thread(self.embed, list(texts))
+
+    def get_stats(self) -> Dict[str, float]:
+        with self._lock:
+            stats: Dict[str, float] = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+        hits = stats["memory_hits"] + stats["disk_hits"] + stats["coalesced"]
+        stats["hit_ratio"] = round(hits / stats["requests"], 4) if stats["requests"] else 0.0
+        stats["mean_batch_size"] = round(stats["api_texts"] / stats["api_calls"], 2) if stats["api_calls"] else 0.0
+        return stats
+
+
+# Singleton instance
+embedding_service = EmbeddingService(
+    model=settings.EMBEDDING_MODEL,
+    cache_size=settings.EMBEDDING_CACHE_SIZE,
+    disk_path=settings.EMBEDDING_CACHE_PATH or os.path.join(settings.CHROMA_DB_PATH, "embedding_cache.sqlite3"),
+    max_batch=settings.EMBEDDING_MAX_BATCH,
+    batch_window_ms=settings.EMBEDDING_BATCH_WINDOW_MS,
+    max_concurrent_batches=settings.EMBEDDING_MAX_CONCURRENT_BATCHES,
+)
@@ -1,69 +1,189 @@
-import chromadb
-from typing import List, Dict, Any
+import asyncio
+import json
+import logging
+from typing import List, Dict, Any, AsyncIterator, Callable, Optional
 from app.config import settings
-from chromadb.utils import embedding_functions
+from app.services import vector_db
+from app.services.embedding_service import embedding_service
+from app.services.semantic_cache import semantic_cache
+from app.services.vector_db import journey_index
+from app.services.lexical_index import lexical_index
+
+logger = logging.getLogger(__name__)
+
+# Per-line errors kept in the stream ingestion report; the counters stay exact.
+MAX_REPORTED_ERRORS = 100
+
+
+class IngestionStreamInterrupted(Exception):
+    """The NDJSON body ended early (client disconnect); ``report`` says what was committed."""
+
+    def __init__(self, report: Dict[str, Any], cause: Exception):
+        super().__init__(f"Stream interrupted after line {report['committed_lines']}: {cause}")
+        self.report = report
+
+
+def _parse_line(line: bytes) -> Dict[str, Any]:
+    """Validates one NDJSON record; raises ValueError with a message fit for the report."""
+    try:
+        doc = json.loads(line)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"invalid JSON: {e}") from None
+    if not isinstance(doc, dict) or not isinstance(doc.get('document_text'), str):
+        raise ValueError("'document_text' must be a string")
+    metadata = doc.get('metadata')
+    if not isinstance(metadata, dict) or metadata.get('id') in (None, ""):
+        raise ValueError("'metadata.id' is required")
+    return doc
 
 class IngestionService:
     """
-    A service to handle the ingestion of documents into the ChromaDB collection.
-    It generates embeddings on the fly and stores the documents.
+    A service to handle the ingestion of documents into the journey store
+    (Chroma or the local vector store, see ``VECTOR_STORE_BACKEND``).
     """
 
-    def __init__(self):
-        """Initializes the ChromaDB client and the embedding function."""
-        self.client = chromadb.PersistentClient(path=settings.CHROMA_DB_PATH)
-        self.openai_ef = embedding_functions.OpenAIEmbeddingFunction(
-            api_key=settings.OPENAI_API_KEY,
-            model_name=settings.EMBEDDING_MODEL
-        )
-        self.collection = self._get_or_create_collection()
-
-    def _get_or_create_collection(self):
-        """
-        Retrieves the collection from ChromaDB or creates it if it doesn't exist.
-        """
-        try:
-            collection = self.client.get_collection(
-                name=settings.CHROMA_COLLECTION_NAME,
-                embedding_function=self.openai_ef # type: ignore
-            )
-            print(f"Collection '{settings.CHROMA_COLLECTION_NAME}' loaded.")
-        except Exception:
-            print(f"Collection '{settings.CHROMA_COLLECTION_NAME}' not found. Creating a new one.")
-            collection = self.client.create_collection(
-                name=settings.CHROMA_COLLECTION_NAME,
-                embedding_function=self.openai_ef # type: ignore
-            )
-        return collection
+    @property
+    def store(self):
+        return vector_db.get_store()
 
     def ingest_documents(self, documents: List[Dict[str, Any]]):
         """
-        Processes and ingests a list of documents into the collection.
+        Processes and ingests a list of documents into the store. Documents
+        whose id already exists replace the stored version.
 
         Args:
             documents: A list of dictionaries, where each dictionary represents
                        a document to be ingested. Expected to have 'document_text'
-                       and 'metadata' keys.
+                       and 'metadata' keys; 'embedding' is computed (in batches,
+                       through the embedding cache) when missing.
         """
         if not documents:
             print("No documents provided for ingestion.")
             return
 
         docs_to_embed = [doc['document_text'] for doc in documents]
-        embeddings = [doc['embedding'] for doc in documents]
+        embeddings = [doc.get('embedding') for doc in documents]
         metadatas = [doc['metadata'] for doc in documents]
         ids = [str(meta.get('id', i)) for i, meta in enumerate(metadatas)]
 
-        # The embedding function is not used here, as we are providing pre-computed embeddings.
-        print(f"Ingesting {len(docs_to_embed)} documents with pre-computed embeddings...")
-        self.collection.add(
-            embeddings=embeddings,
-            documents=docs_to_embed,
-            metadatas=metadatas,
-            ids=ids
-        )
+        print(f"Ingesting {len(docs_to_embed)} documents...")
+        self._upsert(ids, embeddings, docs_to_embed, metadatas)
         print(f"Successfully ingested {len(docs_to_embed)} documents.")
-        print(f"Total items in collection: {self.collection.count()}")
+        print(f"Total items in store: {self.store.count()}")
+
+    def _upsert(self, ids: List[str], embeddings: List[Any], documents: List[str], metadatas: List[Dict[str, Any]]):
+        """Embeds documents without vectors, then upserts them into the store and the side indexes."""
+        missing = [i for i, emb in enumerate(embeddings) if emb is None]
+        if missing:
+            logger.info(f"Embedding {len(missing)} documents without pre-computed embeddings...")
+            for i, vector in zip(missing, embedding_service.embed([documents[i] for i in missing])):
+                embeddings[i] = vector
+        self.store.add(ids, embeddings, documents, metadatas)
+        journey_index.add(ids)
+        lexical_index.add(ids, documents)
+        # Cached plans and answers were computed against the old corpus.
+        semantic_cache.invalidate()
+
+    def _upsert_chunk(self, chunk: Dict[str, Dict[str, Any]]):
+        ids = list(chunk)
+        self._upsert(
+            ids,
+            [chunk[i].get('embedding') for i in ids],
+            [chunk[i]['document_text'] for i in ids],
+            [chunk[i]['metadata'] for i in ids],
+        )
+
+    async def ingest_stream(
+        self,
+        body: AsyncIterator[bytes],
+        chunk_size: int = settings.INGEST_CHUNK_SIZE,
+        start_line: int = 0,
+        on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Ingests an NDJSON body (one ``ingest_documents`` record per line) while
+        it is being received, upserting every ``chunk_size`` valid records keyed
+        by ``metadata.id``. Memory is bounded by one chunk plus one line.
+
+        Invalid lines and failed chunks are counted and reported without
+        stopping the load. ``committed_lines`` in the report is the number of
+        leading lines that are fully handled; passing it back as ``start_line``
+        resumes an interrupted load, and replaying lines is harmless because
+        writes are upserts. Raises IngestionStreamInterrupted if the body
+        breaks off; complete lines received before that are still committed.
+        """
+        max_line = settings.INGEST_MAX_LINE_MB * 1024 * 1024
+        report: Dict[str, Any] = {
+            "lines": 0, "skipped_lines": 0, "committed_lines": start_line,
+            "upserted": 0, "failed": 0, "chunks": 0, "errors": [],
+        }
+        # Keyed by id so a repeated id within a chunk upserts once (last line wins).
+        chunk: Dict[str, Dict[str, Any]] = {}
+        chunk_first_line = start_line + 1
+
+        def record_error(error: Dict[str, Any]):
+            if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                report["errors"].append(error)
+
+        async def flush():
+            nonlocal chunk, chunk_first_line
+            if chunk:
+                try:
+                    await asyncio.to_thread(self._upsert_chunk, chunk)
+                    report["upserted"] += len(chunk)
+                except Exception as e:
+                    logger.error(f"Ingestion chunk of lines {chunk_first_line}-{report['lines']} failed: {e}", exc_info=True)
+                    report["failed"] += len(chunk)
+                    record_error({"lines": [chunk_first_line, report["lines"]], "ids": len(chunk), "error": str(e)})
+                report["chunks"] += 1
+            report["committed_lines"] = report["lines"]
+            chunk, chunk_first_line = {}, report["lines"] + 1
+            if on_progress is not None:
+                on_progress(report)
+
+        async def handle(line: bytes):
+            report["lines"] += 1
+            if report["lines"] <= start_line:
+                report["skipped_lines"] += 1
+                return
+            if not line.strip():
+                return
+            try:
+                doc = _parse_line(line)
+            except ValueError as e:
+                report["failed"] += 1
+                record_error({"line": report["lines"], "error": str(e)})
+                return
+            chunk[str(doc['metadata']['id'])] = doc
+            if len(chunk) >= chunk_size:
+                await flush()
+
+        buffer = bytearray()
+        try:
+            async for data in body:
+                buffer += data
+                start = 0
+                while True:
+                    end = buffer.find(b"\n", start)
+                    if end < 0:
+                        break
+                    await handle(bytes(buffer[start:end]))
+                    start = end + 1
+                del buffer[:start]
+                if len(buffer) > max_line:
+                    raise ValueError(f"Line {report['lines'] + 1} exceeds INGEST_MAX_LINE_MB ({settings.INGEST_MAX_LINE_MB} MB)")
+        except Exception as e:
+            # The partial line in the buffer is dropped; it is resent on resume.
+            await flush()
+            raise IngestionStreamInterrupted(report, e) from e
+        if buffer:
+            await handle(bytes(buffer))
+        await flush()
+        logger.info(
+            f"Stream ingestion finished: {report['upserted']} upserted, {report['failed']} failed "
+            f"in {report['chunks']} chunk(s), {report['lines']} line(s)."
+        )
+        return report
 
 # Singleton instance
-ingestion_service = IngestionService()
\ No newline at end of file
+ingestion_service = IngestionService()
@@ -0,0 +1,149 @@
+import os
+import re
+import sqlite3
+import logging
+import threading
+from typing import List, Optional, Sequence, Tuple
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Long inputs (e.g. a HyDE document) are cut to this many distinct terms; BM25
+# scoring over hundreds of OR-ed terms costs more than it adds.
+MAX_QUERY_TERMS = 64
+REBUILD_PAGE_SIZE = 5000
+
+
+def query_terms(text: str) -> List[str]:
+    terms = list(dict.fromkeys(t.lower() for t in re.findall(r"\w+", text or "")))
+    return terms[:MAX_QUERY_TERMS]
+
+
+class LexicalIndex:
+    """
+    BM25 index over journey documents, stored as an SQLite FTS5 table next to
+    the Chroma store.
+
+    Documents are keyed by their Chroma id; ``add`` replaces existing entries,
+    so re-ingesting a journey does not duplicate it. The ``unicode61`` tokenizer
+    folds case and diacritics ("Müller" matches "muller"). If the running
+    SQLite lacks FTS5 the index reports itself unavailable and callers fall
+    back to dense search.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._available = True
+        self._rebuilding = False
+        self._populated = False
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        if self._conn is None and self._available:
+            try:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                conn = sqlite3.connect(self.path, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("CREATE TABLE IF NOT EXISTS journeys (rowid INTEGER PRIMARY KEY, doc_id TEXT UNIQUE NOT NULL)")
+                conn.execute(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS journeys_fts USING fts5(body, tokenize='unicode61 remove_diacritics 2')"
+                )
+                conn.commit()
+                self._conn = conn
+            except sqlite3.Error as e:
+                logger.warning(f"Lexical index unavailable at {self.path}: {e}. Hybrid search falls back to vector search.")
+                self._available = False
+        return self._conn
+
+    def add(self, ids: Sequence[str], documents: Sequence[str]):
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return
+            with conn:
+                for doc_id, body in zip(ids, documents):
+                    row = conn.execute("SELECT rowid FROM journeys WHERE doc_id = ?", (doc_id,)).fetchone()
+                    if row is None:
+                        rowid = conn.execute("INSERT INTO journeys (doc_id) VALUES (?)", (doc_id,)).lastrowid
+                    else:
+                        rowid = row[0]
+                        conn.execute("DELETE FROM journeys_fts WHERE rowid = ?", (rowid,))
+                    conn.execute("INSERT INTO journeys_fts (rowid, body) VALUES (?, ?)", (rowid, body or ""))
+            self._populated = self._populated or bool(ids)
+
+    def count(self) -> int:
+        with self._lock:
+            conn = self._connect()
+            return conn.execute("SELECT COUNT(*) FROM journeys").fetchone()[0] if conn else 0
+
+    def search(self, text: str, limit: int) -> List[Tuple[str, float]]:
+        """Returns ``(doc_id, bm25_score)`` pairs, best first (FTS5 scores are negative; lower is better)."""
+        terms = query_terms(text)
+        if not terms:
+            return []
+        match = " OR ".join(f'"{t}"' for t in terms)
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return []
+            rows = conn.execute(
+                "SELECT j.doc_id, bm25(journeys_fts) AS score FROM journeys_fts "
+                "JOIN journeys j ON j.rowid = journeys_fts.rowid "
+                "WHERE journeys_fts MATCH ? ORDER BY score LIMIT ?",
+                (match, limit),
+            ).fetchall()
+        return [(doc_id, score) for doc_id, score in rows]
+
+    @property
+    def available(self) -> bool:
+        with self._lock:
+            return self._connect() is not None and not self._rebuilding
+
+    def rebuild_from(self, store):
+        """Indexes every document already in ``store`` (page by page)."""
+        self._rebuilding = True
+        try:
+            offset = 0
+            while True:
+                page = store.get(limit=REBUILD_PAGE_SIZE, offset=offset, include=["documents"])
+                if not page["ids"]:
+                    break
+                self.add(page["ids"], page["documents"] or [])
+                offset += len(page["ids"])
+            logger.info(f"Lexical index rebuilt with {offset} document(s).")
+        finally:
+            self._rebuilding = False
+
+    def ensure_built(self, store):
+        """
+        Starts a background rebuild when the index is empty but the store
+        is not (e.g. it was populated by another process before hybrid search
+        existed). Searches use the dense path until the rebuild finishes.
+        """
+        if self._populated or self._rebuilding or not self._available:
+            return
+        if self.count() > 0:
+            self._populated = True
+            return
+        if store.count() == 0:
+            return
+        self._rebuilding = True
+        threading.Thread(target=self.rebuild_from, args=(store,), name="lexical_index_rebuild", daemon=True).start()
+
+
+def rrf_fuse(rankings: Sequence[Sequence[str]], k: int = 60) -> List[str]:
+    """Reciprocal rank fusion: orders ids by the sum of ``1 / (k + rank)`` over all rankings."""
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=lambda doc_id: scores[doc_id], reverse=True)
+
+
+# Singleton instance
+lexical_index = LexicalIndex(
+    settings.LEXICAL_INDEX_PATH
+    or os.path.join(settings.CHROMA_DB_PATH, f"{settings.CHROMA_COLLECTION_NAME}.bm25.sqlite3")
+)
@@ -0,0 +1,147 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from app import database
+from app.services import transcript_search
+
+logger = logging.getLogger(__name__)
+
+# (upper bound of recording length in minutes, label) for the time-to-first-segment breakdown.
+LENGTH_BUCKETS = ((10, "<10min"), (30, "10-30min"), (60, "30-60min"), (None, ">60min"))
+_SAMPLES = 500
+
+# Process-local samples, exposed through /live-transcripts/stats:
+# (seconds from pipeline start to the first stored segment, recording length in seconds).
+_ttfs: Deque[Tuple[float, Optional[float]]] = deque(maxlen=_SAMPLES)
+_stats: Dict[str, Any] = {"transcriptions": 0, "revisions": 0, "rows_written": 0, "write_failures": 0}
+
+
+class LiveTranscript:
+    """
+    Keeps the stored segments of a transcription in step with a running
+    pipeline: raw segments as transcription chunks finish, then processed
+    segments replacing the raw ones from the start as post-processing windows
+    finish. The stored list is always processed segments followed by the raw
+    segments they do not cover yet.
+
+    ``publish_*`` may be called from worker threads. Writes happen on the event
+    loop in a single background task that only stores the latest state, so a
+    slow database never holds up the pipeline, and each write rewrites just the
+    tail that changed under a new revision (see ``transcript_search.segments_since``).
+    """
+
+    def __init__(self, transcription_id: int, started_at: float):
+        self.transcription_id = transcription_id
+        self.started_at = started_at
+        self.revision = 0
+        self.first_segment_seconds: Optional[float] = None
+        self._loop = asyncio.get_running_loop()
+        self._raw: List[dict] = []
+        self._processed: List[dict] = []
+        self._processed_covers = 0
+        self._stored: List[Tuple[Any, ...]] = []
+        self._changed = asyncio.Event()
+        self._closing = False
+        self._writer = asyncio.create_task(self._run())
+        _stats["transcriptions"] += 1
+
+    def publish_raw(self, segments: List[dict]):
+        """The raw timeline transcribed so far (a growing prefix of the recording)."""
+        self._loop.call_soon_threadsafe(self._set, list(segments), None, 0)
+
+    def publish_processed(self, segments: List[dict], covers: int):
+        """Processed segments that replace the first ``covers`` raw segments."""
+        self._loop.call_soon_threadsafe(self._set, None, list(segments), covers)
+
+    def _set(self, raw: Optional[List[dict]], processed: Optional[List[dict]], covers: int):
+        if raw is not None:
+            self._raw = raw
+        if processed is not None:
+            self._processed, self._processed_covers = processed, covers
+        self._changed.set()
+
+    def _rows(self) -> List[Dict[str, Any]]:
+        rows = transcript_search.segment_rows(self.transcription_id, self._processed, processed=True)
+        rows += transcript_search.segment_rows(
+            self.transcription_id, self._raw[self._processed_covers:], processed=False, start_index=len(rows)
+        )
+        return rows
+
+    async def _write(self):
+        rows = self._rows()
+        keys = [(r["start_time"], r["end_time"], r["speaker"], r["text"], r["processed"]) for r in rows]
+        from_index = 0
+        while from_index < min(len(keys), len(self._stored)) and keys[from_index] == self._stored[from_index]:
+            from_index += 1
+        if from_index == len(keys) == len(self._stored):
+            return
+        async with database.AsyncSessionLocal() as db:
+            revision = await transcript_search.replace_segments_from(db, self.transcription_id, from_index, rows[from_index:])
+            await db.commit()
+        self._stored, self.revision = keys, revision
+        _stats["revisions"] += 1
+        _stats["rows_written"] += len(rows) - from_index
+        if self.first_segment_seconds is None and rows:
+            self.first_segment_seconds = round(time.perf_counter() - self.started_at, 3)
+            logger.info(f"[live_transcript] Transcription {self.transcription_id}: first segments stored after {self.first_segment_seconds}s")
+
+    async def _run(self):
+        while True:
+            await self._changed.wait()
+            self._changed.clear()
+            try:
+                await self._write()
+            except Exception as e:
+                _stats["write_failures"] += 1
+                logger.warning(f"[live_transcript] Could not store segments of transcription {self.transcription_id}: {e}")
+            if self._closing and not self._changed.is_set():
+                return
+
+    async def close(self, audio_seconds: Optional[float] = None):
+        """Waits until the latest published state is stored and records the time to the first segment."""
+        await asyncio.sleep(0)  # let pending publish_* callbacks run first
+        self._closing = True
+        self._changed.set()
+        await self._writer
+        if self.first_segment_seconds is not None:
+            _ttfs.append((self.first_segment_seconds, audio_seconds))
+
+    async def discard(self):
+        """Stops writing without waiting for pending updates (the pipeline failed)."""
+        self._writer.cancel()
+        try:
+            await self._writer
+        except (asyncio.CancelledError, Exception):
+            pass
+
+
+def _summary(values: List[float]) -> Dict[str, Any]:
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+    return {
+        "count": len(ordered),
+        "p50_seconds": ordered[len(ordered) // 2],
+        "p95_seconds": ordered[int(0.95 * (len(ordered) - 1))],
+        "max_seconds": ordered[-1],
+    }
+
+
+def get_stats() -> Dict[str, Any]:
+    """Write counters and time to first stored segment, overall and by recording length."""
+    by_length: Dict[str, List[float]] = {label: [] for _, label in LENGTH_BUCKETS}
+    for seconds, audio_seconds in _ttfs:
+        if audio_seconds is None:
+            continue
+        for upper, label in LENGTH_BUCKETS:
+            if upper is None or audio_seconds < upper * 60:
+                by_length[label].append(seconds)
+                break
+    return {
+        **_stats,
+        "time_to_first_segment": _summary([seconds for seconds, _ in _ttfs]),
+        "time_to_first_segment_by_length": {label: _summary(values) for label, values in by_length.items()},
+    }
@@ -26,6 +26,7 @@ However, you can also engage in general conversation (chitchat). When doing so,
 *User:* "What's the best way to cook a steak?"
 *You:* "A great way is to pan-sear it with butter and herbs for a nice crust! Speaking of performance, was there any campaign data you wanted to analyze?"
 """
+ERROR_RESPONSE = "Sorry, I encountered an error while generating a response."
 RAG_SYSTEM_PROMPT = "You are a helpful AI assistant. Your task is to synthesize an answer from the provided context. If the context is not sufficient, say you don't have enough information."
 
 async def get_structured_response(prompt: str, response_model: Any) -> Any:
@@ -70,12 +71,18 @@ async def get_llm_response(prompt: str, is_chitchat: bool = False, history: Opti
         return response.choices[0].message.content or "No response from the model."
     except Exception as e:
         logger.error(f"An error occurred in get_llm_response: {e}", exc_info=True)
-        return "Sorry, I encountered an error while generating a response."
+        return ERROR_RESPONSE
 
-async def get_llm_response_stream(prompt: str, is_chitchat: bool = False, history: Optional[List[Dict[str, Any]]] = None):
+async def get_llm_response_stream(
+    prompt: str,
+    is_chitchat: bool = False,
+    history: Optional[List[Dict[str, Any]]] = None,
+    usage: Optional[Dict[str, int]] = None,
+):
     """
     Sends a prompt to the OpenAI API and yields the response in a stream.
     Routes to a different system prompt based on the intent and includes conversation history.
+    If ``usage`` is given, it receives the prompt/completion token counts reported at the end of the stream.
     """
     system_prompt = CHITCHAT_SYSTEM_PROMPT if is_chitchat else RAG_SYSTEM_PROMPT
 
@@ -91,15 +98,45 @@ async def get_llm_response_stream(prompt: str, is_chitchat: bool = False, histor
             temperature=0.7,
             max_tokens=1024,
             stream=True,
+            stream_options={"include_usage": True},
         )
         async for chunk in stream:
-            logger.info(f"LLM stream chunk received: {chunk.model_dump_json()}")
+            if chunk.usage is not None and usage is not None:
+                usage["prompt_tokens"] = chunk.usage.prompt_tokens
+                usage["completion_tokens"] = chunk.usage.completion_tokens
+            # The final usage chunk has no choices.
+            if not chunk.choices:
+                continue
             content = chunk.choices[0].delta.content
             if content:
                 yield content
     except Exception as e:
         logger.error(f"An error occurred in get_llm_response_stream: {e}", exc_info=True)
-        yield "Sorry, I encountered an error while generating a response."
+        yield ERROR_RESPONSE
+
+async def summarize_conversation(previous_summary: str, turns: List[Dict[str, Any]], max_tokens: int) -> Optional[str]:
+    """
+    Folds older chat turns into the running summary of a conversation.
+    Returns None on failure so the caller keeps the previous summary.
+    """
+    transcript = "\n".join(f"{turn['role']}: {turn['content']}" for turn in turns)
+    prompt = (
+        f"Update the summary of a conversation between a user and an assistant with the new turns below. "
+        f"Keep names, companies, numbers, filters and open questions the user may refer back to. "
+        f"Answer with the updated summary only, in at most {max_tokens} tokens, in the language of the conversation.\n\n"
+        f"Current summary:\n{previous_summary or '(none)'}\n\nNew turns:\n{transcript}"
+    )
+    try:
+        response = await async_client.chat.completions.create(
+            model=settings.MAIN_LLM_MODEL,
+            messages=[{"role": "user", "content": prompt}], # type: ignore
+            temperature=0.0,
+            max_tokens=max_tokens,
+        )
+        return response.choices[0].message.content
+    except Exception as e:
+        logger.error(f"An error occurred in summarize_conversation: {e}", exc_info=True)
+        return None
 
 def get_llm_response_sync(prompt: str, is_chitchat: bool = False, history: Optional[List[Dict[str, Any]]] = None) -> str:
     """
@@ -123,4 +160,4 @@ def get_llm_response_sync(prompt: str, is_chitchat: bool = False, history: Optio
         return response.choices[0].message.content or "No response from the model."
     except Exception as e:
         logger.error(f"An error occurred in get_llm_response_sync: {e}", exc_info=True)
-        return "Sorry, I encountered an error while generating a response."
\ No newline at end of file
+        return ERROR_RESPONSE
\ No newline at end of file
@@ -1,7 +1,7 @@
 from typing import Dict, Any, Optional, List, Literal
 from pydantic import BaseModel, Field
 
-from app.services.llm_handler import client
+from app.services.llm_handler import client, async_client
 from app.config import settings
 
 # --- Pydantic Models for Structured LLM Output ---
@@ -43,6 +43,14 @@ class QueryAgent:
     """
     def __init__(self):
         self.client = client
+        self.async_client = async_client
+
+    def _build_messages(self, query: str, history: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+        messages = [{"role": "system", "content": self._get_system_prompt()}]
+        if history:
+            messages.extend(history)
+        messages.append({"role": "user", "content": f"Deconstruct the following user query: \"{query}\""})
+        return messages
 
     def deconstruct_query(self, query: str, history: Optional[List[Dict[str, Any]]] = None) -> DeconstructedQuery:
         """
@@ -50,18 +58,25 @@ class QueryAgent:
         the user's intent, a semantic query, and any extracted filters.
         It uses the provided conversation history to better understand context.
         NOTE: This function is synchronous because the 'instructor' library, when used
-        with 'response_model', makes the underlying API call blocking.
+        with 'response_model', makes the underlying API call blocking. Request
+        handlers should use ``deconstruct_query_async`` instead.
         """
-        system_prompt = self._get_system_prompt()
-
-        messages = [{"role": "system", "content": system_prompt}]
-        if history:
-            messages.extend(history)
-        messages.append({"role": "user", "content": f"Deconstruct the following user query: \"{query}\""})
-
         response = self.client.chat.completions.create(
             model=settings.MAIN_LLM_MODEL,
-            messages=messages,
+            messages=self._build_messages(query, history),
+            response_model=DeconstructedQuery,  # type: ignore
+            temperature=0.0,
+        )
+        return response
+
+    async def deconstruct_query_async(self, query: str, history: Optional[List[Dict[str, Any]]] = None) -> DeconstructedQuery:
+        """
+        Same as ``deconstruct_query`` but on the instructor-patched async client,
+        so the event loop keeps serving other requests while the model plans.
+        """
+        response = await self.async_client.chat.completions.create(
+            model=settings.MAIN_LLM_MODEL,
+            messages=self._build_messages(query, history),
             response_model=DeconstructedQuery,  # type: ignore
             temperature=0.0,
         )
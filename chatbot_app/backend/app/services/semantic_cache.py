@@ -0,0 +1,213 @@
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+EmbedFn = Callable[[List[str]], Sequence[Sequence[float]]]
+
+
+class CachedPlan(NamedTuple):
+    plan: Any
+    ids: Optional[List[str]]
+    distances: Optional[List[float]]
+
+
+class CachedAnswer(NamedTuple):
+    answer: str
+    sources: List[Dict[str, Any]]
+    similarity: float
+
+
+def normalize_query(query: str) -> str:
+    """Lower-cases and collapses whitespace/punctuation so trivially different spellings share a key."""
+    return re.sub(r"[^\w]+", " ", (query or "").lower()).strip()
+
+
+def _history_digest(history: Optional[List[Dict[str, Any]]]) -> str:
+    turns = [(m.get("role"), m.get("content")) for m in history or []]
+    return hashlib.sha256(json.dumps(turns, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def _default_embed(texts: List[str]) -> Sequence[Sequence[float]]:
+    from app.services.embedding_service import embedding_service
+    return embedding_service.embed(texts)
+
+
+class SemanticCache:
+    """
+    Two-level cache in front of the chat RAG pipeline.
+
+    Level 1 maps the exact normalized query (plus the conversation it was asked
+    in) to its ``DeconstructedQuery`` and the journey ids retrieved for it, so a
+    repeat skips planning, HyDE and the vector search. Level 2 keeps finished
+    answers keyed by the query embedding; a new first-turn question whose cosine
+    similarity to a cached one reaches ``threshold`` replays that answer.
+
+    Both levels are process-local, bounded LRUs with a TTL, and are dropped as a
+    whole whenever new documents are ingested (see ``invalidate``). Entries are
+    tagged with the ``generation`` current when their lookup started, so results
+    computed against the old corpus are never stored after an invalidation.
+    """
+
+    def __init__(
+        self,
+        embed_fn: Optional[EmbedFn] = None,
+        threshold: float = 0.95,
+        max_entries: int = 1000,
+        ttl_seconds: float = 3600,
+        enabled: bool = True,
+    ):
+        self.embed_fn = embed_fn or _default_embed
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self.generation = 0
+        self._lock = threading.Lock()
+        self._plans: "OrderedDict[str, tuple[float, CachedPlan]]" = OrderedDict()
+        self._answers: "OrderedDict[int, tuple[float, np.ndarray, str, List[Dict[str, Any]]]]" = OrderedDict()
+        self._answer_seq = 0
+        self._matrix: Optional[np.ndarray] = None
+        self._matrix_keys: List[int] = []
+        self._stats: Dict[str, int] = {
+            "plan_hits": 0, "plan_misses": 0, "answer_hits": 0, "answer_misses": 0, "invalidations": 0,
+        }
+
+    # --- Level 1: plans and retrieved ids ---
+
+    def _plan_key(self, query: str, history: Optional[List[Dict[str, Any]]]) -> str:
+        return f"{normalize_query(query)}\x00{_history_digest(history)}"
+
+    def get_plan(self, query: str, history: Optional[List[Dict[str, Any]]] = None) -> Optional[CachedPlan]:
+        if not self.enabled:
+            return None
+        key = self._plan_key(query, history)
+        with self._lock:
+            item = self._plans.get(key)
+            if item is not None and time.monotonic() - item[0] > self.ttl_seconds:
+                del self._plans[key]
+                item = None
+            if item is None:
+                self._stats["plan_misses"] += 1
+                return None
+            self._plans.move_to_end(key)
+            self._stats["plan_hits"] += 1
+            return item[1]
+
+    def put_plan(
+        self,
+        query: str,
+        history: Optional[List[Dict[str, Any]]],
+        plan: Any,
+        generation: int,
+        ids: Optional[List[str]] = None,
+        distances: Optional[List[float]] = None,
+    ):
+        if not self.enabled:
+            return
+        key = self._plan_key(query, history)
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._plans[key] = (time.monotonic(), CachedPlan(plan, ids, distances))
+            self._plans.move_to_end(key)
+            while len(self._plans) > self.max_entries:
+                self._plans.popitem(last=False)
+
+    # --- Level 2: answers by embedding similarity ---
+
+    def embed(self, text: str) -> np.ndarray:
+        vector = np.asarray(self.embed_fn([text])[0], dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else vector
+
+    async def embed_async(self, text: str) -> np.ndarray:
+        return await asyncio.to_thread(self.embed, text)
+
+    def _similarity_matrix(self) -> Optional[np.ndarray]:
+        if self._matrix is None and self._answers:
+            self._matrix_keys = list(self._answers.keys())
+            self._matrix = np.stack([self._answers[k][1] for k in self._matrix_keys])
+        return self._matrix
+
+    def lookup_answer(self, embedding: np.ndarray) -> Optional[CachedAnswer]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            matrix = self._similarity_matrix()
+            best_key, best_score = None, -1.0
+            if matrix is not None:
+                scores = matrix @ embedding
+                index = int(np.argmax(scores))
+                best_key, best_score = self._matrix_keys[index], float(scores[index])
+            if best_key is not None and best_score >= self.threshold:
+                created, _, answer, sources = self._answers[best_key]
+                if time.monotonic() - created <= self.ttl_seconds:
+                    self._answers.move_to_end(best_key)
+                    self._stats["answer_hits"] += 1
+                    return CachedAnswer(answer, sources, best_score)
+                del self._answers[best_key]
+                self._matrix = None
+            self._stats["answer_misses"] += 1
+            return None
+
+    def put_answer(self, embedding: np.ndarray, answer: str, sources: List[Dict[str, Any]], generation: int):
+        if not self.enabled or not answer:
+            return
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._answer_seq += 1
+            self._answers[self._answer_seq] = (time.monotonic(), embedding, answer, sources)
+            while len(self._answers) > self.max_entries:
+                self._answers.popitem(last=False)
+            self._matrix = None
+
+    # --- Maintenance / metrics ---
+
+    def invalidate(self):
+        """Drops both levels; called when the underlying collection changes."""
+        with self._lock:
+            self._plans.clear()
+            self._answers.clear()
+            self._matrix = None
+            self.generation += 1
+            self._stats["invalidations"] += 1
+        logger.info(f"Semantic cache invalidated (generation {self.generation}).")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._stats)
+            stats["plan_entries"] = len(self._plans)
+            stats["answer_entries"] = len(self._answers)
+            stats["generation"] = self.generation
+        for level in ("plan", "answer"):
+            lookups = stats[f"{level}_hits"] + stats[f"{level}_misses"]
+            stats[f"{level}_hit_rate"] = round(stats[f"{level}_hits"] / lookups, 4) if lookups else 0.0
+        return stats
+
+
+def replay_chunks(answer: str, words_per_chunk: int = 3) -> List[str]:
+    """Splits a cached answer into small token-like pieces so it streams like a live response."""
+    words = re.findall(r"\s*\S+\s*", answer)
+    return ["".join(words[i:i + words_per_chunk]) for i in range(0, len(words), words_per_chunk)] or [answer]
+
+
+# Singleton instance
+semantic_cache = SemanticCache(
+    threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+    max_entries=settings.SEMANTIC_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.SEMANTIC_CACHE_TTL_SECONDS,
+    enabled=settings.SEMANTIC_CACHE_ENABLED,
+)
@@ -0,0 +1,272 @@
+import asyncio
+import datetime
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import database
+from app.config import settings
+
+try:
+    import tiktoken
+except ImportError:  # optional; token counts fall back to a character estimate
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# Used when tiktoken is not installed; close enough for budgeting German/English chat text.
+CHARS_PER_TOKEN = 4
+# Role and separator tokens the chat format adds per message.
+MESSAGE_OVERHEAD_TOKENS = 4
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+
+SummarizeFn = Callable[[str, List[Dict[str, str]], int], Awaitable[Optional[str]]]
+
+_encoding = None
+_encoding_failed = False
+
+
+def _get_encoding():
+    global _encoding, _encoding_failed
+    if _encoding is None and tiktoken is not None and not _encoding_failed:
+        try:
+            try:
+                _encoding = tiktoken.encoding_for_model(settings.MAIN_LLM_MODEL)
+            except KeyError:
+                _encoding = tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            # The encoding file is downloaded on first use; offline hosts use the estimate.
+            _encoding_failed = True
+            logger.warning(f"Could not load the tiktoken encoding, estimating token counts: {e}")
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text or "", disallowed_special=()))
+    return len(text or "") // CHARS_PER_TOKEN + 1
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Keeps the beginning of ``text`` up to ``max_tokens`` tokens."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    encoding = _get_encoding()
+    if encoding is not None:
+        return encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens]) + " …"
+    return text[:max_tokens * CHARS_PER_TOKEN] + " …"
+
+
+async def _default_summarize(previous_summary: str, turns: List[Dict[str, str]], max_tokens: int) -> Optional[str]:
+    from app.services import llm_handler
+    return await llm_handler.summarize_conversation(previous_summary, turns, max_tokens)
+
+
+@dataclass
+class _Turn:
+    id: int
+    role: str
+    content: str
+    tokens: int
+
+
+@dataclass
+class _SessionState:
+    turns: List[_Turn]
+    summary: str
+    summary_until_id: int
+    loaded_at: float
+    summarizing: bool = False
+    summary_tokens: int = field(default=0)
+
+
+class SessionHistory:
+    """
+    Conversation history of chat sessions, as sent to the planner and answer model.
+
+    Turns not yet covered by the session's summary are cached in memory per
+    ``session_id``; new messages are written through to ``ChatLog`` and appended
+    to the cache, so a warm session needs no history query. ``get_messages``
+    returns the newest turns that fit ``token_budget`` (the newest one is always
+    kept, truncated if needed), preceded by the stored summary of earlier turns.
+    Once the turns that no longer fit reach ``summarize_after_tokens``, they are
+    folded into the summary (``ChatSummary``) in the background.
+    """
+
+    def __init__(
+        self,
+        token_budget: int = 2000,
+        summary_tokens: int = 300,
+        summarize_after_tokens: int = 500,
+        max_sessions: int = 1000,
+        ttl_seconds: float = 600,
+        load_limit: int = 50,
+        summarize_fn: Optional[SummarizeFn] = None,
+        session_factory: Callable[[], AsyncSession] = database.AsyncSessionLocal,
+    ):
+        self.token_budget = token_budget
+        self.summary_tokens = summary_tokens
+        self.summarize_after_tokens = summarize_after_tokens
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.load_limit = load_limit
+        self.summarize_fn = summarize_fn or _default_summarize
+        self.session_factory = session_factory
+        self._sessions: "OrderedDict[str, _SessionState]" = OrderedDict()
+        self._tasks: Set[asyncio.Task] = set()
+        self._stats: Dict[str, int] = {"cache_hits": 0, "loads": 0, "summaries": 0, "summary_errors": 0}
+
+    # --- Cache ---
+
+    def _cached(self, session_id: str) -> Optional[_SessionState]:
+        state = self._sessions.get(session_id)
+        if state is None:
+            return None
+        if time.monotonic() - state.loaded_at > self.ttl_seconds:
+            # Picks up writes made by other processes.
+            del self._sessions[session_id]
+            return None
+        self._sessions.move_to_end(session_id)
+        return state
+
+    async def _load(self, db: AsyncSession, session_id: str) -> _SessionState:
+        state = self._cached(session_id)
+        if state is not None:
+            self._stats["cache_hits"] += 1
+            return state
+        self._stats["loads"] += 1
+        summary_row = await db.get(database.ChatSummary, session_id)
+        summary, until = (summary_row.summary or "", summary_row.covered_until_id) if summary_row else ("", 0)
+        stmt = (
+            select(database.ChatLog)
+            .filter(database.ChatLog.session_id == session_id, database.ChatLog.id > until)
+            .order_by(database.ChatLog.id.desc())
+            .limit(self.load_limit)
+        )
+        rows = list((await db.execute(stmt)).scalars().all())
+        rows.reverse()
+        state = _SessionState(
+            turns=[_Turn(r.id, r.role, r.content or "", count_tokens(r.content or "")) for r in rows],
+            summary=summary, summary_until_id=until, loaded_at=time.monotonic(),
+            summary_tokens=count_tokens(SUMMARY_PREFIX + summary) if summary else 0,
+        )
+        self._sessions[session_id] = state
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+        return state
+
+    def invalidate(self, session_id: str):
+        self._sessions.pop(session_id, None)
+
+    # --- Budgeting ---
+
+    def _split(self, state: _SessionState) -> Tuple[List[_Turn], List[_Turn]]:
+        """Returns (turns that fit the budget, older turns that do not)."""
+        budget = self.token_budget - (state.summary_tokens + MESSAGE_OVERHEAD_TOKENS if state.summary else 0)
+        used, start = 0, len(state.turns)
+        for i in range(len(state.turns) - 1, -1, -1):
+            cost = state.turns[i].tokens + MESSAGE_OVERHEAD_TOKENS
+            if used + cost > budget and start < len(state.turns):
+                break
+            used += cost
+            start = i
+        return state.turns[start:], state.turns[:start]
+
+    # --- Public API ---
+
+    async def get_messages(self, db: AsyncSession, session_id: str) -> List[Dict[str, str]]:
+        """Prompt-ready history (oldest first) within the token budget."""
+        state = await self._load(db, session_id)
+        recent, _ = self._split(state)
+        messages: List[Dict[str, str]] = []
+        if state.summary:
+            messages.append({"role": "system", "content": SUMMARY_PREFIX + state.summary})
+        available = self.token_budget - (state.summary_tokens + MESSAGE_OVERHEAD_TOKENS if state.summary else 0)
+        if len(recent) == 1 and recent[0].tokens + MESSAGE_OVERHEAD_TOKENS > available:
+            turn = recent[0]
+            content = truncate_to_tokens(turn.content, max(available - MESSAGE_OVERHEAD_TOKENS - 1, 1))
+            return messages + [{"role": turn.role, "content": content}]
+        return messages + [{"role": t.role, "content": t.content} for t in recent]
+
+    async def append(self, db: AsyncSession, session_id: str, role: str, content: str) -> database.ChatLog:
+        """Stores one message in ChatLog and, if the session is cached, in the cache."""
+        log = database.ChatLog(session_id=session_id, role=role, content=content)
+        db.add(log)
+        await db.commit()
+        await db.refresh(log)
+        state = self._cached(session_id)
+        if state is not None:
+            state.turns.append(_Turn(log.id, role, content, count_tokens(content)))
+            self._maybe_summarize(session_id, state)
+        return log
+
+    async def reset(self, db: AsyncSession, session_id: str):
+        """Drops the cached turns and the stored summary, e.g. after messages were deleted. Caller commits."""
+        self.invalidate(session_id)
+        await db.execute(delete(database.ChatSummary).where(database.ChatSummary.session_id == session_id))
+
+    # --- Summaries ---
+
+    def _maybe_summarize(self, session_id: str, state: _SessionState):
+        if state.summarizing:
+            return
+        _, overflow = self._split(state)
+        if not overflow or sum(t.tokens for t in overflow) < self.summarize_after_tokens:
+            return
+        state.summarizing = True
+        task = asyncio.create_task(self._summarize(session_id, state, overflow))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _summarize(self, session_id: str, state: _SessionState, overflow: List[_Turn]):
+        try:
+            turns = [{"role": t.role, "content": t.content} for t in overflow]
+            summary = await self.summarize_fn(state.summary, turns, self.summary_tokens)
+            if not summary:
+                self._stats["summary_errors"] += 1
+                return
+            summary = truncate_to_tokens(summary.strip(), self.summary_tokens)
+            until = overflow[-1].id
+            if self._sessions.get(session_id) is not state:
+                # Reset or evicted meanwhile; the turns may have been deleted.
+                return
+            async with self.session_factory() as db:
+                await db.merge(database.ChatSummary(
+                    session_id=session_id, summary=summary, covered_until_id=until,
+                    updated_at=datetime.datetime.utcnow(),
+                ))
+                await db.commit()
+            state.summary, state.summary_until_id = summary, until
+            state.summary_tokens = count_tokens(SUMMARY_PREFIX + summary)
+            state.turns = [t for t in state.turns if t.id > until]
+            self._stats["summaries"] += 1
+        except Exception as e:
+            self._stats["summary_errors"] += 1
+            logger.warning(f"Could not update the history summary of session {session_id}: {e}")
+        finally:
+            state.summarizing = False
+
+    async def drain(self):
+        """Waits for background summaries (used by scripts and shutdown)."""
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    def get_stats(self) -> Dict[str, int]:
+        return {**self._stats, "cached_sessions": len(self._sessions), "tokenizer": "tiktoken" if _get_encoding() else "estimate"}
+
+
+# Singleton instance
+session_history = SessionHistory(
+    token_budget=settings.CHAT_HISTORY_TOKEN_BUDGET,
+    summary_tokens=settings.CHAT_HISTORY_SUMMARY_TOKENS,
+    summarize_after_tokens=settings.CHAT_HISTORY_SUMMARIZE_AFTER_TOKENS,
+    max_sessions=settings.CHAT_HISTORY_CACHE_SESSIONS,
+    ttl_seconds=settings.CHAT_HISTORY_CACHE_TTL_SECONDS,
+)
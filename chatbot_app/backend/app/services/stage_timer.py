@@ -0,0 +1,42 @@
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Dict, TypeVar
+
+T = TypeVar("T")
+
+
+class StageTimer:
+    """
+    Wall-clock durations (ms) of the named stages of one request. Stages may
+    overlap; ``mark`` records a point in time relative to the start instead,
+    e.g. the first streamed token, and ``info`` holds non-timing facts such as
+    whether a speculative result was used.
+    """
+
+    def __init__(self):
+        self._t0 = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.marks: Dict[str, float] = {}
+        self.info: Dict[str, Any] = {}
+
+    def _elapsed_ms(self, since: float) -> float:
+        return round((time.perf_counter() - since) * 1000, 2)
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self._elapsed_ms(start)
+
+    async def run(self, name: str, awaitable: Awaitable[T]) -> T:
+        """Awaits ``awaitable`` as stage ``name``; meant for work started as a concurrent task."""
+        with self.stage(name):
+            return await awaitable
+
+    def mark(self, name: str):
+        self.marks.setdefault(name, self._elapsed_ms(self._t0))
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"stages_ms": dict(self.stages), "marks_ms": dict(self.marks), "info": dict(self.info), "total_ms": self._elapsed_ms(self._t0)}
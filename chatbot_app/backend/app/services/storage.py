@@ -1,25 +1,46 @@
 import os
+import time
+import base64
+import asyncio
+import hashlib
+import inspect
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import boto3
 from botocore.client import Config
-from botocore.exceptions import ClientError
+from botocore.exceptions import BotoCoreError, ClientError
 from boto3.exceptions import S3UploadFailedError
 import logging
-from typing import Optional
+from typing import Any, Dict, Iterator, List, Optional
 
 logger = logging.getLogger(__name__)
 
+MB = 1024 * 1024
+# S3 rejects parts smaller than this (except the last one).
+MIN_PART_SIZE = 5 * MB
+
+
+class ChecksumMismatchError(Exception):
+    """The storage service reported a different MD5/ETag than the bytes that were sent."""
+
+
 class StorageService:
-    def __init__(self, bucket_name: str):
+    def __init__(self, bucket_name: str, part_size_mb: Optional[int] = None, upload_concurrency: Optional[int] = None):
         """
         Initializes the StorageService.
         Credential resolution order (most specific first):
         - BACKBLAZE_B2_KEY_ID / BACKBLAZE_B2_APPLICATION_KEY / BACKBLAZE_B2_S3_ENDPOINT / BACKBLAZE_B2_REGION
         - AWS_ACCESS_KEY_ID / AWS_SECRET_ACCESS_KEY / AWS_ENDPOINT_URL / AWS_REGION
+        Multipart uploads use STORAGE_PART_SIZE_MB parts (default 8) with
+        STORAGE_UPLOAD_CONCURRENCY parts in flight (default 8).
         """
         if not bucket_name:
             raise ValueError("Storage service bucket name is not provided.")
         
         self.bucket_name = bucket_name
+        self.part_size = max(MIN_PART_SIZE, (part_size_mb or int(os.environ.get('STORAGE_PART_SIZE_MB', '8'))) * MB)
+        self.upload_concurrency = max(1, upload_concurrency or int(os.environ.get('STORAGE_UPLOAD_CONCURRENCY', '8')))
         
         # Resolve endpoint/region (prefer Backblaze-specific names)
         endpoint_url = (os.environ.get('BACKBLAZE_B2_S3_ENDPOINT') or os.environ.get('AWS_ENDPOINT_URL', '')).strip()
@@ -48,6 +69,12 @@ class StorageService:
 
         # Create the client. If explicit creds are provided, pass them; otherwise, allow
         # boto3 to fall back to its default credential chain (env, config files, IAM, etc.).
+        # One client (and connection pool) is shared by all callers and threads;
+        # the pool is sized so concurrent part uploads do not queue for a connection.
+        client_config = Config(
+            max_pool_connections=max(10, 2 * self.upload_concurrency),
+            retries={'max_attempts': 5, 'mode': 'standard'},
+        )
         if key_id and app_key:
             self.s3_client = boto3.client(
                 's3',
@@ -55,9 +82,16 @@ class StorageService:
                 region_name=region,
                 aws_access_key_id=key_id,
                 aws_secret_access_key=app_key,
+                config=client_config,
             )
         else:
-            self.s3_client = boto3.client('s3', endpoint_url=endpoint_url or None, region_name=region)
+            self.s3_client = boto3.client('s3', endpoint_url=endpoint_url or None, region_name=region, config=client_config)
+
+        # Blocking boto3 calls of the async API run here, never on the event loop.
+        self._executor = ThreadPoolExecutor(max_workers=2 * self.upload_concurrency, thread_name_prefix="storage")
+        self._lock = threading.Lock()
+        self._health: Optional[tuple] = None  # (ok, checked_at)
+        self._presigned: Dict[tuple, tuple] = {}  # (key, expiration) -> (url, reuse_until)
 
     def check_connection(self) -> bool:
         """
@@ -80,6 +114,144 @@ class StorageService:
             logger.error(f"Failed to connect to B2 bucket: {e}", exc_info=True)
             return False
 
+    def is_available(self, ttl_seconds: float = 60.0) -> bool:
+        """
+        ``check_connection`` remembered for ``ttl_seconds`` (failures for at most
+        5 seconds), so request handlers do not pay a HeadBucket round trip each.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self._health is not None:
+                ok, checked_at = self._health
+                if now - checked_at < (ttl_seconds if ok else min(ttl_seconds, 5.0)):
+                    return ok
+        ok = self.check_connection()
+        with self._lock:
+            self._health = (ok, now)
+        return ok
+
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def is_available_async(self, ttl_seconds: float = 60.0) -> bool:
+        return await self._run(self.is_available, ttl_seconds)
+
+    async def upload_file_async(self, file_path: str, object_key: str, content_type: Optional[str] = None) -> bool:
+        """
+        Uploads a local file without blocking the event loop; see ``upload_fileobj_async``.
+        Returns False (and logs) on failure, like ``upload_file``.
+        """
+        try:
+            with open(file_path, "rb") as f:
+                return await self.upload_fileobj_async(f, object_key, content_type=content_type)
+        except FileNotFoundError:
+            logger.error(f"The file {file_path} was not found for upload.", exc_info=True)
+            return False
+
+    async def upload_fileobj_async(self, source: Any, object_key: str, content_type: Optional[str] = None) -> bool:
+        """
+        Uploads everything read from ``source`` (a binary file-like object with a
+        sync or async ``read(n)``) to ``object_key``.
+
+        Data is read in ``part_size`` pieces. A source that fits in one part is
+        sent with a single PutObject. Larger sources become a multipart upload
+        with up to ``upload_concurrency`` parts in flight, so memory stays at
+        about ``part_size * upload_concurrency``. Every part carries its
+        Content-MD5, which the service verifies, and the returned ETags are
+        checked against the local digests; a failed upload is aborted.
+        """
+        extra = {'ContentType': content_type} if content_type else {}
+        try:
+            first = await self._read(source, self.part_size)
+            second = await self._read(source, self.part_size) if len(first) == self.part_size else b""
+            if not second:
+                await self._run(self._put_object, object_key, first, extra)
+                logger.info(f"Successfully uploaded {len(first)} bytes to bucket {self.bucket_name} with key {object_key}")
+                return True
+            total = await self._multipart_upload(source, object_key, [first, second], extra)
+            logger.info(f"Successfully uploaded {total} bytes to bucket {self.bucket_name} with key {object_key} (multipart)")
+            return True
+        except (ClientError, BotoCoreError, ChecksumMismatchError, OSError) as e:
+            logger.error(f"Failed to upload to {object_key}: {e}", exc_info=True)
+            return False
+
+    async def _read(self, source: Any, size: int) -> bytes:
+        # A sync read is file I/O; keep it on the executor, not the event loop.
+        if inspect.iscoroutinefunction(source.read):
+            data = await source.read(size)
+        else:
+            data = await self._run(source.read, size)
+            if inspect.isawaitable(data):
+                data = await data
+        return data or b""
+
+    @staticmethod
+    def _md5(data: bytes) -> bytes:
+        return hashlib.md5(data, usedforsecurity=False).digest()
+
+    def _put_object(self, object_key: str, data: bytes, extra: Dict[str, Any]):
+        digest = self._md5(data)
+        response = self.s3_client.put_object(
+            Bucket=self.bucket_name, Key=object_key, Body=data,
+            ContentMD5=base64.b64encode(digest).decode('ascii'), **extra,
+        )
+        self._verify_etag(response.get('ETag'), digest.hex(), object_key)
+
+    def _upload_part(self, object_key: str, upload_id: str, number: int, data: bytes) -> Dict[str, Any]:
+        digest = self._md5(data)
+        response = self.s3_client.upload_part(
+            Bucket=self.bucket_name, Key=object_key, UploadId=upload_id, PartNumber=number, Body=data,
+            ContentMD5=base64.b64encode(digest).decode('ascii'),
+        )
+        self._verify_etag(response.get('ETag'), digest.hex(), f"{object_key} part {number}")
+        return {'PartNumber': number, 'ETag': response['ETag'], 'md5': digest}
+
+    @staticmethod
+    def _verify_etag(etag: Optional[str], expected: str, what: str):
+        # Services that encrypt at rest may return non-MD5 ETags; Content-MD5 was still verified server-side.
+        etag = (etag or '').strip('"')
+        if etag and len(etag) == len(expected) and etag != expected:
+            raise ChecksumMismatchError(f"ETag {etag} of {what} does not match the MD5 {expected} of the sent bytes")
+
+    async def _multipart_upload(self, source: Any, object_key: str, pending: List[bytes], extra: Dict[str, Any]) -> int:
+        created = await self._run(self.s3_client.create_multipart_upload, Bucket=self.bucket_name, Key=object_key, **extra)
+        upload_id = created['UploadId']
+        in_flight: set = set()
+        parts: List[Dict[str, Any]] = []
+        total, number = 0, 0
+        try:
+            while True:
+                data = pending.pop(0) if pending else await self._read(source, self.part_size)
+                if not data:
+                    break
+                number += 1
+                total += len(data)
+                in_flight.add(asyncio.ensure_future(self._run(self._upload_part, object_key, upload_id, number, data)))
+                if len(in_flight) >= self.upload_concurrency:
+                    done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                    parts.extend(task.result() for task in done)
+            if in_flight:
+                parts.extend(await asyncio.gather(*in_flight))
+                in_flight = set()
+            parts.sort(key=lambda p: p['PartNumber'])
+            response = await self._run(
+                self.s3_client.complete_multipart_upload,
+                Bucket=self.bucket_name, Key=object_key, UploadId=upload_id,
+                MultipartUpload={'Parts': [{'PartNumber': p['PartNumber'], 'ETag': p['ETag']} for p in parts]},
+            )
+            expected = f"{self._md5(b''.join(p['md5'] for p in parts)).hex()}-{len(parts)}"
+            self._verify_etag(response.get('ETag'), expected, object_key)
+            return total
+        except BaseException:
+            for task in in_flight:
+                task.cancel()
+            try:
+                await self._run(self.s3_client.abort_multipart_upload, Bucket=self.bucket_name, Key=object_key, UploadId=upload_id)
+            except (ClientError, BotoCoreError) as e:
+                logger.warning(f"Could not abort multipart upload {upload_id} of {object_key}: {e}")
+            raise
+
     def upload_file(self, file_path: str, object_key: str) -> bool:
         """
         Uploads a file to the B2 bucket.
@@ -101,8 +273,14 @@ class StorageService:
 
     def create_presigned_url(self, object_key: str, expiration: int = 3600) -> Optional[str]:
         """
-        Generates a pre-signed URL to download a file.
+        Generates a pre-signed URL to download a file. A URL is reused for the
+        first 80% of its validity, so players get a stable URL they can cache.
         """
+        now = time.time()
+        with self._lock:
+            cached = self._presigned.get((object_key, expiration))
+            if cached is not None and now < cached[1]:
+                return cached[0]
         try:
             response = self.s3_client.generate_presigned_url(
                 'get_object',
@@ -110,11 +288,43 @@ class StorageService:
                 ExpiresIn=expiration
             )
             logger.info(f"Generated pre-signed URL for key {object_key}")
+            with self._lock:
+                if len(self._presigned) > 10000:
+                    self._presigned = {k: v for k, v in self._presigned.items() if now < v[1]}
+                self._presigned[(object_key, expiration)] = (response, now + 0.8 * expiration)
             return response
         except ClientError as e:
             logger.error(f"Failed to generate pre-signed URL for key {object_key}: {e}", exc_info=True)
             return None
 
+    def head_object(self, object_key: str) -> Optional[Dict[str, Any]]:
+        """Returns ``{"size", "content_type", "etag"}`` of an object, or None if it does not exist."""
+        try:
+            response = self.s3_client.head_object(Bucket=self.bucket_name, Key=object_key)
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in {"404", "NoSuchKey", "NotFound"}:
+                return None
+            raise
+        return {
+            "size": int(response.get('ContentLength') or 0),
+            "content_type": response.get('ContentType'),
+            "etag": (response.get('ETag') or '').strip('"'),
+        }
+
+    def iter_object_range(self, object_key: str, start: int, end: int, chunk_size: int = 256 * 1024) -> Iterator[bytes]:
+        """Yields bytes ``start``..``end`` (inclusive) of an object."""
+        response = self.s3_client.get_object(Bucket=self.bucket_name, Key=object_key, Range=f"bytes={start}-{end}")
+        body = response['Body']
+        try:
+            for chunk in body.iter_chunks(chunk_size):
+                yield chunk
+        finally:
+            body.close()
+
+    def download_file(self, object_key: str, file_path: str):
+        """Downloads an object to ``file_path``; raises on failure."""
+        self.s3_client.download_file(self.bucket_name, object_key, file_path)
+
 _storage_service_instance = None
 
 def get_storage_service():
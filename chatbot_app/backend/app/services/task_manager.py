@@ -1,32 +1,166 @@
+import asyncio
+import datetime
 import logging
-from typing import Dict, Any, Literal, Optional
+import os
+import socket
+import threading
+import time
+from typing import Dict, Any, Literal, Optional, Callable, Awaitable, AsyncGenerator, Set
 import uuid
 
+from app.config import settings
+from app.services.task_store import TaskStore, create_task_store, TERMINAL_STATUSES
+
 logger = logging.getLogger(__name__)
 
-# In-memory dictionary to store task statuses
-# In a production environment, you might replace this with Redis or a database
+# Working set of tasks owned by this process. Updates are applied here first and
+# flushed asynchronously to the configured TaskStore; finished tasks are dropped
+# from the working set once they are persisted, so memory stays flat and other
+# workers can still answer for them through the store.
 _tasks: Dict[str, Dict[str, Any]] = {}
+_meta: Dict[str, Dict[str, Any]] = {}
+_lock = threading.Lock()
 
 Status = Literal["PENDING", "PROCESSING", "SUCCESS", "ERROR"]
+TaskHandler = Callable[[str, Dict[str, Any]], Awaitable[None]]
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+_store: TaskStore = create_task_store(settings.TASK_STORE)
+_handlers: Dict[str, TaskHandler] = {}
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_thread_id: Optional[int] = None
+_dirty: set = set()
+_flush_event: Optional[asyncio.Event] = None
+_background: list = []
+_subscribers: Dict[str, Set[asyncio.Queue]] = {}
+
+def register_handler(kind: str, handler: TaskHandler):
+    """Registers the coroutine that (re)runs tasks of ``kind`` after their lease expired."""
+    _handlers[kind] = handler
+
+def _snapshot(task_id: str) -> Dict[str, Any]:
+    snap = dict(_tasks[task_id])
+    snap.update(_meta[task_id])
+    snap["id"] = task_id
+    return snap
+
+def _mark_dirty(task_id: str):
+    """Schedules a flush of ``task_id`` and notifies watchers; safe to call from worker threads."""
+    if _loop is None or _flush_event is None:
+        return
+    with _lock:
+        _dirty.add(task_id)
+        snapshot = dict(_tasks[task_id]) if _subscribers.get(task_id) and task_id in _tasks else None
+    try:
+        if threading.get_ident() == _loop_thread_id:
+            _on_dirty(task_id, snapshot)
+        else:
+            _loop.call_soon_threadsafe(_on_dirty, task_id, snapshot)
+    except RuntimeError:
+        # Loop already closed during shutdown.
+        pass
 
-def create_task() -> str:
-    """Creates a new task and returns its ID."""
-    task_id = str(uuid.uuid4())
-    _tasks[task_id] = {
-        "status": "PENDING",
-        "progress": 0,
-        "message": "Task has been created and is waiting to be processed.",
-        "result": None,
-        "estimated_time": None
-    }
+def _on_dirty(task_id: str, snapshot: Optional[Dict[str, Any]]):
+    if _flush_event is not None:
+        _flush_event.set()
+    if snapshot is not None:
+        for queue in _subscribers.get(task_id, ()):
+            queue.put_nowait(snapshot)
+
+def create_task(kind: Optional[str] = None, payload: Optional[Dict[str, Any]] = None, task_id: Optional[str] = None) -> str:
+    """Creates a new task (or restarts ``task_id``) and returns its ID."""
+    task_id = task_id or str(uuid.uuid4())
+    with _lock:
+        _tasks[task_id] = {
+            "status": "PENDING",
+            "progress": 0,
+            "message": "Task has been created and is waiting to be processed.",
+            "result": None,
+            "estimated_time": None
+        }
+        _meta[task_id] = {
+            "kind": kind,
+            "payload": payload,
+            "attempts": 1,
+            "max_attempts": settings.TASK_MAX_ATTEMPTS,
+            "lease_owner": WORKER_ID,
+            "lease_expires_at": None,
+        }
+    _mark_dirty(task_id)
     logger.info(f"Task created with ID: {task_id}")
     return task_id
 
+def set_task_payload(task_id: str, kind: str, payload: Dict[str, Any]):
+    """Records what is needed to re-run the task on another worker if this one dies."""
+    if task_id in _meta:
+        _meta[task_id]["kind"] = kind
+        _meta[task_id]["payload"] = payload
+        _mark_dirty(task_id)
+
 def get_task_status(task_id: str) -> Optional[Dict[str, Any]]:
-    """Retrieves the status of a specific task."""
+    """Retrieves the status of a task owned by this process."""
     return _tasks.get(task_id)
 
+async def get_task_status_async(task_id: str) -> Optional[Dict[str, Any]]:
+    """Retrieves the status of a task, falling back to the shared store for tasks owned elsewhere."""
+    local = _tasks.get(task_id)
+    if local is not None:
+        return local
+    row = await _store.get(task_id)
+    if row is None:
+        return None
+    return {key: row.get(key) for key in ("status", "progress", "message", "result", "estimated_time")}
+
+async def watch_task(task_id: str, keepalive_seconds: float = 15.0) -> AsyncGenerator[Optional[Dict[str, Any]], None]:
+    """
+    Yields the task state immediately and then on every change until the task
+    reaches SUCCESS or ERROR. Yields ``None`` after ``keepalive_seconds`` without
+    a change so callers can keep idle connections open.
+
+    Tasks owned by this process are pushed from ``update_task_status`` and
+    friends; tasks owned by another worker are followed by polling the store.
+    """
+    queue: Optional[asyncio.Queue] = None
+    if task_id in _tasks:
+        queue = asyncio.Queue()
+        _subscribers.setdefault(task_id, set()).add(queue)
+    try:
+        current = await get_task_status_async(task_id)
+        if current is None:
+            return
+        current = dict(current)
+        yield current
+        idle = 0.0
+        while current.get("status") not in TERMINAL_STATUSES:
+            if queue is not None:
+                try:
+                    current = await asyncio.wait_for(queue.get(), timeout=keepalive_seconds)
+                    yield current
+                except asyncio.TimeoutError:
+                    yield None
+                continue
+            await asyncio.sleep(settings.TASK_EVENTS_POLL_SECONDS)
+            latest = await get_task_status_async(task_id)
+            if latest is None:
+                return
+            if latest != current:
+                current = dict(latest)
+                idle = 0.0
+                yield current
+            else:
+                idle += settings.TASK_EVENTS_POLL_SECONDS
+                if idle >= keepalive_seconds:
+                    idle = 0.0
+                    yield None
+    finally:
+        if queue is not None:
+            watchers = _subscribers.get(task_id)
+            if watchers is not None:
+                watchers.discard(queue)
+                if not watchers:
+                    _subscribers.pop(task_id, None)
+
 def update_task_status(
     task_id: str,
     status: Status,
@@ -49,6 +183,7 @@ def update_task_status(
             _tasks[task_id]["progress"] = progress
         if estimated_time is not None:
             _tasks[task_id]["estimated_time"] = estimated_time
+        _mark_dirty(task_id)
         logger.debug(
             f"Task {task_id} updated: Status={status}, Message='{message}', Progress={_tasks[task_id].get('progress')}"
         )
@@ -62,6 +197,7 @@ def set_task_success(task_id: str, result: Any):
         _tasks[task_id]["progress"] = 100
         _tasks[task_id]["message"] = "Transcription completed successfully."
         _tasks[task_id]["result"] = result
+        _mark_dirty(task_id)
         logger.info(f"Task {task_id} marked as SUCCESS.")
     else:
         logger.warning(f"Attempted to set success for non-existent task with ID: {task_id}")
@@ -71,6 +207,7 @@ def set_task_error(task_id: str, error_message: str):
     if task_id in _tasks:
         _tasks[task_id]["status"] = "ERROR"
         _tasks[task_id]["message"] = error_message
+        _mark_dirty(task_id)
         logger.error(f"Task {task_id} marked as ERROR: {error_message}")
     else:
         logger.warning(f"Attempted to set error for non-existent task with ID: {task_id}")
@@ -78,5 +215,113 @@ def set_task_error(task_id: str, error_message: str):
 def remove_task(task_id: str):
     """Removes a task from the store, e.g., after the result has been fetched."""
     if task_id in _tasks:
-        del _tasks[task_id]
+        with _lock:
+            del _tasks[task_id]
+            _meta.pop(task_id, None)
+            _dirty.discard(task_id)
         logger.info(f"Task {task_id} removed from store.")
+
+# --- Persistence / lease maintenance ---
+
+async def _flush():
+    with _lock:
+        pending = [tid for tid in _dirty if tid in _tasks]
+        _dirty.clear()
+        lease_expires = datetime.datetime.utcnow() + datetime.timedelta(seconds=settings.TASK_LEASE_SECONDS)
+        snapshots = []
+        for task_id in pending:
+            _meta[task_id]["lease_expires_at"] = lease_expires
+            snapshots.append(_snapshot(task_id))
+    if not snapshots:
+        return
+    try:
+        lost = await _store.save(snapshots)
+    except Exception as e:
+        logger.error(f"Failed to persist {len(snapshots)} task update(s): {e}", exc_info=True)
+        with _lock:
+            _dirty.update(s["id"] for s in snapshots)
+        return
+    with _lock:
+        for task_id in lost:
+            # Another worker reclaimed the task while this one stalled; its copy is authoritative now.
+            logger.warning(f"Lost the lease on task {task_id} to another worker; dropping local updates.")
+            _tasks.pop(task_id, None)
+            _meta.pop(task_id, None)
+            _dirty.discard(task_id)
+        for snap in snapshots:
+            task_id = snap["id"]
+            if snap["status"] in TERMINAL_STATUSES and task_id not in _dirty and task_id in _tasks:
+                del _tasks[task_id]
+                _meta.pop(task_id, None)
+
+async def _flush_loop():
+    assert _flush_event is not None
+    while True:
+        await _flush_event.wait()
+        _flush_event.clear()
+        await _flush()
+        # Coalesce bursts of progress updates into one write.
+        await asyncio.sleep(settings.TASK_FLUSH_INTERVAL_SECONDS)
+
+async def _resume(task: Dict[str, Any]):
+    task_id = task["id"]
+    with _lock:
+        _tasks[task_id] = {key: task.get(key) for key in ("status", "progress", "message", "result", "estimated_time")}
+        _meta[task_id] = {key: task.get(key) for key in ("kind", "payload", "attempts", "max_attempts", "lease_owner", "lease_expires_at")}
+    handler = _handlers.get(task.get("kind") or "")
+    if handler is None or int(task.get("attempts") or 0) > int(task.get("max_attempts") or 1):
+        set_task_error(task_id, "Task was interrupted and could not be resumed.")
+        return
+    logger.warning(f"Resuming task {task_id} (kind={task.get('kind')}, attempt {task.get('attempts')}) after lease expiry.")
+    update_task_status(task_id, "PENDING", "Task was interrupted; retrying...", progress=0)
+    try:
+        await handler(task_id, task.get("payload") or {})
+    except Exception as e:
+        logger.error(f"Resumed task {task_id} failed: {e}", exc_info=True)
+        set_task_error(task_id, f"Internal Server Error: {e}")
+
+async def _maintenance_loop():
+    interval = max(1, settings.TASK_LEASE_SECONDS // 3)
+    last_purge = 0.0
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await _flush()
+            owned = [tid for tid, t in list(_tasks.items()) if t.get("status") not in TERMINAL_STATUSES]
+            await _store.heartbeat(owned, WORKER_ID, settings.TASK_LEASE_SECONDS)
+            while True:
+                claimed = await _store.claim_expired(WORKER_ID, settings.TASK_LEASE_SECONDS)
+                if not claimed:
+                    break
+                _background.append(asyncio.create_task(_resume(claimed)))
+            _background[:] = [t for t in _background if not t.done()]
+            if time.time() - last_purge > interval * 10:
+                purged = await _store.purge(settings.TASK_TTL_SECONDS)
+                last_purge = time.time()
+                if purged:
+                    logger.info(f"Purged {purged} expired task(s) from the task store.")
+        except Exception as e:
+            logger.error(f"Task maintenance iteration failed: {e}", exc_info=True)
+
+async def start():
+    """Starts the background flush and lease-maintenance loops; call once from the app lifespan."""
+    global _loop, _loop_thread_id, _flush_event
+    _loop = asyncio.get_running_loop()
+    _loop_thread_id = threading.get_ident()
+    _flush_event = asyncio.Event()
+    with _lock:
+        _dirty.update(_tasks.keys())
+    _flush_event.set()
+    _background.append(asyncio.create_task(_flush_loop()))
+    _background.append(asyncio.create_task(_maintenance_loop()))
+    logger.info(f"Task manager started (store={type(_store).__name__}, worker={WORKER_ID}).")
+
+async def stop():
+    """Cancels the background loops and flushes any pending updates."""
+    global _loop, _flush_event
+    for task in _background:
+        task.cancel()
+    _background.clear()
+    await _flush()
+    _loop = None
+    _flush_event = None
@@ -0,0 +1,223 @@
+import datetime
+import logging
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import select, update, delete, or_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app import database
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ("SUCCESS", "ERROR")
+
+
+def _utcnow() -> datetime.datetime:
+    return datetime.datetime.utcnow()
+
+
+def _may_write(current: Dict[str, Any], snap: Dict[str, Any], now: datetime.datetime) -> bool:
+    """A snapshot may overwrite a stored task unless another worker holds an unexpired lease on it."""
+    owner = current.get("lease_owner")
+    expires = current.get("lease_expires_at")
+    return owner is None or owner == snap.get("lease_owner") or expires is None or expires < now
+
+
+class TaskStore:
+    """
+    Persistence backend for ``task_manager``.
+
+    A snapshot is the public task state (status, progress, message, result,
+    estimated_time) plus bookkeeping fields: ``id``, ``kind``, ``payload``,
+    ``attempts``, ``max_attempts``, ``lease_owner`` and ``lease_expires_at``.
+    """
+
+    async def save(self, snapshots: List[Dict[str, Any]]) -> List[str]:
+        """
+        Upserts the snapshots and returns the ids that were not written because
+        another worker has since taken over the task's lease.
+        """
+        raise NotImplementedError
+
+    async def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    async def heartbeat(self, task_ids: List[str], owner: str, lease_seconds: int) -> None:
+        raise NotImplementedError
+
+    async def claim_expired(self, owner: str, lease_seconds: int) -> Optional[Dict[str, Any]]:
+        """Takes over one non-terminal task whose lease has expired, or returns None."""
+        raise NotImplementedError
+
+    async def purge(self, ttl_seconds: int) -> int:
+        """
+        Deletes finished tasks that have not been updated for ``ttl_seconds``;
+        returns the count. Running tasks are kept however long they go without
+        a progress update (``heartbeat`` does not touch ``updated_at``).
+        """
+        raise NotImplementedError
+
+
+class InMemoryTaskStore(TaskStore):
+    """Process-local store. Tasks do not survive a restart and are not shared between workers."""
+
+    def __init__(self):
+        self._rows: Dict[str, Dict[str, Any]] = {}
+
+    async def save(self, snapshots: List[Dict[str, Any]]) -> List[str]:
+        now = _utcnow()
+        rejected = []
+        for snap in snapshots:
+            row = self._rows.setdefault(snap["id"], {"created_at": now})
+            if not _may_write(row, snap, now):
+                rejected.append(snap["id"])
+                continue
+            row.update(snap)
+            row["updated_at"] = now
+        return rejected
+
+    async def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        row = self._rows.get(task_id)
+        return dict(row) if row else None
+
+    async def heartbeat(self, task_ids: List[str], owner: str, lease_seconds: int) -> None:
+        expires = _utcnow() + datetime.timedelta(seconds=lease_seconds)
+        for task_id in task_ids:
+            row = self._rows.get(task_id)
+            if row and row.get("lease_owner") == owner:
+                row["lease_expires_at"] = expires
+
+    async def claim_expired(self, owner: str, lease_seconds: int) -> Optional[Dict[str, Any]]:
+        now = _utcnow()
+        for row in self._rows.values():
+            expires = row.get("lease_expires_at")
+            if row.get("status") in TERMINAL_STATUSES or (expires and expires > now):
+                continue
+            row["lease_owner"] = owner
+            row["lease_expires_at"] = now + datetime.timedelta(seconds=lease_seconds)
+            row["attempts"] = int(row.get("attempts") or 0) + 1
+            return dict(row)
+        return None
+
+    async def purge(self, ttl_seconds: int) -> int:
+        cutoff = _utcnow() - datetime.timedelta(seconds=ttl_seconds)
+        stale = [
+            tid for tid, row in self._rows.items()
+            if row.get("status") in TERMINAL_STATUSES and row.get("updated_at", cutoff) <= cutoff
+        ]
+        for task_id in stale:
+            del self._rows[task_id]
+        return len(stale)
+
+
+class PostgresTaskStore(TaskStore):
+    """
+    Stores tasks in the ``task_queue`` table through the shared ``async_engine``,
+    so any uvicorn worker can answer ``/tasks/{id}`` and pick up tasks whose
+    owner stopped heartbeating.
+    """
+
+    _COLUMNS = (
+        "status", "progress", "message", "result", "estimated_time",
+        "kind", "payload", "attempts", "max_attempts", "lease_owner", "lease_expires_at",
+    )
+
+    async def save(self, snapshots: List[Dict[str, Any]]) -> List[str]:
+        if not snapshots:
+            return []
+        now = _utcnow()
+        rows = []
+        for snap in snapshots:
+            row = {col: snap.get(col) for col in self._COLUMNS}
+            row["id"] = snap["id"]
+            row["progress"] = row["progress"] or 0
+            row["attempts"] = row["attempts"] or 0
+            row["max_attempts"] = row["max_attempts"] or 1
+            row["created_at"] = now
+            row["updated_at"] = now
+            rows.append(row)
+        record = database.TaskRecord
+        stmt = pg_insert(record).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[record.id],
+            set_={col: getattr(stmt.excluded, col) for col in self._COLUMNS + ("updated_at",)},
+            # Same rule as _may_write: a worker whose lease was taken over must not take it back.
+            where=(
+                (record.lease_owner == stmt.excluded.lease_owner)
+                | record.lease_owner.is_(None)
+                | record.lease_expires_at.is_(None)
+                | (record.lease_expires_at < now)
+            ),
+        ).returning(record.id)
+        async with database.async_engine.begin() as conn:
+            written = set((await conn.execute(stmt)).scalars().all())
+        return [row["id"] for row in rows if row["id"] not in written]
+
+    async def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        async with database.async_engine.connect() as conn:
+            row = (await conn.execute(
+                select(database.TaskRecord.__table__).where(database.TaskRecord.id == task_id)
+            )).mappings().first()
+        return dict(row) if row else None
+
+    async def heartbeat(self, task_ids: List[str], owner: str, lease_seconds: int) -> None:
+        if not task_ids:
+            return
+        stmt = (
+            update(database.TaskRecord)
+            .where(database.TaskRecord.id.in_(task_ids), database.TaskRecord.lease_owner == owner)
+            .values(lease_expires_at=_utcnow() + datetime.timedelta(seconds=lease_seconds))
+        )
+        async with database.async_engine.begin() as conn:
+            await conn.execute(stmt)
+
+    async def claim_expired(self, owner: str, lease_seconds: int) -> Optional[Dict[str, Any]]:
+        now = _utcnow()
+        table = database.TaskRecord.__table__
+        async with database.async_engine.begin() as conn:
+            row = (await conn.execute(
+                select(table)
+                .where(
+                    table.c.status.notin_(TERMINAL_STATUSES),
+                    or_(table.c.lease_expires_at.is_(None), table.c.lease_expires_at < now),
+                )
+                .order_by(table.c.created_at)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+            )).mappings().first()
+            if not row:
+                return None
+            claimed = dict(row)
+            claimed["lease_owner"] = owner
+            claimed["lease_expires_at"] = now + datetime.timedelta(seconds=lease_seconds)
+            claimed["attempts"] = int(claimed.get("attempts") or 0) + 1
+            await conn.execute(
+                update(table)
+                .where(table.c.id == claimed["id"])
+                .values(
+                    lease_owner=owner,
+                    lease_expires_at=claimed["lease_expires_at"],
+                    attempts=claimed["attempts"],
+                    updated_at=now,
+                )
+            )
+        return claimed
+
+    async def purge(self, ttl_seconds: int) -> int:
+        cutoff = _utcnow() - datetime.timedelta(seconds=ttl_seconds)
+        async with database.async_engine.begin() as conn:
+            result = await conn.execute(
+                delete(database.TaskRecord).where(
+                    database.TaskRecord.status.in_(TERMINAL_STATUSES), database.TaskRecord.updated_at < cutoff
+                )
+            )
+        return result.rowcount or 0
+
+
+def create_task_store(backend: str) -> TaskStore:
+    """Returns the store implementation named by ``TASK_STORE`` ("memory" or "postgres")."""
+    if backend == "postgres":
+        return PostgresTaskStore()
+    if backend != "memory":
+        logger.warning(f"Unknown TASK_STORE '{backend}', falling back to in-memory task store.")
+    return InMemoryTaskStore()
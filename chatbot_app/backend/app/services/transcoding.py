@@ -0,0 +1,91 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, List
+
+logger = logging.getLogger(__name__)
+
+OPUS_SAMPLE_RATE = 16000
+READ_SIZE = 256 * 1024
+
+# Process-local counters, exposed through /transcoding/stats.
+_stats: Dict[str, Any] = {"files": 0, "failures": 0, "original_bytes": 0, "compressed_bytes": 0, "seconds": 0.0}
+
+
+class TranscodeError(Exception):
+    """ffmpeg could not be started or exited with an error."""
+
+
+def opus_command(src: str, bitrate_kbps: int, ffmpeg: str = "ffmpeg") -> List[str]:
+    """ffmpeg arguments that write ``src`` as mono 16 kHz Opus/OGG to stdout."""
+    return [
+        ffmpeg, "-nostdin", "-hide_banner", "-loglevel", "error",
+        "-i", src,
+        "-vn", "-ac", "1", "-ar", str(OPUS_SAMPLE_RATE),
+        "-c:a", "libopus", "-b:a", f"{bitrate_kbps}k", "-application", "voip",
+        "-f", "ogg", "pipe:1",
+    ]
+
+
+async def transcode_to_opus(src: str, dst: str, bitrate_kbps: int, ffmpeg: str = "ffmpeg") -> Dict[str, Any]:
+    """
+    Converts ``src`` to mono 16 kHz Opus/OGG at ``dst`` without blocking the
+    event loop: ffmpeg encodes into a pipe that is copied to ``dst``.
+
+    Returns the original and compressed sizes and the encode time. Raises
+    ``TranscodeError`` (and removes ``dst``) when ffmpeg fails.
+    """
+    t0 = time.perf_counter()
+    original = os.path.getsize(src)
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *opus_command(src, bitrate_kbps, ffmpeg),
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+    except OSError as e:
+        _stats["failures"] += 1
+        raise TranscodeError(f"Could not start ffmpeg: {e}") from e
+
+    compressed = 0
+    try:
+        with open(dst, "wb") as out:
+            while chunk := await proc.stdout.read(READ_SIZE):  # type: ignore[union-attr]
+                out.write(chunk)
+                compressed += len(chunk)
+        stderr = await proc.stderr.read()  # type: ignore[union-attr]
+        returncode = await proc.wait()
+    except BaseException:
+        if proc.returncode is None:
+            proc.kill()
+        raise
+    if returncode != 0 or compressed == 0:
+        _stats["failures"] += 1
+        try:
+            os.remove(dst)
+        except FileNotFoundError:
+            pass
+        raise TranscodeError(f"ffmpeg exited with {returncode}: {stderr.decode('utf-8', 'replace').strip()[-500:]}")
+
+    seconds = time.perf_counter() - t0
+    _stats["files"] += 1
+    _stats["original_bytes"] += original
+    _stats["compressed_bytes"] += compressed
+    _stats["seconds"] += seconds
+    return {
+        "original_bytes": original,
+        "compressed_bytes": compressed,
+        "ratio": round(compressed / original, 4) if original else 0.0,
+        "seconds": round(seconds, 3),
+    }
+
+
+def get_stats() -> Dict[str, Any]:
+    original = _stats["original_bytes"]
+    return {
+        **_stats,
+        "seconds": round(_stats["seconds"], 3),
+        "ratio": round(_stats["compressed_bytes"] / original, 4) if original else 0.0,
+    }
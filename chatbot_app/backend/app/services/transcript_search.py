@@ -0,0 +1,215 @@
+import logging
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import delete, exists, func, insert, or_, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import database
+
+logger = logging.getLogger(__name__)
+
+# Text search configurations per API language; "auto" matches either.
+SEARCH_CONFIGS = {"de": "german", "en": "english"}
+HEADLINE_OPTIONS = "StartSel=<mark>, StopSel=</mark>, MaxWords=30, MinWords=10, MaxFragments=2"
+# Whisper and chunked segments stay far below this; it bounds the index range a window read scans.
+MAX_SEGMENT_SECONDS = 600.0
+
+
+def _number(value: Any) -> Optional[float]:
+    return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+
+def segment_rows(transcription_id: int, segments: List[dict], processed: bool = False, start_index: int = 0) -> List[Dict[str, Any]]:
+    """Rows for ``transcript_segments`` from a raw or processed segment array."""
+    rows = []
+    for index, seg in enumerate(segments or [], start=start_index):
+        if not isinstance(seg, dict):
+            continue
+        rows.append({
+            "transcription_id": transcription_id,
+            "segment_index": index,
+            "start_time": _number(seg.get("start")),
+            "end_time": _number(seg.get("end")),
+            "speaker": seg.get("speaker") or None,
+            "text": str(seg.get("text") or ""),
+            "processed": processed,
+        })
+    return rows
+
+
+async def replace_segments_from(db: AsyncSession, transcription_id: int, from_index: int, rows: List[Dict[str, Any]]) -> int:
+    """
+    Replaces the segments at ``segment_index >= from_index`` with ``rows``
+    (whose indexes must start at ``from_index``) under a new revision of the
+    transcription, and returns that revision. Does not commit.
+    """
+    revision = await db.scalar(
+        update(database.Transcription)
+        .where(database.Transcription.id == transcription_id)
+        .values(revision=database.Transcription.revision + 1)
+        .returning(database.Transcription.revision)
+    )
+    seg = database.TranscriptSegment
+    await db.execute(delete(seg).where(seg.transcription_id == transcription_id, seg.segment_index >= from_index))
+    if rows:
+        await db.execute(insert(seg), [dict(row, revision=revision) for row in rows])
+    return revision
+
+
+async def segments_since(db: AsyncSession, transcription_id: int, since_revision: int) -> Optional[Dict[str, Any]]:
+    """
+    What changed after ``since_revision``: every write replaces a tail of the
+    segment list, so a client that truncates its copy to ``from_index`` and
+    appends ``segments`` is up to date with ``revision``. Returns None when the
+    transcription does not exist.
+    """
+    current = (await db.execute(
+        select(database.Transcription.revision, database.Transcription.processed_segments.isnot(None).label("complete"))
+        .where(database.Transcription.id == transcription_id)
+    )).first()
+    if current is None:
+        return None
+    seg = database.TranscriptSegment
+    segments: List[Dict[str, Any]] = []
+    count = await db.scalar(select(func.count()).where(seg.transcription_id == transcription_id))
+    from_index = count or 0
+    if current.revision > since_revision:
+        changed = await db.scalar(
+            select(func.min(seg.segment_index)).where(seg.transcription_id == transcription_id, seg.revision > since_revision)
+        )
+        if changed is not None:
+            from_index = changed
+            rows = (await db.execute(
+                select(seg.segment_index, seg.start_time, seg.end_time, seg.speaker, seg.text, seg.processed)
+                .where(seg.transcription_id == transcription_id, seg.segment_index >= from_index)
+                .order_by(seg.segment_index)
+            )).all()
+            segments = [_segment_dict(r) for r in rows]
+    return {
+        "transcription_id": transcription_id,
+        "revision": current.revision,
+        "since_revision": since_revision,
+        "from_index": from_index,
+        "count": from_index + len(segments),
+        "complete": bool(current.complete),
+        "segments": segments,
+    }
+
+
+def _segment_dict(row) -> Dict[str, Any]:
+    return {
+        "segment_index": row.segment_index, "start": row.start_time, "end": row.end_time,
+        "speaker": row.speaker, "text": row.text, "processed": row.processed,
+    }
+
+
+def _overlaps(seg_start: Optional[float], seg_end: Optional[float], start: float, end: float) -> bool:
+    if seg_start is None or seg_start >= end:
+        return False
+    return (seg_end if seg_end is not None else seg_start) > start or seg_start >= start
+
+
+def window_from_array(segments: List[dict], start: float, end: float, processed: bool = False) -> List[Dict[str, Any]]:
+    """The ``segments_in_window`` result computed from a stored segment array."""
+    rows = segment_rows(0, segments, processed=processed)
+    return [
+        {"segment_index": r["segment_index"], "start": r["start_time"], "end": r["end_time"], "speaker": r["speaker"], "text": r["text"], "processed": r["processed"]}
+        for r in rows if _overlaps(r["start_time"], r["end_time"], start, end)
+    ]
+
+
+async def segments_in_window(db: AsyncSession, transcription_id: int, start: float, end: float) -> Optional[List[Dict[str, Any]]]:
+    """
+    Segments of a transcription that overlap ``[start, end)`` seconds, in time
+    order, read through the (transcription_id, start_time) index. Returns None
+    when the transcription has no indexed segments at all.
+    """
+    seg = database.TranscriptSegment
+    stmt = (
+        select(seg.segment_index, seg.start_time, seg.end_time, seg.speaker, seg.text, seg.processed)
+        .where(
+            seg.transcription_id == transcription_id,
+            seg.start_time < end,
+            seg.start_time >= start - MAX_SEGMENT_SECONDS,
+            or_(seg.end_time > start, seg.start_time >= start),
+        )
+        .order_by(seg.start_time, seg.segment_index)
+    )
+    rows = (await db.execute(stmt)).all()
+    if not rows:
+        indexed = await db.scalar(select(exists().where(seg.transcription_id == transcription_id)))
+        if not indexed:
+            return None
+    return [_segment_dict(r) for r in rows]
+
+
+def _search_sql(language: str, order: str, scoped: bool) -> str:
+    configs = [SEARCH_CONFIGS[language]] if language in SEARCH_CONFIGS else list(SEARCH_CONFIGS.values())
+    columns = {"german": "tsv_de", "english": "tsv_en"}
+    # The tsquery is written inline per column so the planner can use each GIN index (BitmapOr for "auto").
+    matches = " OR ".join(f"s.{columns[c]} @@ websearch_to_tsquery('{c}', :q)" for c in configs)
+    ranks = [f"ts_rank_cd(s.{columns[c]}, websearch_to_tsquery('{c}', :q))" for c in configs]
+    rank = ranks[0] if len(ranks) == 1 else f"greatest({', '.join(ranks)})"
+    if order == "relevance":
+        inner_columns, inner_order_by = f"s.id, {rank} AS rank", "rank DESC, s.transcription_id DESC, s.segment_index"
+    else:
+        # "+ 0" keeps the planner from walking the (transcription_id, segment_index) index
+        # backwards hoping to meet matches early: for rare or unknown words that scans the
+        # whole table. A bitmap GIN scan plus top-N sort costs grow with the matches instead.
+        inner_columns, inner_order_by = "s.id", "s.transcription_id + 0 DESC, s.segment_index"
+    order_by = ("rank DESC, " if order == "relevance" else "") + "s.transcription_id DESC, s.segment_index"
+    headline_config = configs[0]
+    # Only the page of matching ids is selected first; text, rank and headline are
+    # computed for those rows alone.
+    return f"""
+        SELECT s.transcription_id, t.audio_source, t.created_at, s.segment_index, s.start_time, s.end_time,
+               s.speaker, s.text, {rank} AS rank,
+               ts_headline('{headline_config}', s.text, websearch_to_tsquery('{headline_config}', :q), '{HEADLINE_OPTIONS}') AS headline
+        FROM (
+            SELECT {inner_columns}
+            FROM transcript_segments s
+            WHERE ({matches}){" AND s.transcription_id = :transcription_id" if scoped else ""}
+            ORDER BY {inner_order_by}
+            LIMIT :limit OFFSET :offset
+        ) h
+        JOIN transcript_segments s ON s.id = h.id
+        JOIN transcriptions t ON t.id = s.transcription_id
+        ORDER BY {order_by}
+    """
+
+
+async def search(
+    db: AsyncSession,
+    query: str,
+    language: str = "auto",
+    order: str = "relevance",
+    limit: int = 20,
+    offset: int = 0,
+    transcription_id: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Full-text search over transcript segments. ``query`` uses web search
+    syntax ("quoted phrases", or, -exclusions). Each hit carries the
+    recording, the segment and its start/end time so a player can seek to it.
+    """
+    params: Dict[str, Any] = {"q": query, "limit": limit + 1, "offset": offset}
+    if transcription_id is not None:
+        params["transcription_id"] = transcription_id
+    result = await db.execute(text(_search_sql(language, order, transcription_id is not None)), params)
+    rows = result.mappings().all()
+    hits = [
+        {
+            "transcription_id": row["transcription_id"],
+            "audio_source": row["audio_source"],
+            "created_at": row["created_at"],
+            "segment_index": row["segment_index"],
+            "start": row["start_time"],
+            "end": row["end_time"],
+            "speaker": row["speaker"],
+            "text": row["text"],
+            "headline": row["headline"],
+            "rank": round(float(row["rank"]), 6),
+        }
+        for row in rows[:limit]
+    ]
+    return {"query": query, "language": language, "order": order, "hits": hits, "has_more": len(rows) > limit}
@@ -1,15 +1,17 @@
 import os
 import asyncio
-import requests
 import logging
 import json
 from openai import OpenAI
-from pydub import AudioSegment
-from math import ceil
 import shutil
+import hashlib
+import time
+from typing import Callable, Optional
+from sqlalchemy import delete, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from app import database
-from app.services import task_manager
+from app.config import settings
+from app.services import admission, task_manager, chunked_transcription, uploads, transcription_cache, windowed_processing, transcoding, live_transcript
 from app.services.storage import get_storage_service
 
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
@@ -18,64 +20,68 @@ logger = logging.getLogger(__name__)
 # Whisper API has a 25MB file size limit
 CHUNK_SIZE_MB = 20
 MAX_FILE_SIZE = CHUNK_SIZE_MB * 1024 * 1024
+WHISPER_MODEL = "whisper-1"
+POST_PROCESS_MODEL = "gpt-4-1106-preview"
+POST_PROCESS_PROMPT = "post_process_with_timestamps.txt"
 
 class TranscriptionPipeline:
     """
     Encapsulates the entire transcription process, ensuring consistent state
     and database session management.
     """
-    def __init__(self, db: AsyncSession, task_id: str, temp_path: str, audio_source: str):
+    def __init__(self, db: AsyncSession, task_id: str, temp_path: str, audio_source: str, content_sha256: Optional[str] = None):
         self.db = db
         self.task_id = task_id
         self.temp_path = temp_path
         self.audio_source = audio_source
+        self.content_sha256 = content_sha256
         self.transcription_record = None
+        self.transcription_id: Optional[int] = None
+        self.live: Optional[live_transcript.LiveTranscript] = None
+        self.transcode_sizes: Optional[dict] = None
 
     async def run(self):
         """Executes the full transcription and post-processing pipeline."""
+        started_at = time.perf_counter()
+        upload: Optional[asyncio.Task] = None
         try:
             logger.info(f"[Pipeline Task {self.task_id}] Starting...")
-            storage_service = get_storage_service()
-            audio_file_path = ""
+            # The record exists from the start so segments can be stored (and read
+            # through /transcriptions/{id}/delta) while the pipeline is still running.
+            await self._create_record()
+            self.live = live_transcript.LiveTranscript(self.transcription_id, started_at)  # type: ignore[arg-type]
 
-            if storage_service.check_connection():
-                logger.info(f"[Pipeline Task {self.task_id}] B2 connection is active. Uploading to cloud.")
-                object_key = os.path.basename(self.temp_path)
-                if storage_service.upload_file(self.temp_path, object_key):
-                    audio_file_path = object_key
-                else:
-                    logger.warning(f"[Pipeline Task {self.task_id}] B2 upload failed. Falling back to local storage.")
-            
-            if not audio_file_path:
-                local_audio_dir = os.path.join(os.path.dirname(__file__), '..', 'audio_files')
-                os.makedirs(local_audio_dir, exist_ok=True)
-                local_path = os.path.join(local_audio_dir, os.path.basename(self.temp_path))
-                shutil.copy(self.temp_path, local_path)
-                audio_file_path = local_path
-                logger.info(f"[Pipeline Task {self.task_id}] Saved file locally to {audio_file_path}")
+            async with self._stage("transcription"):
+                content_type = await self._transcode()
+                # Transcription reads the local file, so the upload runs alongside it
+                # and the first segments do not wait for a long recording to upload.
+                upload = asyncio.create_task(self._store_audio(content_type))
 
-            task_manager.update_task_status(
-                self.task_id,
-                "PROCESSING",
-                "Uploading and preparing audio...",
-                result=None,
-                progress=5,
-            )
-            # Yield to event loop so clients can read the update
-            await asyncio.sleep(0)
+                task_manager.update_task_status(
+                    self.task_id,
+                    "PROCESSING",
+                    "Uploading and preparing audio...",
+                    result={"transcription_id": None, "live_transcription_id": self.transcription_id, "status": "TRANSCRIBING"},
+                    progress=5,
+                )
+                # Yield to event loop so clients can read the update
+                await asyncio.sleep(0)
 
-            # Indicate Whisper is running to provide an intermediate message
-            task_manager.update_task_status(
-                self.task_id,
-                "PROCESSING",
-                "Transcribing with Whisper API...",
-                result=None,
-                progress=20,
-            )
-            await asyncio.sleep(0)
+                # Indicate Whisper is running to provide an intermediate message
+                task_manager.update_task_status(
+                    self.task_id,
+                    "PROCESSING",
+                    "Transcribing with Whisper API...",
+                    result=None,
+                    progress=20,
+                )
+                await asyncio.sleep(0)
 
-            # Run Whisper transcription in a background thread to avoid blocking the event loop
-            raw_segments = await asyncio.to_thread(transcribe_audio, self.temp_path, self.task_id)
+                # Run Whisper transcription in a background thread to avoid blocking the event loop
+                raw_segments = await asyncio.to_thread(
+                    transcribe_audio, self.temp_path, self.task_id, self.transcription_id, self.live.publish_raw
+                )
+            self.live.publish_raw(raw_segments)
 
             # Emit raw transcript to the client immediately after Whisper returns
             task_manager.update_task_status(
@@ -84,6 +90,7 @@ class TranscriptionPipeline:
                 "Transcription received from Whisper.",
                 result={
                     "transcription_id": None,
+                    "live_transcription_id": self.transcription_id,
                     "raw_segments": raw_segments,
                     "status": "RAW_TRANSCRIPT_READY",
                 },
@@ -91,8 +98,9 @@ class TranscriptionPipeline:
             )
             await asyncio.sleep(0)
 
-            # Persist to DB to obtain a transcription ID and audio path
-            await self._save_initial_transcription(raw_segments, audio_file_path)
+            # Persist the raw transcript together with where the audio ended up
+            audio_file_path = await upload
+            await self._save_raw_transcription(raw_segments, audio_file_path)
 
             # Update with the new transcription ID while preserving the same result structure
             task_manager.update_task_status(
@@ -100,7 +108,7 @@ class TranscriptionPipeline:
                 "PROCESSING",
                 "Raw transcript ready.",
                 result={
-                    "transcription_id": self.transcription_record.id,  # type: ignore
+                    "transcription_id": self.transcription_id,
                     "raw_segments": raw_segments,
                     "status": "RAW_TRANSCRIPT_READY",
                 },
@@ -118,119 +126,266 @@ class TranscriptionPipeline:
             )
             await asyncio.sleep(0)
             
-            task_manager.update_task_status(
-                self.task_id,
-                "PROCESSING",
-                "Structuring transcript for AI analysis...",
-                result=None,
-                progress=70,
-            )
+            async with self._stage("post_processing"):
+                task_manager.update_task_status(
+                    self.task_id,
+                    "PROCESSING",
+                    "Structuring transcript for AI analysis...",
+                    result=None,
+                    progress=70,
+                )
+
+                # Run LLM post-processing in a background thread as it uses blocking I/O
+                processed_text, processed_segments = await asyncio.to_thread(
+                    post_process_transcription_with_timestamps, raw_segments, self.task_id, self.live.publish_processed
+                )
+            self.live.publish_processed(processed_segments, len(raw_segments))
 
-            # Run LLM post-processing in a background thread as it uses blocking I/O
-            processed_text, processed_segments = await asyncio.to_thread(
-                post_process_transcription_with_timestamps, raw_segments, self.task_id
-            )
-            
             await self._update_with_processed_data(processed_text, processed_segments)
+            await self.live.close(audio_seconds=_timeline_seconds(raw_segments))
+            await self._store_in_cache()
 
             # --- Final Event: Processed Data is Ready ---
             final_result = {
-                "transcription_id": self.transcription_record.id, # type: ignore
+                "transcription_id": self.transcription_id,
                 "raw_segments": raw_segments,
                 "processed_segments": processed_segments,
+                "revision": self.live.revision,
+                "time_to_first_segment_seconds": self.live.first_segment_seconds,
             }
+            if self.transcode_sizes:
+                final_result["transcode"] = self.transcode_sizes
             task_manager.set_task_success(self.task_id, final_result)
             logger.info(f"[Pipeline Task {self.task_id}] Pipeline completed successfully.")
 
         except Exception as e:
             logger.error(f"An error occurred during transcription pipeline for task {self.task_id}: {e}", exc_info=True)
             task_manager.set_task_error(self.task_id, f"Internal Server Error: {e}")
+            await self._abandon(upload)
         finally:
             self._cleanup_temp_files()
 
-    async def _save_initial_transcription(self, raw_segments: list, object_key: str):
-        """Saves the initial raw transcription to the database."""
-        # This step is now part of the main flow and doesn't need its own progress update
-        # to avoid the large jump.
-        # task_manager.update_task_status(self.task_id, "PROCESSING", 75, "Saving initial transcript...")
-        full_transcription = " ".join(seg['text'] for seg in raw_segments)
-        
+    def _stage(self, stage: str):
+        """
+        Holds a slot of a pipeline stage (see ``admission``). While the task
+        waits for one, its message says so; /tasks/{id} adds the position.
+        """
+        def _on_queued(position: int):
+            current = task_manager.get_task_status(self.task_id) or {}
+            task_manager.update_task_status(
+                self.task_id,
+                current.get("status") or "PENDING",
+                f"Waiting for a free {stage.replace('_', '-')} slot...",
+                result=None,
+            )
+
+        return admission.slot(stage, self.task_id, on_queued=_on_queued)
+
+    async def _transcode(self) -> Optional[str]:
+        """
+        Replaces the temp file with a compact Opus/OGG copy when AUDIO_TRANSCODE
+        is "opus", so upload and transcription move fewer bytes. Returns the
+        content type of the file to upload (None when left as-is).
+        """
+        if settings.AUDIO_TRANSCODE != "opus":
+            return None
+        task_manager.update_task_status(self.task_id, "PROCESSING", "Compressing audio...", result=None, progress=2)
+        dst = os.path.splitext(self.temp_path)[0] + ".opus.ogg"
+        try:
+            sizes = await transcoding.transcode_to_opus(
+                self.temp_path, dst, settings.AUDIO_TRANSCODE_BITRATE_KBPS, ffmpeg=settings.FFMPEG_BINARY
+            )
+        except (transcoding.TranscodeError, OSError) as e:
+            logger.warning(f"[Pipeline Task {self.task_id}] Transcoding failed, using the original audio: {e}")
+            return None
+        logger.info(
+            f"[Pipeline Task {self.task_id}] Transcoded to Opus: {sizes['original_bytes']} -> "
+            f"{sizes['compressed_bytes']} bytes in {sizes['seconds']}s"
+        )
+        self.temp_path = dst
+        self.transcode_sizes = sizes
+        return "audio/ogg"
+
+    async def _create_record(self):
+        """Creates the transcription row the pipeline fills in as it goes."""
         self.transcription_record = database.Transcription(
             audio_source=self.audio_source,
-            raw_transcription=full_transcription,
-            raw_segments=raw_segments,
-            audio_file_path=object_key, # Store the B2 object key, not a local path
+            raw_transcription="",
+            raw_segments=[],
+            audio_file_path="",
+            status="processing",
         )
         self.db.add(self.transcription_record)
+        await self.db.flush()
+        self.transcription_id = self.transcription_record.id
+        # No refresh: that would keep a pooled connection in a transaction for the whole run.
         await self.db.commit()
-        await self.db.refresh(self.transcription_record)
-        logger.info(f"[Pipeline Task {self.task_id}] Saved initial transcription with ID: {self.transcription_record.id}")
+        logger.info(f"[Pipeline Task {self.task_id}] Created transcription with ID: {self.transcription_id}")
+
+    async def _store_audio(self, content_type: Optional[str]) -> str:
+        """Uploads the recording to B2 (local copy as fallback) and returns its storage path."""
+        storage_service = get_storage_service()
+        # Not reported as the task's queue position: transcription goes on meanwhile.
+        async with admission.slot("upload"):
+            if await storage_service.is_available_async(settings.STORAGE_HEALTH_TTL_SECONDS):
+                logger.info(f"[Pipeline Task {self.task_id}] B2 connection is active. Uploading to cloud.")
+                object_key = os.path.basename(self.temp_path)
+                if await storage_service.upload_file_async(self.temp_path, object_key, content_type=content_type):
+                    return object_key
+                logger.warning(f"[Pipeline Task {self.task_id}] B2 upload failed. Falling back to local storage.")
+
+            local_audio_dir = os.path.join(os.path.dirname(__file__), '..', 'audio_files')
+            os.makedirs(local_audio_dir, exist_ok=True)
+            local_path = os.path.join(local_audio_dir, os.path.basename(self.temp_path))
+            await asyncio.to_thread(shutil.copy, self.temp_path, local_path)
+            logger.info(f"[Pipeline Task {self.task_id}] Saved file locally to {local_path}")
+            return local_path
+
+    async def _save_raw_transcription(self, raw_segments: list, object_key: str):
+        """Saves the raw transcription and the audio location to the database."""
+        if not self.transcription_record:
+            raise ValueError("Transcription record not found. Cannot update.")
+        self.transcription_record.raw_transcription = " ".join(seg['text'] for seg in raw_segments)  # type: ignore
+        self.transcription_record.raw_segments = raw_segments  # type: ignore
+        self.transcription_record.audio_file_path = object_key  # type: ignore  # the B2 object key, not a local path
+        await self.db.commit()
+        logger.info(f"[Pipeline Task {self.task_id}] Saved raw transcription for ID: {self.transcription_id}")
 
     async def _update_with_processed_data(self, processed_text: str, processed_segments: list):
         """Updates the database record with the post-processed data."""
         if not self.transcription_record:
             raise ValueError("Transcription record not found. Cannot update.")
-            
-        pass
         self.transcription_record.processed_transcription = processed_text  # type: ignore
         self.transcription_record.processed_segments = processed_segments  # type: ignore
+        self.transcription_record.status = "completed"  # type: ignore
         await self.db.commit()
-        await self.db.refresh(self.transcription_record)
         logger.info(f"[Pipeline Task {self.task_id}] Updated transcription with processed data.")
 
+    async def _abandon(self, upload: Optional[asyncio.Task]):
+        """
+        After a failure: stops the upload and the segment writer, and removes
+        the transcription row when nothing of it was stored yet. A row with
+        segments stays readable by id (clients may have shown them) but is
+        marked failed, which keeps it out of the history list.
+        """
+        if upload is not None and not upload.done():
+            upload.cancel()
+        if upload is not None:
+            try:
+                await upload
+            except (asyncio.CancelledError, Exception):
+                pass
+        if self.live is not None:
+            await self.live.discard()
+        if self.transcription_id is None:
+            return
+        t = database.Transcription
+        kept = self.live is not None and self.live.revision
+        try:
+            async with database.AsyncSessionLocal() as session:
+                if kept:
+                    # Left alone if the failure came after the transcript was complete.
+                    await session.execute(
+                        update(t).where(t.id == self.transcription_id, t.status == "processing").values(status="failed")
+                    )
+                else:
+                    await session.execute(delete(t).where(t.id == self.transcription_id))
+                await session.commit()
+        except Exception as e:
+            logger.warning(f"[Pipeline Task {self.task_id}] Could not clean up transcription {self.transcription_id}: {e}")
+
+    async def _store_in_cache(self):
+        """Registers the finished transcription so identical re-uploads can skip the pipeline."""
+        if not self.content_sha256 or not self.transcription_record:
+            return
+        try:
+            await transcription_cache.store(
+                self.db, self.content_sha256, pipeline_config_key(), self.transcription_id  # type: ignore
+            )
+        except Exception as e:
+            logger.warning(f"[Pipeline Task {self.task_id}] Could not store result in transcription cache: {e}")
+
     def _cleanup_temp_files(self):
         """Removes the temporary directory and its contents."""
         temp_dir = os.path.dirname(self.temp_path)
         if os.path.exists(temp_dir):
             shutil.rmtree(temp_dir)
 
-def download_file(url: str, temp_dir: str, task_id: str) -> str:
-    """Downloads a file from a URL and saves it to a temporary directory."""
-    response = requests.get(url, stream=True)
-    response.raise_for_status()
-    
-    file_name = url.split("/")[-1]
+async def download_file(url: str, temp_dir: str, task_id: str) -> uploads.SpooledFile:
+    """Streams a file from a URL into a temporary directory without blocking the event loop."""
+    file_name = os.path.basename(url.split("?", 1)[0].rstrip("/")) or f"{task_id}.audio"
     temp_path = os.path.join(temp_dir, file_name)
-    
-    with open(temp_path, "wb") as f:
-        for chunk in response.iter_content(chunk_size=8192):
-            f.write(chunk)
-            
-    return temp_path
+    return await uploads.download_to_file(url, temp_path)
+
+def _should_chunk(audio_path: str) -> bool:
+    """Decides whether a file goes through the chunked transcription path."""
+    mode = settings.TRANSCRIPTION_CHUNKING
+    if mode == "off":
+        return False
+    if mode == "always":
+        return True
+    if os.path.getsize(audio_path) > MAX_FILE_SIZE:
+        return True
+    duration = chunked_transcription.probe_duration_seconds(audio_path)
+    return bool(duration and duration > settings.TRANSCRIPTION_CHUNK_SECONDS)
+
+def _timeline_seconds(segments: list[dict]) -> Optional[float]:
+    ends = [seg["end"] for seg in segments if isinstance(seg.get("end"), (int, float))]
+    return max(ends) if ends else None
 
-def transcribe_audio(audio_path: str, task_id: str) -> list[dict]:
+def transcribe_audio(
+    audio_path: str,
+    task_id: str,
+    transcription_id: Optional[int] = None,
+    on_partial: Optional[Callable[[list[dict]], None]] = None,
+) -> list[dict]:
     """
     Transcribes an audio file using the OpenAI Whisper API, returning detailed segments.
+
+    Long or oversized recordings are split on silence and transcribed chunk by
+    chunk in parallel (see ``chunked_transcription``); the stitched segments use
+    the same absolute timeline as a single-request transcription. Each time the
+    finished prefix of the timeline grows it is passed to ``on_partial``.
     """
     logger.info(f"[transcribe_audio] Starting transcription for: {audio_path} (Task ID: {task_id})")
     try:
-        file_size_mb = os.path.getsize(audio_path) / (1024 * 1024)
-        estimated_time_seconds = file_size_mb * 60
-        
-        # No progress updates needed from here anymore
-        pass
+        if _should_chunk(audio_path):
+            max_chunk_ms = min(
+                settings.TRANSCRIPTION_CHUNK_SECONDS * 1000,
+                chunked_transcription.max_chunk_ms_for_size(MAX_FILE_SIZE),
+            )
 
-        with open(audio_path, "rb") as audio_file:
-            logger.info(f"[transcribe_audio] Sending file to OpenAI API for transcription...")
-            transcription_response = client.audio.transcriptions.create(
-                model="whisper-1",
-                file=audio_file,
-                response_format="verbose_json"
+            def _on_chunk_done(done: int, total: int, partial_segments: list[dict]):
+                # Stream the contiguous, already-final prefix of the timeline to clients.
+                task_manager.update_task_status(
+                    task_id,
+                    "PROCESSING",
+                    f"Transcribed chunk {done} of {total}...",
+                    result={
+                        "transcription_id": None,
+                        "live_transcription_id": transcription_id,
+                        "raw_segments": partial_segments,
+                        "status": "PARTIAL_TRANSCRIPT",
+                    } if partial_segments else None,
+                    progress=20 + int(35 * done / total),
+                )
+                if on_partial and partial_segments:
+                    on_partial(partial_segments)
+
+            all_segments = chunked_transcription.transcribe_chunked(
+                audio_path,
+                transcribe_file=lambda path: chunked_transcription.transcribe_file_segments(client, path, WHISPER_MODEL),
+                max_chunk_ms=max_chunk_ms,
+                max_workers=settings.TRANSCRIPTION_CHUNK_WORKERS,
+                overlap_ms=int(settings.TRANSCRIPTION_CHUNK_OVERLAP_SECONDS * 1000),
+                on_chunk_done=_on_chunk_done,
             )
+        else:
+            logger.info(f"[transcribe_audio] Sending file to OpenAI API for transcription...")
+            all_segments = chunked_transcription.transcribe_file_segments(client, audio_path, WHISPER_MODEL)
             logger.info(f"[transcribe_audio] Received response from OpenAI.")
 
-        all_segments = []
-        if transcription_response.segments:
-            for segment in transcription_response.segments:
-                all_segments.append({
-                    "start": round(segment.start, 3),
-                    "end": round(segment.end, 3),
-                    "text": segment.text
-                })
-        
         logger.info("[transcribe_audio] Transcription processed successfully.")
-        # This is now handled by the main pipeline function
-        # task_manager.update_task_status(task_id, "PROCESSING", 98, "Finalizing transcription...")
         return all_segments
         
     except Exception as e:
@@ -244,10 +399,52 @@ def _load_prompt(file_name: str) -> str:
     with open(prompt_path, 'r', encoding='utf-8') as f:
         return f.read()
 
-def post_process_transcription_with_timestamps(segments: list[dict], task_id: str) -> tuple[str, list[dict]]:
+def pipeline_config_key() -> str:
+    """Digest of the models, prompt version and chunking settings that shape the pipeline output."""
+    prompt = _load_prompt(POST_PROCESS_PROMPT)
+    return transcription_cache.config_key({
+        "transcription_model": WHISPER_MODEL,
+        "post_process_model": POST_PROCESS_MODEL,
+        "post_process_prompt": hashlib.sha256(prompt.encode("utf-8")).hexdigest(),
+        "chunking": [settings.TRANSCRIPTION_CHUNKING, settings.TRANSCRIPTION_CHUNK_SECONDS],
+        "transcode": [settings.AUDIO_TRANSCODE, settings.AUDIO_TRANSCODE_BITRATE_KBPS],
+        "windowing": [settings.POST_PROCESS_WINDOWING, settings.POST_PROCESS_WINDOW_TOKENS, settings.POST_PROCESS_WINDOW_OVERLAP_SEGMENTS],
+    })
+
+def _post_process_segments(segments: list[dict]) -> list[dict]:
+    """Sends one batch of timestamped segments to the LLM and returns its processed segments."""
+    transcription_text = windowed_processing.format_segments(segments)
+    prompt_template = _load_prompt(POST_PROCESS_PROMPT)
+    system_prompt = prompt_template.format(transcription_text=transcription_text)
+    response = client.chat.completions.create(
+        model=POST_PROCESS_MODEL,
+        messages=[{"role": "system", "content": system_prompt}],
+        response_format={"type": "json_object"},
+        temperature=0.2,
+    )
+    llm_output_str = response.choices[0].message.content
+    if not llm_output_str:
+        raise ValueError("LLM returned an empty response.")
+    try:
+        return json.loads(llm_output_str).get("processed_segments", [])
+    except json.JSONDecodeError:
+        logger.error(f"[post_process_with_timestamps] LLM Output was: {llm_output_str}")
+        raise
+
+def post_process_transcription_with_timestamps(
+    segments: list[dict],
+    task_id: str,
+    on_partial: Optional[Callable[[list[dict], int], None]] = None,
+) -> tuple[str, list[dict]]:
     """
     Processes raw transcription segments using an LLM to clean text,
     diarize speakers, and return structured data with timestamps preserved.
+
+    Long transcripts are split into overlapping windows that are processed
+    concurrently (see ``windowed_processing``); speaker labels are reconciled
+    across window boundaries before the results are merged. As the finished
+    windows from the start grow, ``on_partial(processed, covered)`` receives
+    their merged segments and the number of raw segments they replace.
     """
     # Emit intermediate status updates to reflect LLM post-processing phases
     task_manager.update_task_status(
@@ -257,30 +454,35 @@ def post_process_transcription_with_timestamps(segments: list[dict], task_id: st
         result=None,
         progress=75,
     )
-    
-    transcription_text = ""
-    for s in segments:
-        transcription_text += f"[{s['start']:.2f} -> {s['end']:.2f}] {s['text']}\n"
-
-    prompt_template = _load_prompt("post_process_with_timestamps.txt")
-    system_prompt = prompt_template.format(transcription_text=transcription_text)
-    llm_output_str = ""
 
     try:
-        logger.info("[post_process_with_timestamps] Sending data to LLM for advanced processing.")
-        response = client.chat.completions.create(
-            model="gpt-4-1106-preview",
-            messages=[{"role": "system", "content": system_prompt}],
-            response_format={"type": "json_object"},
-            temperature=0.2,
-        )
-        
-        llm_output_str = response.choices[0].message.content
+        if windowed_processing.should_window(
+            segments, settings.POST_PROCESS_WINDOWING, settings.POST_PROCESS_WINDOW_TOKENS
+        ):
+            def _on_window_done(done: int, total: int):
+                task_manager.update_task_status(
+                    task_id,
+                    "PROCESSING",
+                    f"Processed transcript section {done} of {total}...",
+                    result=None,
+                    progress=75 + int(15 * done / total),
+                )
+
+            logger.info("[post_process_with_timestamps] Sending windowed data to LLM for advanced processing.")
+            processed_segments = windowed_processing.process_windowed(
+                segments,
+                process_window=lambda index, window: _post_process_segments(window),
+                max_tokens=settings.POST_PROCESS_WINDOW_TOKENS,
+                overlap_segments=settings.POST_PROCESS_WINDOW_OVERLAP_SEGMENTS,
+                max_workers=settings.POST_PROCESS_WINDOW_WORKERS,
+                on_window_done=_on_window_done,
+                on_prefix_ready=on_partial,
+            )
+        else:
+            logger.info("[post_process_with_timestamps] Sending data to LLM for advanced processing.")
+            processed_segments = _post_process_segments(segments)
         logger.info("[post_process_with_timestamps] Received LLM response.")
 
-        if not llm_output_str:
-            raise ValueError("LLM returned an empty response.")
-        
         # Indicate finalization phase after receiving LLM output
         task_manager.update_task_status(
             task_id,
@@ -290,10 +492,6 @@ def post_process_transcription_with_timestamps(segments: list[dict], task_id: st
             progress=90,
         )
 
-        llm_output_json = json.loads(llm_output_str)
-        
-        processed_segments = llm_output_json.get("processed_segments", [])
-        
         full_transcript_text = "\n".join(
             f"{seg.get('speaker', '')}: {seg.get('text', '')}" for seg in processed_segments
         )
@@ -302,10 +500,9 @@ def post_process_transcription_with_timestamps(segments: list[dict], task_id: st
 
     except json.JSONDecodeError as e:
         logger.error(f"[post_process_with_timestamps] Failed to decode JSON from LLM response: {e}")
-        logger.error(f"LLM Output was: {llm_output_str}")
         task_manager.set_task_error(task_id, "Failed to parse the processed transcription.")
         raise
     except Exception as e:
         logger.error(f"[post_process_with_timestamps] An error occurred: {e}", exc_info=True)
         task_manager.set_task_error(task_id, "A critical error occurred during post-processing.")
-        raise
\ No newline at end of file
+        raise
@@ -0,0 +1,83 @@
+import datetime
+import hashlib
+import json
+import logging
+from typing import Any, Dict, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import database
+
+logger = logging.getLogger(__name__)
+
+# Process-local counters, exposed through /transcription-cache/stats.
+_stats: Dict[str, int] = {"hits": 0, "misses": 0, "stores": 0}
+
+
+def config_key(config: Dict[str, Any]) -> str:
+    """Stable digest of everything that influences the pipeline output (models, prompt versions, chunking)."""
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def record_lookup(hit: bool):
+    """Counts a cache lookup made outside ``lookup`` (e.g. the media pipeline's content check)."""
+    _stats["hits" if hit else "misses"] += 1
+
+
+def get_stats() -> Dict[str, Any]:
+    lookups = _stats["hits"] + _stats["misses"]
+    return {**_stats, "hit_rate": round(_stats["hits"] / lookups, 4) if lookups else 0.0}
+
+
+async def lookup(db: AsyncSession, content_sha256: str, cfg_key: str) -> Optional[database.Transcription]:
+    """
+    Returns the finished transcription previously produced for the same audio
+    bytes and pipeline configuration, or None. Entries whose transcription was
+    never post-processed do not count as hits.
+    """
+    stmt = (
+        select(database.Transcription)
+        .join(database.TranscriptionCacheEntry, database.TranscriptionCacheEntry.transcription_id == database.Transcription.id)
+        .where(
+            database.TranscriptionCacheEntry.content_sha256 == content_sha256,
+            database.TranscriptionCacheEntry.config_key == cfg_key,
+            database.Transcription.processed_segments.isnot(None),
+        )
+        .limit(1)
+    )
+    record = (await db.execute(stmt)).scalars().first()
+    record_lookup(hit=record is not None)
+    if record is None:
+        return None
+    await db.execute(
+        update(database.TranscriptionCacheEntry)
+        .where(
+            database.TranscriptionCacheEntry.content_sha256 == content_sha256,
+            database.TranscriptionCacheEntry.config_key == cfg_key,
+        )
+        .values(
+            hit_count=database.TranscriptionCacheEntry.hit_count + 1,
+            last_hit_at=datetime.datetime.utcnow(),
+        )
+    )
+    await db.commit()
+    return record
+
+
+async def store(db: AsyncSession, content_sha256: str, cfg_key: str, transcription_id: int):
+    """Points the (content, config) key at ``transcription_id``, replacing any older entry."""
+    stmt = pg_insert(database.TranscriptionCacheEntry).values(
+        content_sha256=content_sha256,
+        config_key=cfg_key,
+        transcription_id=transcription_id,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["content_sha256", "config_key"],
+        set_={"transcription_id": stmt.excluded.transcription_id, "created_at": datetime.datetime.utcnow()},
+    )
+    await db.execute(stmt)
+    await db.commit()
+    _stats["stores"] += 1
+    logger.info(f"Cached transcription {transcription_id} for audio sha256={content_sha256[:12]}")
@@ -0,0 +1,92 @@
+import hashlib
+import logging
+import os
+from typing import NamedTuple, Optional
+
+import aiofiles
+import httpx
+from fastapi import UploadFile
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class UploadTooLargeError(Exception):
+    """Raised when an upload or download exceeds ``MAX_UPLOAD_MB``."""
+
+
+class SpooledFile(NamedTuple):
+    path: str
+    size_bytes: int
+    sha256: str
+
+
+def _max_bytes(max_bytes: Optional[int]) -> int:
+    return max_bytes if max_bytes is not None else settings.MAX_UPLOAD_MB * 1024 * 1024
+
+
+def _discard(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+async def spool_upload(upload: UploadFile, dest_path: str, max_bytes: Optional[int] = None) -> SpooledFile:
+    """
+    Copies an uploaded file to ``dest_path`` in fixed-size chunks, hashing as it
+    goes. Memory use is bounded by ``UPLOAD_CHUNK_SIZE_KB`` regardless of the
+    file size; the partial file is removed if the size cap is exceeded.
+    """
+    limit = _max_bytes(max_bytes)
+    chunk_size = settings.UPLOAD_CHUNK_SIZE_KB * 1024
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(dest_path, "wb") as out:
+            while True:
+                chunk = await upload.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > limit:
+                    raise UploadTooLargeError(f"Upload exceeds the {limit // (1024 * 1024)} MB limit.")
+                digest.update(chunk)
+                await out.write(chunk)
+    except BaseException:
+        _discard(dest_path)
+        raise
+    logger.info(f"Spooled upload to {dest_path} ({size} bytes, sha256={digest.hexdigest()[:12]})")
+    return SpooledFile(dest_path, size, digest.hexdigest())
+
+
+async def download_to_file(url: str, dest_path: str, max_bytes: Optional[int] = None) -> SpooledFile:
+    """
+    Streams ``url`` to ``dest_path`` with a non-blocking HTTP client so other
+    requests on the event loop keep being served during long downloads.
+    """
+    limit = _max_bytes(max_bytes)
+    chunk_size = settings.UPLOAD_CHUNK_SIZE_KB * 1024
+    digest = hashlib.sha256()
+    size = 0
+    timeout = httpx.Timeout(settings.DOWNLOAD_TIMEOUT_SECONDS, connect=10.0)
+    try:
+        async with httpx.AsyncClient(follow_redirects=True, timeout=timeout) as client:
+            async with client.stream("GET", url) as response:
+                response.raise_for_status()
+                declared = int(response.headers.get("content-length") or 0)
+                if declared > limit:
+                    raise UploadTooLargeError(f"Remote file exceeds the {limit // (1024 * 1024)} MB limit.")
+                async with aiofiles.open(dest_path, "wb") as out:
+                    async for chunk in response.aiter_bytes(chunk_size):
+                        size += len(chunk)
+                        if size > limit:
+                            raise UploadTooLargeError(f"Remote file exceeds the {limit // (1024 * 1024)} MB limit.")
+                        digest.update(chunk)
+                        await out.write(chunk)
+    except BaseException:
+        _discard(dest_path)
+        raise
+    logger.info(f"Downloaded {url} to {dest_path} ({size} bytes, sha256={digest.hexdigest()[:12]})")
+    return SpooledFile(dest_path, size, digest.hexdigest())
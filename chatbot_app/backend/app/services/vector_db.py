@@ -1,9 +1,17 @@
 import os
+import time
 import random
-import chromadb
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
 from chromadb.utils import embedding_functions
-import random
+import numpy as np
 from app.config import settings
+from app.services.embedding_service import embedding_service
+from app.services.lexical_index import lexical_index, rrf_fuse
+from app.services.vector_store import ChromaVectorStore, LocalVectorStore, VectorStore, matches_where
 
 # --- Embedding Function ---
 openai_ef = embedding_functions.OpenAIEmbeddingFunction(
@@ -11,62 +19,252 @@ openai_ef = embedding_functions.OpenAIEmbeddingFunction(
     model_name=settings.EMBEDDING_MODEL
 )
 
-# --- ChromaDB Client ---
-# This service now assumes the DB and collection are created and populated
-# by the offline `ingest_data.py` script.
-client = chromadb.PersistentClient(path=settings.CHROMA_DB_PATH)
-_collection = None
+# --- Journey Store ---
+# VECTOR_STORE_BACKEND picks the implementation (see app/services/vector_store.py).
+# Neither backend touches the disk until the first request.
+_store: Optional[VectorStore] = None
+_store_lock = threading.Lock()
 
-def get_collection():
-    """
-    Returns the ChromaDB collection, initializing it if necessary.
-    """
-    global _collection
-    if _collection is None:
-        _collection = client.get_collection(name=settings.CHROMA_COLLECTION_NAME, embedding_function=openai_ef) # type: ignore
-    return _collection
+# Store queries (including the query embedding request) are blocking. The
+# async wrappers below run them on this bounded pool so a slow search never
+# stalls the event loop and at most VECTOR_DB_WORKERS run at once.
+_executor = ThreadPoolExecutor(max_workers=settings.VECTOR_DB_WORKERS, thread_name_prefix="vector_db")
+
+async def _run_in_executor(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
 
-def get_or_create_collection():
+def get_store() -> VectorStore:
     """
-    Gets or creates the ChromaDB collection.
+    Returns the configured journey store, creating it if necessary.
     """
-    global _collection
-    _collection = client.get_or_create_collection(name=settings.CHROMA_COLLECTION_NAME, embedding_function=openai_ef) # type: ignore
-    return _collection
+    global _store
+    with _store_lock:
+        if _store is None:
+            if settings.VECTOR_STORE_BACKEND == "local":
+                _store = LocalVectorStore(
+                    settings.LOCAL_VECTOR_STORE_PATH
+                    or os.path.join(settings.CHROMA_DB_PATH, f"{settings.CHROMA_COLLECTION_NAME}.local"),
+                    ivf_min_rows=settings.LOCAL_VECTOR_IVF_MIN_ROWS,
+                    nprobe=settings.LOCAL_VECTOR_IVF_NPROBE,
+                    compact_ratio=settings.LOCAL_VECTOR_COMPACT_RATIO,
+                    max_segments=settings.LOCAL_VECTOR_MAX_SEGMENTS,
+                )
+            else:
+                _store = ChromaVectorStore(settings.CHROMA_DB_PATH, settings.CHROMA_COLLECTION_NAME, openai_ef)
+        return _store
+
+def _embed_query(text: str) -> np.ndarray:
+    return embedding_service.embed_one(text)
 
 def search_journeys(query_text, n_results=3, where_filter=None):
     """
     Searches the collection for journeys with an optional metadata filter.
+    In ``SEARCH_MODE=hybrid`` dense and BM25 rankings are fused (see
+    ``_hybrid_search``); the result shape is the same in both modes.
     """
-    collection = get_collection()
+    store = get_store()
     if where_filter and not isinstance(where_filter, dict):
         print("Warning: Invalid where_filter provided. Must be a dict. Ignoring filter.")
         where_filter = None
+    # Chroma rejects an empty ``where``; "no filters" must be passed as None.
+    where_filter = where_filter or None
+
+    print(f"DEBUG: Vector store 'where' filter: {where_filter}")
+    if settings.SEARCH_MODE == "hybrid":
+        lexical_index.ensure_built(store)
+        if lexical_index.available:
+            return _hybrid_search(store, query_text, n_results, where_filter)
+    return store.query(_embed_query(query_text), n_results=n_results, where=where_filter)
+
+def _distance_fn(space):
+    """Distance in the store's space, for hits only the lexical side returned."""
+    if space == "cosine":
+        return lambda q, v: 1.0 - float(np.dot(q, v) / ((np.linalg.norm(q) * np.linalg.norm(v)) or 1.0))
+    if space == "ip":
+        return lambda q, v: 1.0 - float(np.dot(q, v))
+    return lambda q, v: float(np.sum((q - v) ** 2))
+
+def _hybrid_search(store, query_text, n_results, where_filter):
+    """
+    Reciprocal rank fusion of the top ``HYBRID_CANDIDATES`` dense hits and BM25
+    hits. Lexical hits are held to the same ``where_filter`` (evaluated on their
+    metadata); those the dense side did not return get their distance computed
+    from the stored embedding so callers see real distances throughout.
+    """
+    candidates = max(n_results, settings.HYBRID_CANDIDATES)
+    query_embedding = _embed_query(query_text)
+    dense = store.query(query_embedding, n_results=candidates, where=where_filter)
+    rows = {
+        id_: (doc, md, dist)
+        for id_, doc, md, dist in zip(dense['ids'][0], dense['documents'][0], dense['metadatas'][0], dense['distances'][0])
+    }
+    lexical_ids = [id_ for id_, _ in lexical_index.search(query_text, candidates)]
+    missing = [id_ for id_ in lexical_ids if id_ not in rows]
+    if missing:
+        distance = _distance_fn(store.space)
+        extra = store.get(ids=missing, include=["documents", "metadatas", "embeddings"])
+        for id_, doc, md, emb in zip(extra['ids'], extra['documents'], extra['metadatas'], extra['embeddings']):
+            if where_filter is None or matches_where(md, where_filter):
+                rows[id_] = (doc, md, distance(query_embedding, np.asarray(emb, dtype=np.float32)))
+    lexical_ids = [id_ for id_ in lexical_ids if id_ in rows]
+
+    fused = rrf_fuse([dense['ids'][0], lexical_ids])[:n_results]
+    return {
+        'ids': [fused],
+        'documents': [[rows[id_][0] for id_ in fused]],
+        'metadatas': [[rows[id_][1] for id_ in fused]],
+        'distances': [[rows[id_][2] for id_ in fused]],
+    }
+
+def get_journeys_by_ids(ids, distances=None):
+    """
+    Fetches journeys by id and returns them in the same shape as
+    ``search_journeys`` (one result list, in the order of ``ids``). Ids that no
+    longer exist are skipped.
+    """
+    found = get_store().get(ids=list(ids))
+    by_id = {
+        id_: (doc, md)
+        for id_, doc, md in zip(found.get('ids') or [], found.get('documents') or [], found.get('metadatas') or [])
+    }
+    distances = distances or [0.0] * len(ids)
+    kept = [(id_, by_id[id_], dist) for id_, dist in zip(ids, distances) if id_ in by_id]
+    return {
+        'ids': [[id_ for id_, _, _ in kept]],
+        'documents': [[doc for _, (doc, _), _ in kept]],
+        'metadatas': [[md for _, (_, md), _ in kept]],
+        'distances': [[dist for _, _, dist in kept]],
+    }
+
+class JourneyIdIndex:
+    """
+    Cached id list and document count for the journeys collection.
 
-    print(f"DEBUG: ChromaDB 'where' filter: {where_filter}")
-    return collection.query(
-        query_texts=[query_text],
-        n_results=n_results,
-        where=where_filter
-    )
+    Sampling used to fetch every id from Chroma per request; with the ids held
+    here a sample of k costs O(k) plus one ``get`` for the chosen documents. The
+    index is loaded on first use, extended by ``IngestionService`` through
+    ``add``, and reloaded after ``ttl_seconds`` so writes made by other
+    processes (the offline ingest script) are picked up eventually.
+    """
+
+    # Filtered sampling draws candidate batches and checks their metadata
+    # locally (Chroma's ``get(ids=..., where=...)`` scans far more than the
+    # given ids); after this many growing rounds it falls back to one filtered
+    # scan of the collection.
+    FILTER_ROUNDS = 2
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._ids: List[str] = []
+        self._known: set = set()
+        self._loaded_at: Optional[float] = None
+        self._count: Optional[int] = None
+        self._counted_at: Optional[float] = None
+
+    def _fresh(self, stamp: Optional[float]) -> bool:
+        return stamp is not None and time.monotonic() - stamp <= self.ttl_seconds
+
+    def _ensure_loaded(self) -> List[str]:
+        with self._lock:
+            if not self._fresh(self._loaded_at):
+                ids = get_store().get(include=[])['ids']
+                self._ids = list(ids)
+                self._known = set(ids)
+                self._loaded_at = self._counted_at = time.monotonic()
+                self._count = len(ids)
+            return self._ids
+
+    def count(self) -> int:
+        with self._lock:
+            if self._fresh(self._counted_at):
+                return self._count or 0
+        count = get_store().count()
+        with self._lock:
+            # An empty collection is cheap to count and is the state most likely
+            # to change soon, so it is not cached.
+            self._count = count
+            self._counted_at = time.monotonic() if count else None
+        return count
+
+    def add(self, ids: List[str]):
+        """Records ids just written to the collection by this process."""
+        with self._lock:
+            if self._loaded_at is None:
+                self._counted_at = None
+                return
+            new_ids = [id_ for id_ in dict.fromkeys(ids) if id_ not in self._known]
+            self._ids.extend(new_ids)
+            self._known.update(new_ids)
+            self._count = len(self._ids)
+            self._counted_at = time.monotonic()
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = self._counted_at = None
 
-def get_random_journeys(n_results=5):
+    def sample(self, k: int, where: Optional[dict] = None, rng: Optional[random.Random] = None) -> List[str]:
+        """Returns up to ``k`` distinct random ids, optionally only ones matching a Chroma ``where`` filter."""
+        rng = rng or random
+        ids = self._ensure_loaded()
+        n = len(ids)
+        if n == 0 or k <= 0:
+            return []
+        if not where:
+            return [ids[i] for i in rng.sample(range(n), min(k, n))]
+
+        picked: List[str] = []
+        seen: set = set()
+        batch = max(k * 8, 256)
+        for _ in range(self.FILTER_ROUNDS):
+            candidates = [ids[i] for i in rng.sample(range(n), min(batch, n)) if ids[i] not in seen]
+            seen.update(candidates)
+            if candidates:
+                found = get_store().get(ids=candidates, include=["metadatas"])
+                picked.extend(
+                    id_ for id_, md in zip(found['ids'], found['metadatas'] or []) if matches_where(md, where)
+                )
+            if len(picked) >= k or len(seen) >= n:
+                break
+            batch *= 4
+        else:
+            matching = get_store().get(where=where, include=[])['ids']
+            return rng.sample(matching, min(k, len(matching)))
+        rng.shuffle(picked)
+        return picked[:k]
+
+
+journey_index = JourneyIdIndex(ttl_seconds=settings.VECTOR_DB_INDEX_TTL_SECONDS)
+
+def get_random_journeys(n_results=5, where_filter=None):
     """
-    Retrieves a random sample of journeys from the collection.
+    Retrieves a random sample of journeys from the collection, optionally
+    restricted by a metadata filter.
     """
-    collection = get_collection()
-    all_ids = collection.get(include=[])['ids']
-    if not all_ids:
+    random_ids = journey_index.sample(n_results, where=where_filter or None)
+    if not random_ids:
         return None
-        
-    sample_size = min(n_results, len(all_ids))
-    random_ids = random.sample(all_ids, sample_size)
-    
-    return collection.get(ids=random_ids)
+    return get_store().get(ids=random_ids)
 
 def get_collection_count():
     """
-    Returns the number of documents in the collection.
+    Returns the number of documents in the store (cached, see ``JourneyIdIndex``).
     """
-    collection = get_collection()
-    return collection.count()
+    return journey_index.count()
+
+async def search_journeys_async(query_text, n_results=3, where_filter=None):
+    """Non-blocking ``search_journeys`` for request handlers."""
+    return await _run_in_executor(search_journeys, query_text, n_results=n_results, where_filter=where_filter)
+
+async def get_journeys_by_ids_async(ids, distances=None):
+    """Non-blocking ``get_journeys_by_ids`` for request handlers."""
+    return await _run_in_executor(get_journeys_by_ids, ids, distances)
+
+async def get_random_journeys_async(n_results=5, where_filter=None):
+    """Non-blocking ``get_random_journeys`` for request handlers."""
+    return await _run_in_executor(get_random_journeys, n_results=n_results, where_filter=where_filter)
+
+async def get_collection_count_async():
+    """Non-blocking ``get_collection_count`` for request handlers."""
+    return await _run_in_executor(get_collection_count)
@@ -0,0 +1,636 @@
+import os
+import json
+import shutil
+import uuid
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INCLUDE = ("documents", "metadatas")
+
+_WHERE_OPERATORS = {
+    "$eq": lambda v, x: v == x,
+    "$ne": lambda v, x: v != x,
+    "$gt": lambda v, x: v is not None and v > x,
+    "$gte": lambda v, x: v is not None and v >= x,
+    "$lt": lambda v, x: v is not None and v < x,
+    "$lte": lambda v, x: v is not None and v <= x,
+    "$in": lambda v, x: v in x,
+    "$nin": lambda v, x: v not in x,
+}
+
+_COLUMN_OPERATORS = {
+    "$gt": np.greater,
+    "$gte": np.greater_equal,
+    "$lt": np.less,
+    "$lte": np.less_equal,
+}
+
+def matches_where(metadata, where) -> bool:
+    """Evaluates a Chroma ``where`` clause against one metadata dict."""
+    metadata = metadata or {}
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches_where(metadata, c) for c in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_where(metadata, c) for c in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            try:
+                if not all(_WHERE_OPERATORS[op](value, operand) for op, operand in condition.items()):
+                    return False
+            except TypeError:
+                return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+
+class VectorStore:
+    """
+    The operations ``vector_db`` needs from a journey store. Results use
+    Chroma's shapes: ``query`` returns one nested list per key (``ids``,
+    ``documents``, ``metadatas``, ``distances``), ``get`` returns flat lists.
+    ``where`` clauses follow Chroma's metadata filter syntax.
+    """
+
+    # Distance reported by ``query``: "l2" (squared), "cosine" or "ip".
+    space = "l2"
+
+    def add(self, ids: Sequence[str], embeddings, documents: Sequence[str], metadatas: Sequence[dict]):
+        """Inserts or replaces the given records."""
+        raise NotImplementedError
+
+    def query(self, embedding, n_results: int, where: Optional[dict] = None) -> Dict[str, list]:
+        raise NotImplementedError
+
+    def get(
+        self,
+        ids: Optional[Sequence[str]] = None,
+        where: Optional[dict] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        include: Sequence[str] = DEFAULT_INCLUDE,
+    ) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+
+class ChromaVectorStore(VectorStore):
+    """The existing Chroma collection; client and collection are opened on first use."""
+
+    def __init__(self, path: str, collection_name: str, embedding_function):
+        self.path = path
+        self.collection_name = collection_name
+        self.embedding_function = embedding_function
+        self._client = None
+        self._collection = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            import chromadb
+            self._client = chromadb.PersistentClient(path=self.path)
+        return self._client
+
+    @property
+    def collection(self):
+        with self._lock:
+            if self._collection is None:
+                self._collection = self.client.get_or_create_collection(
+                    name=self.collection_name, embedding_function=self.embedding_function  # type: ignore
+                )
+            return self._collection
+
+    @property
+    def space(self):
+        return ((self.collection.configuration or {}).get("hnsw") or {}).get("space", "l2")
+
+    def add(self, ids, embeddings, documents, metadatas):
+        batch = self.client.get_max_batch_size()
+        for start in range(0, len(ids), batch):
+            end = start + batch
+            self.collection.upsert(
+                ids=list(ids[start:end]),
+                embeddings=[list(map(float, e)) for e in embeddings[start:end]],
+                documents=list(documents[start:end]),
+                metadatas=list(metadatas[start:end]),
+            )
+
+    def query(self, embedding, n_results, where=None):
+        return self.collection.query(
+            query_embeddings=[np.asarray(embedding, dtype=np.float32)],
+            n_results=n_results,
+            where=where,
+            include=["documents", "metadatas", "distances"],
+        )
+
+    def get(self, ids=None, where=None, limit=None, offset=0, include=DEFAULT_INCLUDE):
+        return self.collection.get(
+            ids=list(ids) if ids is not None else None,
+            where=where,
+            limit=limit,
+            offset=offset or None,
+            include=list(include),
+        )
+
+    def count(self):
+        return self.collection.count()
+
+
+class _Segment:
+    """One batch of records in a ``LocalVectorStore`` directory; never modified once written."""
+
+    def __init__(self, path: str, entry: dict):
+        self.name = entry["name"]
+        self.count = entry["count"]
+        self.fields: Dict[str, str] = entry["fields"]
+        self.vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        self.ids = np.load(os.path.join(path, "ids.npy"), mmap_mode="r")
+        self.doc_offsets = np.load(os.path.join(path, "doc_offsets.npy"), mmap_mode="r")
+        docs_path = os.path.join(path, "documents.bin")
+        self.docs = np.memmap(docs_path, dtype=np.uint8, mode="r") if os.path.getsize(docs_path) else np.zeros(0, np.uint8)
+        self.columns = {}
+        for i, name in enumerate(self.fields):
+            values = np.load(os.path.join(path, f"meta_{i}.npy"), mmap_mode="r")
+            present = np.load(os.path.join(path, f"meta_{i}_present.npy"), mmap_mode="r")
+            self.columns[name] = (values, present)
+        self.ivf_centroids = None
+        self.ivf_offsets = None
+        if entry.get("ivf"):
+            self.ivf_centroids = np.load(os.path.join(path, "ivf_centroids.npy"))
+            self.ivf_offsets = np.load(os.path.join(path, "ivf_offsets.npy"))
+        # Rows of older segments that this one replaced, by segment name.
+        self.replaces = {
+            target: np.load(os.path.join(path, f"replaces_{target}.npy")) for target in entry.get("replaces", ())
+        }
+        self._row_of: Optional[Dict[str, int]] = None
+
+    def row_of(self) -> Dict[str, int]:
+        if self._row_of is None:
+            self._row_of = {str(id_): row for row, id_ in enumerate(self.ids)}
+        return self._row_of
+
+    def document(self, row: int) -> str:
+        return bytes(self.docs[self.doc_offsets[row]:self.doc_offsets[row + 1]]).decode("utf-8")
+
+    def metadata(self, row: int) -> dict:
+        md = {}
+        for name, kind in self.fields.items():
+            values, present = self.columns[name]
+            if present[row]:
+                value = values[row]
+                md[name] = str(value) if kind == "str" else bool(value) if kind == "bool" else int(value) if kind == "int" else float(value)
+        return md
+
+
+class _Snapshot:
+    """One consistent, read-only view of a ``LocalVectorStore`` directory: its segments, oldest first."""
+
+    def __init__(self, path: str, previous: Optional["_Snapshot"] = None):
+        with open(os.path.join(path, "manifest.json"), encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        # A version 1 store is a single segment at the top of the directory.
+        self.legacy = "segments" not in self.manifest
+        entries = [dict(self.manifest, name=".")] if self.legacy else self.manifest["segments"]
+        reuse = {seg.name: seg for seg in previous.segments if seg.name != "."} if previous else {}
+        self.segments = [reuse.get(e["name"]) or _Segment(os.path.join(path, e["name"]), e) for e in entries]
+        dead: Dict[str, List[np.ndarray]] = {}
+        for seg in self.segments:
+            for target, rows in seg.replaces.items():
+                dead.setdefault(target, []).append(rows)
+        # Per segment, None if none of its rows were replaced, else the mask of the current ones.
+        self.live: List[Optional[np.ndarray]] = []
+        for seg in self.segments:
+            live = None
+            if seg.name in dead:
+                live = np.ones(seg.count, dtype=bool)
+                live[np.concatenate(dead[seg.name])] = False
+            self.live.append(live)
+        self.count = sum(self.live_count(i) for i in range(len(self.segments)))
+
+    def live_count(self, i: int) -> int:
+        live = self.live[i]
+        return self.segments[i].count if live is None else int(np.count_nonzero(live))
+
+    def locate(self, id_: str) -> Optional[Tuple[int, int]]:
+        """(segment index, row) of the current record for ``id_``."""
+        # A replaced record always has a copy in a newer segment, so the newest hit is the current one.
+        for i in range(len(self.segments) - 1, -1, -1):
+            row = self.segments[i].row_of().get(id_)
+            if row is not None:
+                return i, row
+        return None
+
+
+def _field_kind(values: List[Any]) -> str:
+    if all(isinstance(v, bool) for v in values):
+        return "bool"
+    if all(isinstance(v, int) and not isinstance(v, bool) for v in values):
+        return "int"
+    if all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values):
+        return "float"
+    return "str"
+
+
+def _normalize(vectors) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _kmeans(vectors: np.ndarray, nlist: int, iterations: int = 8, seed: int = 0) -> np.ndarray:
+    """Spherical k-means on a sample of ``vectors``; returns unit-length centroids."""
+    rng = np.random.default_rng(seed)
+    sample = vectors[np.sort(rng.choice(len(vectors), min(len(vectors), nlist * 40), replace=False))]
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, sample)
+        filled = np.bincount(assign, minlength=nlist) > 0
+        centroids[filled] = _normalize(sums[filled])
+    return centroids
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray, chunk: int = 65536) -> np.ndarray:
+    return np.concatenate([
+        np.argmax(vectors[i:i + chunk] @ centroids.T, axis=1) for i in range(0, len(vectors), chunk)
+    ]) if len(vectors) else np.zeros(0, np.int64)
+
+
+class LocalVectorStore(VectorStore):
+    """
+    In-process journey store for corpora that fit a memory-mapped matrix.
+
+    A store is a directory of segments plus a ``manifest.json`` listing them.
+    A segment holds ``.npy`` files: unit-length float32 embeddings, ids,
+    documents (one UTF-8 blob plus offsets) and one column per metadata field.
+    Opening a store only maps the files, so cold start is independent of
+    corpus size. Search is an exact cosine scan per segment, with filters
+    evaluated on the metadata columns as boolean masks.
+
+    ``add`` appends a segment with the new records, and tombstones for the
+    rows of older segments they replace; the manifest is swapped atomically,
+    so readers always see a whole batch or none of it. Once the segments
+    after the first hold more than ``compact_ratio`` of its rows, everything
+    is rewritten into one segment; before that, more than ``max_segments`` of
+    them are merged into one.
+
+    A rewritten segment of at least ``ivf_min_rows`` records is also
+    partitioned with k-means and stored grouped by partition, so a query only
+    scans the ``nprobe`` partitions closest to it (contiguous slices, no
+    copying). Filtered queries that find fewer than ``n_results`` matches
+    there fall back to the exact scan. Appended segments are scanned exactly
+    until the next rewrite.
+
+    Writes are serialized within a process; one process at a time should
+    write to a store.
+    """
+
+    space = "cosine"
+
+    def __init__(
+        self,
+        path: str,
+        ivf_min_rows: int = 100_000,
+        nprobe: int = 8,
+        ivf_lists: int = 0,
+        compact_ratio: float = 0.25,
+        max_segments: int = 8,
+    ):
+        self.path = path
+        self.ivf_min_rows = ivf_min_rows
+        self.nprobe = nprobe
+        self.ivf_lists = ivf_lists
+        self.compact_ratio = compact_ratio
+        self.max_segments = max(1, max_segments)
+        self._lock = threading.Lock()
+        self._snapshot: Optional[_Snapshot] = None
+        self._stamp = None
+
+    def _manifest_stamp(self):
+        try:
+            st = os.stat(os.path.join(self.path, "manifest.json"))
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns
+
+    def _load(self, stamp):
+        """The snapshot for the manifest seen at ``stamp``, with the stamp it was actually read at."""
+        for attempt in range(3):
+            if stamp is None:
+                return None, None
+            try:
+                return _Snapshot(self.path, self._snapshot), stamp
+            except FileNotFoundError:
+                # Another process compacted the store between our reading the manifest and a segment.
+                if attempt == 2:
+                    raise
+                stamp = self._manifest_stamp()
+
+    def _view(self) -> Optional[_Snapshot]:
+        stamp = self._manifest_stamp()
+        if stamp != self._stamp:
+            with self._lock:
+                if stamp != self._stamp:
+                    self._snapshot, self._stamp = self._load(stamp)
+        return self._snapshot
+
+    # --- Filtering ---
+
+    def _mask(self, seg: _Segment, where: dict, rows: slice = slice(None)) -> np.ndarray:
+        """Boolean mask of the records in ``rows`` (all by default) matching ``where``."""
+        n = len(range(seg.count)[rows])
+        mask = np.ones(n, dtype=bool)
+        for key, condition in where.items():
+            if key == "$and":
+                for c in condition:
+                    mask &= self._mask(seg, c, rows)
+            elif key == "$or":
+                any_mask = np.zeros(n, dtype=bool)
+                for c in condition:
+                    any_mask |= self._mask(seg, c, rows)
+                mask &= any_mask
+            else:
+                ops = condition.items() if isinstance(condition, dict) else [("$eq", condition)]
+                for op, operand in ops:
+                    mask &= self._compare(seg, key, op, operand, rows, n)
+        return mask
+
+    def _compare(self, seg: _Segment, field: str, op: str, operand, rows: slice, n: int) -> np.ndarray:
+        negated = op in ("$ne", "$nin")
+        if field not in seg.columns:
+            return np.full(n, negated)
+        kind = seg.fields[field]
+        values, present = seg.columns[field]
+        values, present = values[rows], present[rows]
+        operands = list(operand) if op in ("$in", "$nin") else [operand]
+        if kind == "str":
+            if not all(isinstance(o, str) for o in operands):
+                return np.full(n, negated)
+        elif not all(isinstance(o, (int, float)) for o in operands):
+            return np.full(n, negated)
+        if op in ("$in", "$nin"):
+            # Let numpy size the operand array itself: casting to the column's fixed-width
+            # string dtype would truncate longer operands into false matches.
+            hit = np.isin(values, np.asarray(operands))
+        elif op in ("$eq", "$ne"):
+            hit = values == operand
+        else:
+            hit = _COLUMN_OPERATORS[op](values, operand)
+        hit = hit & present
+        return ~hit if negated else hit
+
+    def _filter(self, seg: _Segment, live: Optional[np.ndarray], where: Optional[dict], rows: slice = slice(None)):
+        """Mask of the current records in ``rows`` of ``seg`` matching ``where``; None if that is all of them."""
+        mask = self._mask(seg, where, rows) if where else None
+        if live is not None:
+            mask = live[rows] if mask is None else mask & live[rows]
+        return mask
+
+    # --- Reads ---
+
+    def _top_k(self, vectors: np.ndarray, q: np.ndarray, k: int, mask: Optional[np.ndarray], rows: Optional[np.ndarray]):
+        scores = vectors @ q
+        if mask is not None:
+            scores = np.where(mask, scores, -np.inf)
+        k = min(k, int(np.count_nonzero(np.isfinite(scores))))
+        if k <= 0:
+            return np.zeros(0, np.int64), np.zeros(0, np.float32)
+        top = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return (rows[top] if rows is not None else top), scores[top]
+
+    def _search(self, seg: _Segment, live: Optional[np.ndarray], q: np.ndarray, n_results: int, where: Optional[dict]):
+        """Rows and scores of the best ``n_results`` current records of one segment."""
+        if seg.ivf_centroids is not None:
+            probe = np.argsort(seg.ivf_centroids @ q)[::-1][:self.nprobe]
+            parts = []
+            for c in np.sort(probe):
+                lo, hi = int(seg.ivf_offsets[c]), int(seg.ivf_offsets[c + 1])
+                if hi > lo:
+                    part_mask = self._filter(seg, live, where, slice(lo, hi))
+                    parts.append(self._top_k(seg.vectors[lo:hi], q, n_results, part_mask, np.arange(lo, hi)))
+            if parts:
+                rows = np.concatenate([p[0] for p in parts])
+                scores = np.concatenate([p[1] for p in parts])
+                if len(rows) >= n_results or (not where and live is None):
+                    order = np.argsort(-scores, kind="stable")[:n_results]
+                    return rows[order], scores[order]
+        return self._top_k(seg.vectors, q, n_results, self._filter(seg, live, where), None)
+
+    def query(self, embedding, n_results, where=None):
+        snap = self._view()
+        if snap is None or snap.count == 0:
+            return {'ids': [[]], 'documents': [[]], 'metadatas': [[]], 'distances': [[]]}
+        q = _normalize(embedding)
+        hits = []
+        for i, (seg, live) in enumerate(zip(snap.segments, snap.live)):
+            if seg.count:
+                rows, scores = self._search(seg, live, q, n_results, where)
+                hits.extend((float(score), i, int(row)) for row, score in zip(rows, scores))
+        hits.sort(key=lambda hit: -hit[0])
+        hits = hits[:n_results]
+        return {
+            'ids': [[str(snap.segments[i].ids[r]) for _, i, r in hits]],
+            'documents': [[snap.segments[i].document(r) for _, i, r in hits]],
+            'metadatas': [[snap.segments[i].metadata(r) for _, i, r in hits]],
+            'distances': [[1.0 - score for score, _, _ in hits]],
+        }
+
+    def get(self, ids=None, where=None, limit=None, offset=0, include=DEFAULT_INCLUDE):
+        snap = self._view()
+        result: Dict[str, Any] = {'ids': []}
+        if snap is None or snap.count == 0:
+            for key in include:
+                result[key] = []
+            return result
+        if ids is not None:
+            hits = [hit for hit in (snap.locate(str(i)) for i in ids) if hit is not None]
+            if where:
+                masks: Dict[int, np.ndarray] = {}
+                for i, _ in hits:
+                    if i not in masks:
+                        masks[i] = self._mask(snap.segments[i], where)
+                hits = [(i, r) for i, r in hits if masks[i][r]]
+            segs = np.asarray([i for i, _ in hits], dtype=np.int64)
+            rows = np.asarray([r for _, r in hits], dtype=np.int64)
+        else:
+            pieces = []
+            for i, (seg, live) in enumerate(zip(snap.segments, snap.live)):
+                mask = self._filter(seg, live, where)
+                pieces.append(np.arange(seg.count) if mask is None else np.flatnonzero(mask))
+            segs = np.concatenate([np.full(len(p), i, dtype=np.int64) for i, p in enumerate(pieces)])
+            rows = np.concatenate(pieces)
+        window = slice(offset, offset + limit) if limit is not None else slice(offset, None)
+        hits = list(zip(segs[window].tolist(), rows[window].tolist()))
+        result['ids'] = [str(snap.segments[i].ids[r]) for i, r in hits]
+        if "documents" in include:
+            result['documents'] = [snap.segments[i].document(r) for i, r in hits]
+        if "metadatas" in include:
+            result['metadatas'] = [snap.segments[i].metadata(r) for i, r in hits]
+        if "embeddings" in include:
+            result['embeddings'] = np.asarray(
+                [snap.segments[i].vectors[r] for i, r in hits], dtype=np.float32
+            ).reshape(len(hits), int(snap.manifest["dim"]))
+        return result
+
+    def count(self):
+        snap = self._view()
+        return snap.count if snap else 0
+
+    # --- Writes ---
+
+    def add(self, ids, embeddings, documents, metadatas):
+        if not len(ids):
+            return
+        with self._lock:
+            stamp = self._manifest_stamp()
+            snap = self._snapshot if stamp == self._stamp else self._load(stamp)[0]
+            # The last copy of an id in one call wins, as with consecutive upserts.
+            keep = sorted({str(id_): i for i, id_ in enumerate(ids)}.values())
+            vectors = _normalize(embeddings)
+            new = (
+                [str(ids[i]) for i in keep],
+                vectors[keep],
+                [documents[i] or "" for i in keep],
+                [dict(metadatas[i] or {}) for i in keep],
+            )
+
+            replaced: Dict[int, List[int]] = {}
+            for id_ in (new[0] if snap is not None else ()):
+                hit = snap.locate(id_)
+                if hit is not None:
+                    replaced.setdefault(hit[0], []).append(hit[1])
+            dead = {i: np.asarray(sorted(rows), dtype=np.int64) for i, rows in replaced.items()}
+            total = (snap.count if snap else 0) + len(keep) - sum(len(rows) for rows in dead.values())
+
+            entries = [] if snap is None or snap.legacy else list(snap.manifest["segments"])
+            appended = sum(e["count"] for e in entries[1:]) + len(keep)
+            wants_ivf = self.ivf_min_rows > 0 and total >= self.ivf_min_rows
+            if not entries or appended > self.compact_ratio * snap.live_count(0) or (wants_ivf and not entries[0].get("ivf")):
+                segments = range(len(snap.segments)) if snap is not None else range(0)
+                entries = [self._write_segment(self._gather(snap, segments, dead, new), {}, wants_ivf)]
+            elif len(entries) > self.max_segments:
+                # Merge everything after the first segment; only the tombstones on the first one are still needed.
+                base = entries[0]["name"]
+                later = range(1, len(entries))
+                tombstones = [snap.segments[i].replaces[base] for i in later if base in snap.segments[i].replaces]
+                if 0 in dead:
+                    tombstones.append(dead[0])
+                replaces = {base: np.unique(np.concatenate(tombstones))} if tombstones else {}
+                entries = [entries[0], self._write_segment(self._gather(snap, later, dead, new), replaces, False)]
+            else:
+                replaces = {snap.segments[i].name: rows for i, rows in dead.items()}
+                entries.append(self._write_segment(new, replaces, False))
+            self._commit(entries, int(vectors.shape[-1]), snap)
+
+    def _gather(self, snap: Optional[_Snapshot], segments, dead: Dict[int, np.ndarray], new: tuple):
+        """The current records of ``segments`` except the ``dead`` rows, followed by ``new``."""
+        ids, vectors, documents, metadatas = [], [], [], []
+        for i in segments:
+            seg = snap.segments[i]
+            live = np.ones(seg.count, dtype=bool) if snap.live[i] is None else snap.live[i].copy()
+            if i in dead:
+                live[dead[i]] = False
+            rows = np.flatnonzero(live)
+            ids.extend(str(id_) for id_ in seg.ids[rows])
+            vectors.append(np.asarray(seg.vectors[rows]))
+            documents.extend(seg.document(r) for r in rows)
+            metadatas.extend(seg.metadata(r) for r in rows)
+        vectors.append(new[1])
+        return ids + new[0], np.concatenate(vectors), documents + new[2], metadatas + new[3]
+
+    def _write_segment(self, records: tuple, replaces: Dict[str, np.ndarray], use_ivf: bool) -> dict:
+        """Writes one segment and returns its manifest entry."""
+        ids, vectors, documents, metadatas = records
+        n = len(ids)
+        order = np.arange(n)
+        ivf = None
+        if use_ivf:
+            nlist = self.ivf_lists or max(1, int(np.sqrt(n)))
+            centroids = _kmeans(vectors, nlist)
+            assign = _assign(vectors, centroids)
+            order = np.argsort(assign, kind="stable")
+            offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=nlist))]).astype(np.int64)
+            ivf = (centroids, offsets)
+
+        name = f"seg-{uuid.uuid4().hex[:16]}"
+        tmp = os.path.join(self.path, f"{name}.tmp-{os.getpid()}")
+        os.makedirs(tmp)
+        np.save(os.path.join(tmp, "vectors.npy"), vectors[order])
+        np.save(os.path.join(tmp, "ids.npy"), np.asarray([ids[r] for r in order], dtype=str))
+        blobs = [documents[r].encode("utf-8") for r in order]
+        with open(os.path.join(tmp, "documents.bin"), "wb") as f:
+            f.write(b"".join(blobs))
+        np.save(os.path.join(tmp, "doc_offsets.npy"), np.concatenate([[0], np.cumsum([len(b) for b in blobs])]).astype(np.int64))
+
+        names = list(dict.fromkeys(k for md in metadatas for k in md))
+        fields = {}
+        for i, field in enumerate(names):
+            present = np.asarray([field in metadatas[r] for r in order], dtype=bool)
+            kind = _field_kind([md[field] for md in metadatas if field in md])
+            if kind == "str":
+                values = np.asarray([str(metadatas[r].get(field, "")) for r in order], dtype=str)
+            else:
+                values = np.asarray([float(metadatas[r].get(field, np.nan)) for r in order], dtype=np.float64)
+            np.save(os.path.join(tmp, f"meta_{i}.npy"), values)
+            np.save(os.path.join(tmp, f"meta_{i}_present.npy"), present)
+            fields[field] = kind
+        if ivf is not None:
+            np.save(os.path.join(tmp, "ivf_centroids.npy"), ivf[0])
+            np.save(os.path.join(tmp, "ivf_offsets.npy"), ivf[1])
+        for target, rows in replaces.items():
+            np.save(os.path.join(tmp, f"replaces_{target}.npy"), rows)
+        os.rename(tmp, os.path.join(self.path, name))
+        logger.info(f"Local vector store segment written: {n} record(s), ivf={ivf is not None} ({self.path}/{name})")
+        return {"name": name, "count": n, "fields": fields, "ivf": ivf is not None, "replaces": sorted(replaces)}
+
+    def _commit(self, entries: List[dict], dim: int, previous: Optional[_Snapshot]):
+        """Swaps in a manifest listing ``entries`` and removes the segments it no longer lists."""
+        manifest_path = os.path.join(self.path, "manifest.json")
+        tmp = f"{manifest_path}.tmp-{os.getpid()}"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": 2, "dim": dim, "segments": entries}, f)
+        os.replace(tmp, manifest_path)
+        # Open memmaps of removed files stay valid (POSIX).
+        listed = {e["name"] for e in entries}
+        for name in os.listdir(self.path):
+            full = os.path.join(self.path, name)
+            if name in listed or name.startswith("manifest.json") or ".tmp-" in name:
+                continue
+            if os.path.isdir(full):
+                shutil.rmtree(full, ignore_errors=True)
+            else:
+                # The files of a version 1 store, now copied into a segment.
+                os.remove(full)
+        self._snapshot, self._stamp = _Snapshot(self.path, previous), self._manifest_stamp()
+
+
+def copy_store(source: VectorStore, target: VectorStore, batch_size: int = 5000):
+    """Copies every record of ``source`` into ``target`` (e.g. Chroma -> local)."""
+    ids, embeddings, documents, metadatas = [], [], [], []
+    offset = 0
+    while True:
+        page = source.get(limit=batch_size, offset=offset, include=["documents", "metadatas", "embeddings"])
+        if not page['ids']:
+            break
+        ids.extend(page['ids'])
+        embeddings.extend(page['embeddings'])
+        documents.extend(page['documents'])
+        metadatas.extend(page['metadatas'])
+        offset += len(page['ids'])
+    if ids:
+        target.add(ids, np.asarray(embeddings, dtype=np.float32), documents, metadatas)
+    return len(ids)
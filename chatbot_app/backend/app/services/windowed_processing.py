@@ -0,0 +1,231 @@
+import time
+import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Rough token estimate for German ASR text; good enough to keep windows well
+# below the model's output limit without pulling in a tokenizer.
+CHARS_PER_TOKEN = 4
+# Per-segment overhead of the "[start -> end]" prefix on input and the JSON
+# object wrapping each segment on output.
+SEGMENT_OVERHEAD_TOKENS = 24
+
+# Only the last quarter of a window is searched for a long pause to cut on.
+CUT_SEARCH_FRACTION = 0.25
+
+
+def segment_tokens(segment: dict) -> int:
+    """Estimated tokens one segment costs in a post-processing request."""
+    return len(segment.get("text") or "") // CHARS_PER_TOKEN + SEGMENT_OVERHEAD_TOKENS
+
+
+def estimate_tokens(segments: List[dict]) -> int:
+    return sum(segment_tokens(s) for s in segments)
+
+
+def should_window(segments: List[dict], mode: str, max_tokens: int) -> bool:
+    """Applies a ``POST_PROCESS_WINDOWING`` mode ("auto", "always" or "off") to a transcript."""
+    if mode == "off":
+        return False
+    if mode == "always":
+        return True
+    return estimate_tokens(segments) > max_tokens
+
+
+def format_segments(segments: List[dict]) -> str:
+    """The "[start -> end] text" line format the post-processing prompts expect."""
+    return "".join(f"[{s['start']:.2f} -> {s['end']:.2f}] {s['text']}\n" for s in segments)
+
+
+def plan_windows(segments: List[dict], max_tokens: int, overlap_segments: int = 4) -> List[Dict[str, int]]:
+    """
+    Splits ``segments`` into windows of at most ``max_tokens`` estimated tokens.
+
+    Windows are index ranges ``[start, end)`` into ``segments``. Every window
+    after the first also includes the ``overlap_segments`` segments before its
+    own range as context; ``own_start``/``own_end`` mark the segments the window
+    is authoritative for when merging. Cuts are moved to the longest pause in
+    the last part of the window, where a speaker change is most likely.
+    """
+    n = len(segments)
+    costs = [segment_tokens(s) for s in segments]
+    plan: List[Dict[str, int]] = []
+    own_start = 0
+    while own_start < n:
+        start = max(0, own_start - overlap_segments) if plan else 0
+        total = sum(costs[start:own_start])
+        end = own_start
+        while end < n and (end == own_start or total + costs[end] <= max_tokens):
+            total += costs[end]
+            end += 1
+        if end < n:
+            lo = own_start + max(1, int((end - own_start) * (1 - CUT_SEARCH_FRACTION)))
+            candidates = range(lo, end + 1)
+            if len(candidates) > 1:
+                end = max(candidates, key=lambda i: (segments[i]["start"] - segments[i - 1]["end"], i))
+        plan.append({"index": len(plan), "start": start, "end": end, "own_start": own_start, "own_end": end})
+        own_start = end
+    return plan
+
+
+def _align(window_segments: List[dict], output: List[dict]) -> List[List[dict]]:
+    """
+    Maps each output segment back to the input segment it came from.
+
+    The prompts ask for one output segment per input segment, so equal lengths
+    align by position. Otherwise outputs carrying a ``start`` are matched to the
+    nearest input start, and outputs without timestamps (e.g. free-form lines)
+    are spread proportionally over the window.
+    """
+    m, n = len(window_segments), len(output)
+    aligned: List[List[dict]] = [[] for _ in range(m)]
+    if m == 0 or n == 0:
+        return aligned
+    if m == n:
+        for k, seg in enumerate(output):
+            aligned[k].append(seg)
+        return aligned
+    if all(isinstance(seg.get("start"), (int, float)) for seg in output):
+        starts = [s["start"] for s in window_segments]
+        for seg in output:
+            k = min(range(m), key=lambda i: abs(starts[i] - seg["start"]))
+            aligned[k].append(seg)
+        return aligned
+    for i, seg in enumerate(output):
+        aligned[min(m - 1, i * m // n)].append(seg)
+    return aligned
+
+
+def speaker_mapping(pairs: List[Tuple[str, str]]) -> Dict[str, str]:
+    """
+    Builds a relabelling from ``(window_label, merged_label)`` pairs observed on
+    the overlap. Labels are matched greedily by co-occurrence count so two window
+    labels never collapse onto the same merged label. A relabelling ``a -> b``
+    seen without evidence for ``b`` is completed as a swap (``b -> a``), since
+    the overlap often only contains one of the two speakers.
+    """
+    mapping: Dict[str, str] = {}
+    used = set()
+    for (new, old), _ in Counter(pairs).most_common():
+        if new in mapping or old in used:
+            continue
+        mapping[new] = old
+        used.add(old)
+    for new, old in list(mapping.items()):
+        if new != old and old not in mapping and new not in used:
+            mapping[old] = new
+            used.add(new)
+    return mapping
+
+
+def merge_windows(
+    segments: List[dict],
+    plan: List[Dict[str, int]],
+    window_outputs: List[List[dict]],
+    reconcile: bool = True,
+) -> List[dict]:
+    """
+    Stitches per-window outputs into one list on the original timeline.
+
+    Each window contributes only its own range. Before that, its speaker labels
+    are reconciled with the already merged result by comparing both on the
+    overlap segments, so a window that swapped e.g. ``[GATEKEEPER]`` and
+    ``[DECISION_MAKER]`` is relabelled consistently. Input segments the model
+    dropped are kept with their raw text and the preceding speaker.
+    """
+    merged: List[dict] = []
+    labels: Dict[int, str] = {}
+    for window, output in zip(plan, window_outputs):
+        aligned = _align(segments[window["start"]:window["end"]], output or [])
+        mapping: Dict[str, str] = {}
+        if reconcile:
+            pairs = []
+            for k in range(window["own_start"] - window["start"]):
+                index = window["start"] + k
+                if aligned[k] and aligned[k][0].get("speaker") and index in labels:
+                    pairs.append((aligned[k][0]["speaker"], labels[index]))
+            mapping = speaker_mapping(pairs)
+        for k in range(window["own_start"] - window["start"], window["end"] - window["start"]):
+            index = window["start"] + k
+            source = segments[index]
+            if not aligned[k]:
+                speaker = merged[-1]["speaker"] if merged else ""
+                merged.append({"start": source["start"], "end": source["end"], "speaker": speaker, "text": source["text"]})
+                labels[index] = speaker
+                continue
+            for seg in aligned[k]:
+                speaker = seg.get("speaker") or ""
+                speaker = mapping.get(speaker, speaker)
+                merged.append({
+                    "start": source["start"],
+                    "end": source["end"],
+                    "speaker": speaker,
+                    "text": seg.get("text", source["text"]),
+                })
+            labels[index] = merged[-1]["speaker"]
+    return merged
+
+
+def process_windowed(
+    segments: List[dict],
+    process_window: Callable[[int, List[dict]], List[dict]],
+    max_tokens: int,
+    overlap_segments: int = 4,
+    max_workers: int = 4,
+    max_attempts: int = 3,
+    on_window_done: Optional[Callable[[int, int], None]] = None,
+    on_prefix_ready: Optional[Callable[[List[dict], int], None]] = None,
+) -> List[dict]:
+    """
+    Runs ``process_window(index, window_segments)`` over token-bounded windows
+    with at most ``max_workers`` requests in flight and returns the merged,
+    speaker-reconciled segments.
+
+    Each window is retried up to ``max_attempts`` times, so a malformed or
+    failed response costs one window instead of the whole transcript.
+    ``on_window_done(done_count, total)`` is called after every window.
+    ``on_prefix_ready(merged, covered)`` is called whenever the contiguous run
+    of finished windows from the start grows, with their merged segments and
+    the number of input segments those replace.
+    """
+    plan = plan_windows(segments, max_tokens=max_tokens, overlap_segments=overlap_segments)
+    logger.info(
+        f"[windowed_processing] {len(segments)} segment(s) (~{estimate_tokens(segments)} tokens) split into "
+        f"{len(plan)} window(s), workers={max_workers}"
+    )
+
+    def _run(index: int) -> List[dict]:
+        window = plan[index]
+        for attempt in range(1, max_attempts + 1):
+            try:
+                return process_window(index, segments[window["start"]:window["end"]])
+            except Exception as e:
+                if attempt == max_attempts:
+                    raise
+                logger.warning(f"[windowed_processing] Window {index} failed (attempt {attempt}/{max_attempts}): {e}")
+                time.sleep(2 ** (attempt - 1))
+        return []
+
+    results: List[List[dict]] = [[] for _ in plan]
+    finished = [False] * len(plan)
+    ready = 0
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        futures = {pool.submit(_run, i): i for i in range(len(plan))}
+        done = 0
+        for future in as_completed(futures):
+            index = futures[future]
+            results[index] = future.result()
+            finished[index] = True
+            done += 1
+            if on_window_done:
+                on_window_done(done, len(plan))
+            if on_prefix_ready and ready < len(plan) and finished[ready]:
+                while ready < len(plan) and finished[ready]:
+                    ready += 1
+                if ready < len(plan):
+                    on_prefix_ready(merge_windows(segments, plan[:ready], results[:ready]), plan[ready - 1]["own_end"])
+
+    return merge_windows(segments, plan, results)
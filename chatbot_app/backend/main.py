@@ -6,7 +6,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 from app.api import router as api_router
-from app.services import vector_db
+from app.services import vector_db, task_manager
 from app.database import create_db_and_tables
 
 # --- Load Environment Variables ---
@@ -29,10 +29,12 @@ async def lifespan(app: FastAPI):
     logger.info("Initializing database and tables...")
     await create_db_and_tables()
     logger.info("✅ Database and tables are ready.")
+
+    await task_manager.start()
     
-    logger.info("Initializing vector database collection...")
-    vector_db.get_or_create_collection()
-    logger.info("✅ Vector database collection is ready.")
+    logger.info("Initializing vector store...")
+    count = vector_db.get_store().count()
+    logger.info(f"✅ Vector store is ready ({count} journeys).")
     
     logger.info("=" * 80)
     logger.info("✅ [STARTUP] Application startup complete - ready to accept requests!")
@@ -40,6 +42,7 @@ async def lifespan(app: FastAPI):
     yield
     # --- Shutdown ---
     logger.info("Application shutdown...")
+    await task_manager.stop()
 
 # Create FastAPI app instance
 app = FastAPI(
@@ -76,7 +79,8 @@ app.add_middleware(
     allow_origin_regex=allow_origin_regex,
     allow_credentials=True,
     allow_methods=["*"],
-    allow_headers=["*"]
+    allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # --- Include API Router ---
@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+BENCH_SOURCE = "bench-admission"
+
+
+class RateLimited(Exception):
+    pass
+
+
+class StubProvider:
+    """
+    A remote API that serves ``capacity`` requests at full speed, slows all of
+    them down proportionally beyond that, and rejects requests (HTTP 429)
+    while ``rate_limit`` are already in flight.
+    """
+
+    def __init__(self, name: str, base_seconds: float, capacity: int, rate_limit: int, rng: random.Random):
+        self.name, self.base, self.capacity, self.rate_limit = name, base_seconds, capacity, rate_limit
+        self.rng = rng
+        self.inflight = 0
+        self.peak = 0
+        self.rejected = 0
+        self.lock = threading.Lock()
+
+    def call(self):
+        with self.lock:
+            if self.inflight >= self.rate_limit:
+                self.rejected += 1
+                limited = True
+            else:
+                limited = False
+                self.inflight += 1
+                self.peak = max(self.peak, self.inflight)
+                load = self.inflight
+                duration = self.base * self.rng.uniform(0.7, 1.3)
+        if limited:
+            time.sleep(0.05)
+            raise RateLimited(self.name)
+        try:
+            # Processor sharing, re-evaluated as other requests come and go.
+            remaining = duration
+            while remaining > 0:
+                step = min(0.05, remaining * max(1.0, load / self.capacity))
+                time.sleep(step)
+                remaining -= step / max(1.0, load / self.capacity)
+                with self.lock:
+                    load = self.inflight
+        finally:
+            with self.lock:
+                self.inflight -= 1
+
+    def call_with_retries(self, max_retries: int = 2):
+        # Same policy as the OpenAI SDK default: two retries with exponential backoff and jitter.
+        for attempt in range(max_retries + 1):
+            try:
+                return self.call()
+            except RateLimited:
+                if attempt == max_retries:
+                    raise
+                time.sleep(min(8.0, 0.5 * 2 ** attempt) * self.rng.uniform(0.75, 1.0))
+
+
+class StubStorage:
+    def __init__(self, provider: StubProvider):
+        self.provider = provider
+
+    async def is_available_async(self, ttl_seconds: int = 60) -> bool:
+        return True
+
+    async def upload_file_async(self, file_path: str, object_name: str, content_type=None) -> bool:
+        await asyncio.to_thread(self.provider.call_with_retries)
+        return True
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))] if ordered else float("nan")
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(
+        description="Burst of /transcribe pipelines against stubbed upload, Whisper and LLM providers, "
+        "with and without per-stage admission control. Needs a scratch Postgres database (BENCH_DATABASE_URL)."
+    )
+    ap.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"), required=not os.getenv("BENCH_DATABASE_URL"))
+    ap.add_argument("--tasks", type=int, default=40)
+    ap.add_argument("--limit", type=int, default=4, help="Per-stage concurrency in the admitted run")
+    ap.add_argument("--provider-capacity", type=int, default=4, help="Requests a provider serves at full speed")
+    ap.add_argument("--provider-rate-limit", type=int, default=8, help="In-flight requests beyond which a provider answers 429")
+    ap.add_argument("--transcribe-seconds", type=float, default=3.0)
+    ap.add_argument("--post-process-seconds", type=float, default=2.0)
+    ap.add_argument("--upload-seconds", type=float, default=0.4)
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+
+    os.environ.setdefault("OPENAI_API_KEY", "unused-by-benchmark")
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ["TRANSCRIPTION_CHUNKING"] = "off"
+    sys.path.append(str(BACKEND_ROOT))
+    # Failed tasks are counted below; their tracebacks would drown the report.
+    logging.disable(logging.CRITICAL)
+    from sqlalchemy import delete
+    from app import database  # type: ignore
+    from app.routers import transcription_router  # type: ignore
+    from app.services import admission, task_manager, transcription  # type: ignore
+
+    async def run_mode(mode: str, limit: int):
+        rng = random.Random(args.seed)
+        # Object storage shares bandwidth but does not reject requests.
+        upload = StubProvider("upload", args.upload_seconds, args.provider_capacity * 2, args.tasks + 1, rng)
+        whisper = StubProvider("whisper", args.transcribe_seconds, args.provider_capacity, args.provider_rate_limit, rng)
+        llm = StubProvider("llm", args.post_process_seconds, args.provider_capacity, args.provider_rate_limit, rng)
+
+        def fake_transcribe(audio_path: str, task_id: str, *args) -> List[Dict]:
+            whisper.call_with_retries()
+            return [{"start": 0.0, "end": 5.0, "text": f"Bench call {task_id[:8]}."}]
+
+        def fake_post_process(segments: List[Dict], task_id: str, *args):
+            llm.call_with_retries()
+            return "[AGENT]: " + segments[0]["text"], [dict(segments[0], speaker="[AGENT]")]
+
+        transcription.get_storage_service = lambda: StubStorage(upload)
+        transcription.transcribe_audio = fake_transcribe
+        transcription.post_process_transcription_with_timestamps = fake_post_process
+        admission.configure({stage: limit for stage in admission.STAGES})
+
+        task_ids = []
+        for _ in range(args.tasks):
+            temp_dir = tempfile.mkdtemp(prefix="bench_admission_")
+            path = os.path.join(temp_dir, "call.wav")
+            with open(path, "wb") as f:
+                f.write(os.urandom(1024))
+            task_ids.append((task_manager.create_task(kind="transcription"), path))
+
+        finished: Dict[str, float] = {}
+        seen: Dict[str, tuple] = {}
+        estimate_errors: List[float] = []
+        sample: Dict = {}
+
+        async def one(task_id: str, path: str):
+            await transcription_router.run_pipeline_task(path, BENCH_SOURCE, task_id)
+            finished[task_id] = time.perf_counter()
+
+        async def monitor():
+            # Compares the wait estimate given when a task is first seen queued with the wait it got.
+            while len(finished) < len(task_ids):
+                now = time.perf_counter()
+                for task_id, _ in task_ids:
+                    queued = admission.queue_status(task_id)
+                    key = (task_id, queued["stage"]) if queued else None
+                    if queued and key not in seen:
+                        seen[key] = (now, queued["estimated_wait_seconds"])
+                        if not sample and queued["estimated_wait_seconds"] is not None:
+                            sample.update(await transcription_router.get_task_status(task_id))
+                    for (tid, stage), (t_seen, estimate) in list(seen.items()):
+                        if tid == task_id and (not queued or queued["stage"] != stage) and estimate is not None:
+                            estimate_errors.append(abs((now - t_seen) - estimate))
+                            seen[(tid, stage)] = (t_seen, None)
+                await asyncio.sleep(0.05)
+
+        t0 = time.perf_counter()
+        watcher = asyncio.create_task(monitor())
+        await asyncio.gather(*(one(task_id, path) for task_id, path in task_ids))
+        await watcher
+        latencies = sorted(finished[task_id] - t0 for task_id, _ in task_ids)
+        statuses = [task_manager.get_task_status(task_id)["status"] for task_id, _ in task_ids]
+        failed = sum(1 for s in statuses if s != "SUCCESS")
+        print(
+            f"[bench] {mode:<10} ok={len(statuses) - failed:3d} failed={failed:3d} "
+            f"first={latencies[0]:5.1f}s p50={_percentile(latencies, 0.5):5.1f}s p95={_percentile(latencies, 0.95):5.1f}s "
+            f"max={latencies[-1]:5.1f}s | 429s upload={upload.rejected} whisper={whisper.rejected} llm={llm.rejected} "
+            f"peak in-flight whisper={whisper.peak} llm={llm.peak}",
+            flush=True,
+        )
+        reasons = Counter(task_manager.get_task_status(task_id)["message"][:90] for task_id, _ in task_ids if task_manager.get_task_status(task_id)["status"] != "SUCCESS")
+        for reason, count in reasons.most_common(3):
+            print(f"[bench] {mode:<10}   {count} x {reason}", flush=True)
+        if estimate_errors:
+            print(
+                f"[bench] {mode:<10} queue wait estimate error: median={statistics.median(estimate_errors):.1f}s "
+                f"p95={_percentile(estimate_errors, 0.95):.1f}s over {len(estimate_errors)} waits",
+                flush=True,
+            )
+        if sample:
+            print(f"[bench] {mode:<10} /tasks/{{id}} while queued: " + ", ".join(f"{k}={sample.get(k)!r}" for k in ("status", "message", "queue_stage", "queue_position", "estimated_wait_seconds")), flush=True)
+        for task_id, _ in task_ids:
+            task_manager.remove_task(task_id)
+
+    async def run():
+        # A large default pool, as on a many-core host, so the unlimited run really is unlimited.
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=max(64, args.tasks * 2)))
+        async with database.async_engine.begin() as conn:
+            await conn.run_sync(database.Base.metadata.create_all)
+        await run_mode("unlimited", 0)
+        await run_mode(f"limit={args.limit}", args.limit)
+        print(f"[bench] admission stats={admission.get_stats()}", flush=True)
+        async with database.AsyncSessionLocal() as db:
+            await db.execute(delete(database.Transcription).where(database.Transcription.audio_source == BENCH_SOURCE))
+            await db.commit()
+        await database.async_engine.dispose()
+
+    asyncio.run(run())
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
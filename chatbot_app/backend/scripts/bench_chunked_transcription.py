@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import sys
+import tempfile
+import threading
+import time
+from email.parser import BytesParser
+from email.policy import default as default_policy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import List
+
+
+def _make_synthetic_recording(path: Path, minutes: float) -> None:
+    """Writes tone bursts separated by short pauses, roughly shaped like speech turns."""
+    from pydub import AudioSegment
+    from pydub.generators import Sine
+
+    total_ms = int(minutes * 60_000)
+    audio = AudioSegment.silent(duration=0, frame_rate=16000)
+    freq = 220
+    while len(audio) < total_ms:
+        audio += Sine(freq).to_audio_segment(duration=4000, volume=-12).set_frame_rate(16000)
+        audio += AudioSegment.silent(duration=800, frame_rate=16000)
+        freq = 220 if freq > 600 else freq + 40
+    audio[:total_ms].set_channels(1).export(str(path), format="mp3", bitrate="64k")
+
+
+def _make_fake_handler(realtime_factor: float, segment_seconds: float):
+    from pydub import AudioSegment
+
+    class FakeTranscriptionHandler(BaseHTTPRequestHandler):
+        """Mimics POST /v1/audio/transcriptions with response_format=verbose_json."""
+
+        def log_message(self, format, *args):  # noqa: A002 - silence default access log
+            return
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length)
+            header = f"Content-Type: {self.headers.get('Content-Type')}\r\n\r\n".encode()
+            message = BytesParser(policy=default_policy).parsebytes(header + body)
+            audio_bytes = b""
+            for part in message.iter_parts():
+                if part.get_param("name", header="content-disposition") == "file":
+                    audio_bytes = part.get_payload(decode=True) or b""
+            duration = len(AudioSegment.from_file(io.BytesIO(audio_bytes))) / 1000.0 if audio_bytes else 0.0
+
+            # Latency proportional to audio length, like the real API.
+            time.sleep(duration * realtime_factor)
+
+            segments = []
+            t = 0.0
+            while t < duration:
+                end = min(duration, t + segment_seconds)
+                segments.append({
+                    "id": len(segments), "seek": 0, "start": t, "end": end,
+                    "text": f" segment {len(segments)}", "tokens": [], "temperature": 0.0,
+                    "avg_logprob": 0.0, "compression_ratio": 1.0, "no_speech_prob": 0.0,
+                })
+                t = end
+            payload = json.dumps({
+                "task": "transcribe", "language": "german", "duration": duration,
+                "text": "".join(s["text"] for s in segments), "segments": segments,
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    return FakeTranscriptionHandler
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Benchmark chunked Whisper transcription against a local fake endpoint.")
+    ap.add_argument("--minutes", type=float, default=60.0, help="Length of the synthetic recording")
+    ap.add_argument("--chunk-seconds", type=int, default=300, help="Maximum chunk length")
+    ap.add_argument("--workers", default="1,2,4,8", help="Comma-separated worker counts to compare")
+    ap.add_argument("--realtime-factor", type=float, default=0.01, help="Fake API seconds per second of audio")
+    ap.add_argument("--segment-seconds", type=float, default=5.0, help="Length of fake segments")
+    args = ap.parse_args()
+
+    backend_root = Path(__file__).resolve().parents[1]
+    sys.path.append(str(backend_root))
+
+    from openai import OpenAI
+    from app.services import chunked_transcription  # type: ignore
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _make_fake_handler(args.realtime_factor, args.segment_seconds))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    client = OpenAI(api_key="fake", base_url=base_url, max_retries=0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        audio_path = Path(tmp) / "synthetic.mp3"
+        print(f"[bench] generating {args.minutes:.1f} min synthetic recording...", flush=True)
+        _make_synthetic_recording(audio_path, args.minutes)
+
+        t0 = time.perf_counter()
+        single = chunked_transcription.transcribe_file_segments(client, str(audio_path))
+        single_s = time.perf_counter() - t0
+        print(f"[bench] single request        wall={single_s:7.2f}s segments={len(single)}", flush=True)
+
+        for workers in [int(w) for w in args.workers.split(",") if w.strip()]:
+            t0 = time.perf_counter()
+            segments: List[dict] = chunked_transcription.transcribe_chunked(
+                str(audio_path),
+                transcribe_file=lambda p: chunked_transcription.transcribe_file_segments(client, p),
+                max_chunk_ms=args.chunk_seconds * 1000,
+                max_workers=workers,
+            )
+            elapsed = time.perf_counter() - t0
+            last_end = segments[-1]["end"] if segments else 0.0
+            monotonic = all(a["end"] <= b["start"] + 1e-6 for a, b in zip(segments, segments[1:]))
+            print(
+                f"[bench] chunked workers={workers:<3} wall={elapsed:7.2f}s segments={len(segments)} "
+                f"timeline_end={last_end:.1f}s monotonic={monotonic}",
+                flush=True,
+            )
+
+    server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
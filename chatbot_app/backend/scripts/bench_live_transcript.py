@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import wave
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+BENCH_SOURCE = "bench-live-transcript"
+RATE = 16000
+
+
+def write_recording(path: str, minutes: float):
+    """Mono 16 kHz WAV of 4 s tone bursts separated by 0.8 s pauses, written a minute at a time."""
+    t = np.arange(int(4.0 * RATE)) / RATE
+    pause = np.zeros(int(0.8 * RATE))
+    total = int(minutes * 60 * RATE)
+    written, freq = 0, 220
+    with wave.open(path, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(RATE)
+        while written < total:
+            block = np.concatenate([0.25 * np.sin(2 * np.pi * freq * t), pause])[: total - written]
+            w.writeframes((block * 32767).astype("<i2").tobytes())
+            written += len(block)
+            freq = 220 if freq > 600 else freq + 40
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(
+        description="Time to the first stored segment vs. time to the complete raw/processed transcript, by recording length, "
+        "with stubbed Whisper/LLM/storage. Needs a scratch Postgres database (BENCH_DATABASE_URL)."
+    )
+    ap.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"), required=not os.getenv("BENCH_DATABASE_URL"))
+    ap.add_argument("--minutes", type=float, nargs="+", default=[15.0, 30.0, 60.0, 90.0])
+    ap.add_argument("--realtime-factor", type=float, default=0.02, help="Stub Whisper seconds per second of audio")
+    ap.add_argument("--window-seconds", type=float, default=1.5, help="Stub LLM seconds per post-processing window")
+    ap.add_argument("--upload-mbps", type=float, default=80.0, help="Stub storage upload bandwidth")
+    ap.add_argument("--poll-seconds", type=float, default=1.0, help="How often the simulated reviewer fetches deltas")
+    args = ap.parse_args()
+
+    os.environ.setdefault("OPENAI_API_KEY", "unused-by-benchmark")
+    os.environ["DATABASE_URL"] = args.database_url
+    sys.path.append(str(BACKEND_ROOT))
+    logging.disable(logging.WARNING)
+    import httpx
+    from fastapi import FastAPI
+    from sqlalchemy import delete
+    from app import database  # type: ignore
+    from app.routers import transcription_router  # type: ignore
+    from app.services import chunked_transcription, live_transcript, task_manager, transcription  # type: ignore
+
+    def fake_whisper(client, audio_path: str, model: str = "whisper-1") -> List[Dict]:
+        # Chunks are 64 kbit/s MP3s; single requests get the WAV itself.
+        size = os.path.getsize(audio_path)
+        duration = size * 8 / 64000 if audio_path.endswith(".mp3") else size / (2 * RATE)
+        time.sleep(0.5 + duration * args.realtime_factor)
+        return [
+            {"start": round(s, 3), "end": round(min(duration, s + 4.8), 3), "text": f" Satz bei {s:.0f} Sekunden."}
+            for s in np.arange(0, duration, 4.8)
+        ]
+
+    def fake_llm(segments: List[Dict]) -> List[Dict]:
+        time.sleep(args.window_seconds)
+        return [{"speaker": "[AGENT]" if i % 2 else "[DECISION_MAKER]", "text": seg["text"].strip()} for i, seg in enumerate(segments)]
+
+    class StubStorage:
+        async def is_available_async(self, ttl_seconds: int = 60) -> bool:
+            return True
+
+        async def upload_file_async(self, file_path: str, object_name: str, content_type=None) -> bool:
+            await asyncio.sleep(os.path.getsize(file_path) * 8 / (args.upload_mbps * 1e6))
+            return True
+
+    chunked_transcription.transcribe_file_segments = fake_whisper
+    transcription._post_process_segments = fake_llm
+    transcription.get_storage_service = lambda: StubStorage()
+
+    app = FastAPI()
+    app.include_router(transcription_router.router)
+
+    async def run_one(client: httpx.AsyncClient, minutes: float, path: str):
+        task_id = task_manager.create_task(kind="transcription")
+        temp_dir = tempfile.mkdtemp(prefix="bench_live_")
+        temp_path = os.path.join(temp_dir, "call.wav")
+        os.link(path, temp_path)
+        t0 = time.perf_counter()
+        pipeline = asyncio.create_task(transcription_router.run_pipeline_task(temp_path, BENCH_SOURCE, task_id))
+
+        # A reviewer following the transcription through /delta.
+        live_id, revision, segments, fetched_bytes, polls = None, 0, [], 0, 0
+        first_seen = raw_done = None
+        while True:
+            status = task_manager.get_task_status(task_id) or {}
+            result = status.get("result") or {}
+            if raw_done is None and result.get("status") == "RAW_TRANSCRIPT_READY":
+                raw_done = time.perf_counter() - t0
+            if live_id is None:
+                live_id = result.get("live_transcription_id") or result.get("transcription_id")
+            if live_id is not None:
+                response = await client.get(f"/transcriptions/{live_id}/delta", params={"since_revision": revision})
+                polls += 1
+                fetched_bytes += len(response.content)
+                delta = response.json()
+                segments = segments[: delta["from_index"]] + delta["segments"]
+                revision = delta["revision"]
+                if segments and first_seen is None:
+                    first_seen = time.perf_counter() - t0
+                if delta["complete"] and pipeline.done():
+                    break
+            if pipeline.done() and status.get("status") == "ERROR":
+                raise RuntimeError(status.get("message"))
+            await asyncio.sleep(args.poll_seconds)
+        total = time.perf_counter() - t0
+        final = task_manager.get_task_status(task_id)["result"]
+        assert [s["text"] for s in segments] == [s["text"] for s in final["processed_segments"]], "delta replay diverged"
+        full = len(json.dumps(final["processed_segments"]).encode())
+        print(
+            f"[bench] {minutes:5.1f} min: first stored segment {final['time_to_first_segment_seconds']:5.1f}s "
+            f"(reviewer saw it at {first_seen:5.1f}s) | raw complete {raw_done:5.1f}s | processed complete {total:5.1f}s | "
+            f"{final['revision']} revisions, {polls} delta polls = {fetched_bytes / 1024:.0f} KiB "
+            f"(one full transcript = {full / 1024:.0f} KiB)",
+            flush=True,
+        )
+
+    async def run(paths: Dict[float, str]):
+        async with database.async_engine.begin() as conn:
+            await conn.run_sync(database.Base.metadata.create_all)
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None) as client:
+            for minutes, path in paths.items():
+                await run_one(client, minutes, path)
+        print(f"[bench] stats={json.dumps(live_transcript.get_stats())}", flush=True)
+        async with database.AsyncSessionLocal() as db:
+            await db.execute(delete(database.Transcription).where(database.Transcription.audio_source == BENCH_SOURCE))
+            await db.commit()
+        await database.async_engine.dispose()
+
+    workdir = tempfile.mkdtemp(prefix="bench_live_src_")
+    paths = {}
+    for minutes in args.minutes:
+        paths[minutes] = os.path.join(workdir, f"call_{minutes:g}min.wav")
+        write_recording(paths[minutes], minutes)
+    asyncio.run(run(paths))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
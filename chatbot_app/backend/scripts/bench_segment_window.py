@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+BENCH_SOURCE = "bench-segment-window"
+WORDS = (
+    "ja genau also wir haben das angebot für neue kunden geschickt und ich wollte fragen ob sie zeit für "
+    "einen termin haben der geschäftsführer ist gerade nicht im haus können sie später noch einmal anrufen"
+).split()
+
+
+def synthetic_transcript(rng: random.Random, hours: float) -> List[Dict]:
+    """Processed-style segments (2-12 s each) covering ``hours`` of audio."""
+    segments, t = [], 0.0
+    while t < hours * 3600:
+        duration = rng.uniform(2, 12)
+        text = " ".join(rng.choice(WORDS) for _ in range(int(duration * 2.5))).capitalize() + "."
+        segments.append({"start": round(t, 2), "end": round(t + duration, 2), "speaker": rng.choice(["[AGENT]", "[DECISION_MAKER]"]), "text": text})
+        t += duration + rng.uniform(0.1, 1.0)
+    return segments
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(
+        description="Payload size and latency of a player-synced view: whole /transcriptions/{id} vs. /transcriptions/{id}/segments windows. "
+        "Needs a scratch Postgres database (BENCH_DATABASE_URL)."
+    )
+    ap.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"), required=not os.getenv("BENCH_DATABASE_URL"))
+    ap.add_argument("--hours", type=float, nargs="+", default=[1.0, 3.0, 6.0])
+    ap.add_argument("--seeks", type=int, default=50, help="Window reads per transcript (random player positions)")
+    ap.add_argument("--window", type=float, default=30.0)
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+
+    os.environ.setdefault("OPENAI_API_KEY", "unused-by-benchmark")
+    os.environ["DATABASE_URL"] = args.database_url
+    sys.path.append(str(BACKEND_ROOT))
+    import httpx
+    from fastapi import FastAPI
+    from sqlalchemy import delete
+    from app import database  # type: ignore
+    from app.routers import transcription_router  # type: ignore
+    from app.services import transcript_search  # type: ignore
+
+    app = FastAPI()
+    app.include_router(transcription_router.router)
+    rng = random.Random(args.seed)
+
+    async def run():
+        async with database.async_engine.begin() as conn:
+            await conn.run_sync(database.Base.metadata.create_all)
+        ids = {}
+        async with database.AsyncSessionLocal() as db:
+            await db.execute(delete(database.Transcription).where(database.Transcription.audio_source == BENCH_SOURCE))
+            await db.commit()
+            for hours in args.hours:
+                segments = synthetic_transcript(rng, hours)
+                record = database.Transcription(
+                    audio_source=BENCH_SOURCE, raw_transcription=" ".join(s["text"] for s in segments),
+                    processed_transcription=" ".join(s["text"] for s in segments),
+                    raw_segments=segments, processed_segments=segments, audio_file_path="",
+                )
+                db.add(record)
+                await db.flush()
+                tid = record.id
+                await db.commit()
+                await transcript_search.replace_segments_from(db, tid, 0, transcript_search.segment_rows(tid, segments))
+                await db.commit()
+                ids[hours] = (tid, len(segments), segments[-1]["end"])
+
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None) as client:
+            for hours, (tid, count, duration) in ids.items():
+                full_times, full_bytes = [], 0
+                for _ in range(5):
+                    t0 = time.perf_counter()
+                    response = await client.get(f"/transcriptions/{tid}")
+                    full_times.append(time.perf_counter() - t0)
+                    full_bytes = len(response.content)
+                win_times, win_bytes, win_segments = [], [], []
+                for _ in range(args.seeks):
+                    t0 = time.perf_counter()
+                    response = await client.get(f"/transcriptions/{tid}/segments", params={"around": rng.uniform(0, duration), "window": args.window})
+                    win_times.append(time.perf_counter() - t0)
+                    assert response.status_code == 200, response.text
+                    win_bytes.append(len(response.content))
+                    win_segments.append(len(response.json()["segments"]))
+                print(
+                    f"[bench] {hours:4.1f}h ({count} segments) whole document: {full_bytes / 1024:8.1f} KiB p50={statistics.median(full_times) * 1000:6.1f}ms | "
+                    f"{args.window:.0f}s window: {statistics.mean(win_bytes) / 1024:5.1f} KiB ({statistics.mean(win_segments):.1f} segments) "
+                    f"p50={statistics.median(win_times) * 1000:5.1f}ms -> {full_bytes / statistics.mean(win_bytes):6.0f}x smaller",
+                    flush=True,
+                )
+
+        async with database.AsyncSessionLocal() as db:
+            await db.execute(delete(database.Transcription).where(database.Transcription.audio_source == BENCH_SOURCE))
+            await db.commit()
+        await database.async_engine.dispose()
+
+    asyncio.run(run())
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+BUCKET = "bench-uploads"
+
+
+async def _ticker(lags: list, interval: float = 0.01):
+    """Records how late each 10 ms tick fires; a blocked event loop shows up as large lags."""
+    while True:
+        t0 = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - t0 - interval)
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(
+        description="Upload time and event-loop stalls: blocking upload_file vs. upload_file_async, against an S3 stub."
+    )
+    ap.add_argument("--recordings", type=int, default=3)
+    ap.add_argument("--size-mb", type=float, default=64.0)
+    ap.add_argument("--latency-ms", type=float, default=40.0, help="Stub storage round trip")
+    ap.add_argument("--mbps", type=float, default=100.0, help="Stub bandwidth per connection")
+    ap.add_argument("--part-size-mb", type=int, default=8)
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+
+    # The stub runs in its own process so it does not share this process's GIL (and loop lag).
+    stub = subprocess.Popen(
+        [sys.executable, str(Path(__file__).with_name("s3_stub.py")), BUCKET, str(args.latency_ms), str(args.mbps)],
+        stdout=subprocess.PIPE, text=True,
+    )
+    port = int(stub.stdout.readline())
+    os.environ["BACKBLAZE_B2_S3_ENDPOINT"] = f"http://127.0.0.1:{port}"
+    os.environ["BACKBLAZE_B2_REGION"] = "us-east-1"
+    os.environ["BACKBLAZE_B2_KEY_ID"] = "bench"
+    os.environ["BACKBLAZE_B2_APPLICATION_KEY"] = "bench-secret"
+    sys.path.append(str(BACKEND_ROOT))
+    from app.services.storage import StorageService  # type: ignore
+
+    storage = StorageService(BUCKET, part_size_mb=args.part_size_mb, upload_concurrency=args.concurrency)
+    rng = random.Random(args.seed)
+    workdir = tempfile.mkdtemp(prefix="bench_uploads_")
+    paths = []
+    for i in range(args.recordings):
+        path = os.path.join(workdir, f"recording-{i}.mp3")
+        with open(path, "wb") as f:
+            f.write(rng.randbytes(int(args.size_mb * 1024 * 1024)))
+        paths.append(path)
+
+    def stored_md5(key: str) -> str:
+        digest = hashlib.md5()
+        for chunk in storage.s3_client.get_object(Bucket=BUCKET, Key=key)["Body"].iter_chunks(1024 * 1024):
+            digest.update(chunk)
+        return digest.hexdigest()
+
+    def local_md5(path: str) -> str:
+        with open(path, "rb") as f:
+            return hashlib.file_digest(f, "md5").hexdigest()
+
+    async def replay(mode: str):
+        lags: list = []
+        ticker = asyncio.create_task(_ticker(lags))
+        await asyncio.sleep(0.05)
+        durations, keys = [], []
+        for path in paths:
+            key = f"{mode}/{os.path.basename(path)}"
+            t0 = time.perf_counter()
+            if mode == "sync":
+                # What the pipeline did before: check the bucket, then a blocking upload on the loop.
+                ok = storage.check_connection() and storage.upload_file(path, key)
+            else:
+                ok = await storage.is_available_async(60) and await storage.upload_file_async(path, key)
+            durations.append(time.perf_counter() - t0)
+            assert ok, mode
+            keys.append(key)
+            await asyncio.sleep(0.05)  # lets a tick that was held up by a blocking call report its lag
+        ticker.cancel()
+        for path, key in zip(paths, keys):
+            assert stored_md5(key) == local_md5(path), f"{mode}: {key} differs from {path}"
+        mb = args.size_mb * len(paths)
+        print(
+            f"[bench] {mode:<6} uploads={len(paths)} total={sum(durations):6.2f}s ({mb / sum(durations):6.1f} MB/s) "
+            f"per-file={sum(durations) / len(durations):5.2f}s loop-lag max={max(lags) * 1000:7.1f}ms "
+            f"ticks={len(lags)}",
+            flush=True,
+        )
+
+    async def run():
+        for mode in ("sync", "async"):
+            await replay(mode)
+        # Streaming from a file-like source (e.g. a request body) goes through the same multipart path.
+        with open(paths[0], "rb") as f:
+            t0 = time.perf_counter()
+            ok = await storage.upload_fileobj_async(f, "stream/recording-0.mp3")
+        print(f"[bench] fileobj upload ok={ok} in {time.perf_counter() - t0:.2f}s", flush=True)
+
+    try:
+        asyncio.run(run())
+    finally:
+        stub.kill()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+BENCH_SOURCE = "bench-transcript-search"
+
+GERMAN = (
+    "ja genau also wir haben das angebot für neue kunden geschickt und ich wollte fragen ob sie "
+    "zeit für einen termin haben der geschäftsführer ist gerade nicht im haus können sie später "
+    "noch einmal anrufen wir arbeiten mit einer agentur zusammen das budget ist für dieses jahr "
+    "schon verplant schicken sie uns bitte unterlagen per email unsere vertriebsabteilung kümmert "
+    "sich darum wie viele mitarbeiter haben sie aktuell im außendienst das klingt interessant "
+    "rückruf nächste woche kampagne neukundengewinnung vertrag laufzeit kündigung preis rabatt"
+).split()
+ENGLISH = (
+    "yes exactly we sent the proposal for new customers and i wanted to ask whether you have time "
+    "for a meeting the managing director is not in the office please call back later we already "
+    "work with an agency the budget for this year is already planned please send us documents by email"
+).split()
+# (query, language) pairs: frequent words, a rare planted phrase, boolean syntax and English text.
+QUERIES = [
+    ("termin", "de"),
+    ("geschäftsführer", "de"),
+    ("\"rückruf am donnerstag vereinbart\"", "de"),
+    ("budget agentur", "de"),
+    ("kündigung -rabatt", "de"),
+    ("proposal", "en"),
+    ("\"managing director\"", "auto"),
+    ("wettbewerbsanalyse", "auto"),
+]
+PLANTED = "der rückruf am donnerstag vereinbart"
+
+
+def synthetic_segments(rng: np.random.Generator, count: int) -> List[Dict]:
+    """Zipf-weighted German call segments (10% English), with a rare planted phrase."""
+    de_w = 1 / np.arange(1, len(GERMAN) + 1)
+    en_w = 1 / np.arange(1, len(ENGLISH) + 1)
+    de_w, en_w = de_w / de_w.sum(), en_w / en_w.sum()
+    segments, t = [], 0.0
+    for i in range(count):
+        english = rng.random() < 0.1
+        vocab, weights = (ENGLISH, en_w) if english else (GERMAN, de_w)
+        words = [vocab[j] for j in rng.choice(len(vocab), size=int(rng.integers(6, 26)), p=weights)]
+        text = " ".join(words).capitalize() + "."
+        if rng.random() < 0.0002:
+            text = text[:-1] + " " + PLANTED + "."
+        duration = len(words) * 0.35
+        segments.append({"start": round(t, 2), "end": round(t + duration, 2), "speaker": "[AGENT]" if i % 2 else "[DECISION_MAKER]", "text": text})
+        t += duration + 0.2
+    return segments
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(
+        description="Latency of transcript full-text search (tsvector + GIN) vs. scanning segments in Python and ILIKE. "
+        "Needs a scratch Postgres database (BENCH_DATABASE_URL); bench rows are removed afterwards unless --keep."
+    )
+    ap.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"), required=not os.getenv("BENCH_DATABASE_URL"))
+    ap.add_argument("--segments", type=int, default=1_000_000)
+    ap.add_argument("--per-transcript", type=int, default=500)
+    ap.add_argument("--repeats", type=int, default=5)
+    ap.add_argument("--keep", action="store_true")
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+
+    os.environ.setdefault("OPENAI_API_KEY", "unused-by-benchmark")
+    os.environ["DATABASE_URL"] = args.database_url
+    sys.path.append(str(BACKEND_ROOT))
+    from sqlalchemy import text
+    from app import database  # type: ignore
+    from app.services import transcript_search  # type: ignore
+
+    rng = np.random.default_rng(args.seed)
+    transcripts = max(1, args.segments // args.per_transcript)
+
+    async def load():
+        async with database.async_engine.begin() as conn:
+            await conn.run_sync(database.Base.metadata.create_all)
+        async with database.async_engine.connect() as conn:
+            driver = (await conn.get_raw_connection()).driver_connection
+            await driver.execute(f"DELETE FROM transcriptions WHERE audio_source = '{BENCH_SOURCE}'")
+            await driver.execute("DROP INDEX IF EXISTS ix_transcript_segments_tsv_de, ix_transcript_segments_tsv_en")
+            t0 = time.perf_counter()
+            for n in range(transcripts):
+                segments = synthetic_segments(rng, args.per_transcript)
+                tid = await driver.fetchval(
+                    "INSERT INTO transcriptions (created_at, audio_source, raw_transcription, processed_segments, raw_segments, audio_file_path) "
+                    "VALUES ($1, $2, $3, $4, $4, '') RETURNING id",
+                    datetime.datetime.utcnow(), BENCH_SOURCE, " ".join(s["text"] for s in segments), json.dumps(segments),
+                )
+                rows = [(r["transcription_id"], r["segment_index"], r["start_time"], r["end_time"], r["speaker"], r["text"])
+                        for r in transcript_search.segment_rows(tid, segments)]
+                await driver.copy_records_to_table(
+                    "transcript_segments", records=rows,
+                    columns=["transcription_id", "segment_index", "start_time", "end_time", "speaker", "text"],
+                )
+                if (n + 1) % max(1, transcripts // 10) == 0:
+                    print(f"[bench] loaded {(n + 1) * args.per_transcript} segments ({time.perf_counter() - t0:.0f}s)", flush=True)
+            t1 = time.perf_counter()
+            await driver.execute("CREATE INDEX ix_transcript_segments_tsv_de ON transcript_segments USING gin (tsv_de)")
+            await driver.execute("CREATE INDEX ix_transcript_segments_tsv_en ON transcript_segments USING gin (tsv_en)")
+            await driver.execute("ANALYZE transcript_segments")
+            size = await driver.fetchval(
+                "SELECT pg_size_pretty(pg_relation_size('ix_transcript_segments_tsv_de') + pg_relation_size('ix_transcript_segments_tsv_en'))"
+            )
+            total = await driver.fetchval("SELECT count(*) FROM transcript_segments")
+            print(f"[bench] {total} segments in {transcripts} transcripts; load {t1 - t0:.0f}s, GIN build {time.perf_counter() - t1:.0f}s, GIN size {size}", flush=True)
+
+    async def python_scan(needle: str) -> int:
+        # The previous way: load the stored segment arrays and scan them in Python.
+        async with database.AsyncSessionLocal() as db:
+            result = await db.execute(text("SELECT id, processed_segments FROM transcriptions WHERE audio_source = :s"), {"s": BENCH_SOURCE})
+            hits = 0
+            for _, segments in result:
+                segments = json.loads(segments) if isinstance(segments, str) else segments
+                hits += sum(1 for seg in segments if needle in seg["text"].lower())
+            return hits
+
+    async def ilike(needle: str) -> int:
+        async with database.AsyncSessionLocal() as db:
+            result = await db.execute(text("SELECT count(*) FROM (SELECT 1 FROM transcript_segments WHERE text ILIKE :p LIMIT 21) x"), {"p": f"%{needle}%"})
+            return result.scalar_one()
+
+    async def timed(fn, *a, **kw):
+        times, out = [], None
+        for _ in range(args.repeats):
+            t0 = time.perf_counter()
+            out = await fn(*a, **kw)
+            times.append(time.perf_counter() - t0)
+        return times, out
+
+    async def run():
+        await load()
+        async with database.AsyncSessionLocal() as db:
+            for order in ("relevance", "recent"):
+                all_times = []
+                for query, language in QUERIES:
+                    times, out = await timed(transcript_search.search, db, query, language=language, order=order, limit=20)
+                    all_times += times
+                    first = out["hits"][0] if out["hits"] else None
+                    print(
+                        f"[bench] fts {order:<9} {query!r:<40} lang={language:<4} p50={statistics.median(times) * 1000:7.1f}ms "
+                        f"hits={len(out['hits'])}{'+' if out['has_more'] else ''}"
+                        + (f" first=#{first['transcription_id']}@{first['start']}s" if first else ""),
+                        flush=True,
+                    )
+                print(f"[bench] fts {order:<9} all queries p50={statistics.median(all_times) * 1000:.1f}ms p95={_percentile(all_times, 0.95) * 1000:.1f}ms", flush=True)
+        for needle in ("termin", "rückruf am donnerstag vereinbart"):
+            times, hits = await timed(ilike, needle)
+            print(f"[bench] ilike first 20 {needle!r:<36} p50={statistics.median(times) * 1000:7.1f}ms hits={hits}", flush=True)
+        times, hits = await timed(python_scan, "rückruf am donnerstag vereinbart")
+        print(f"[bench] python scan of all segment arrays p50={statistics.median(times) * 1000:7.1f}ms hits={hits}", flush=True)
+        if not args.keep:
+            async with database.async_engine.begin() as conn:
+                await conn.execute(text("DELETE FROM transcriptions WHERE audio_source = :s"), {"s": BENCH_SOURCE})
+        await database.async_engine.dispose()
+
+    asyncio.run(run())
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
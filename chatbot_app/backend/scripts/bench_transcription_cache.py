@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import io
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(
+        description="Replay a /transcribe workload with stubbed providers and compare the content-hash cache against no cache."
+    )
+    ap.add_argument("--submissions", type=int, default=200, help="Total uploads to replay")
+    ap.add_argument("--unique", type=int, default=40, help="Distinct recordings in the workload")
+    ap.add_argument("--size-kb", type=int, default=2048, help="Size of each synthetic recording")
+    ap.add_argument("--whisper-ms", type=float, default=400.0, help="Stubbed whisper latency per call")
+    ap.add_argument("--llm-ms", type=float, default=600.0, help="Stubbed post-processing latency per call")
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+
+    if not os.environ.get("DATABASE_URL"):
+        raise SystemExit("Set DATABASE_URL to a scratch Postgres database; the benchmark writes rows to it.")
+    os.environ.setdefault("OPENAI_API_KEY", "unused-by-benchmark")
+
+    backend_root = Path(__file__).resolve().parents[1]
+    sys.path.append(str(backend_root))
+
+    from starlette.datastructures import UploadFile
+    from app import database  # type: ignore
+    from app.services import transcription_cache, uploads  # type: ignore
+
+    rng = random.Random(args.seed)
+    recordings = [rng.randbytes(args.size_kb * 1024) for _ in range(args.unique)]
+    # Skewed replay: a few recordings are re-submitted far more often than the rest.
+    workload = rng.choices(range(args.unique), weights=[1 / (i + 1) for i in range(args.unique)], k=args.submissions)
+    cfg_key = transcription_cache.config_key({"benchmark": True, "seed": args.seed, "run": time.time()})
+
+    async def fake_pipeline(db, sha: str, use_cache: bool, calls: Dict[str, int]):
+        await asyncio.sleep(args.whisper_ms / 1000)
+        calls["whisper"] += 1
+        await asyncio.sleep(args.llm_ms / 1000)
+        calls["llm"] += 1
+        record = database.Transcription(
+            audio_source="benchmark",
+            raw_transcription="stub",
+            raw_segments=[{"start": 0.0, "end": 1.0, "text": "stub"}],
+            processed_segments=[{"speaker": "A", "start": 0.0, "end": 1.0, "text": "stub"}],
+            audio_file_path="",
+        )
+        db.add(record)
+        await db.commit()
+        await db.refresh(record)
+        if use_cache:
+            await transcription_cache.store(db, sha, cfg_key, record.id)
+        return record.id
+
+    async def replay(use_cache: bool):
+        calls = {"whisper": 0, "llm": 0}
+        latencies: List[float] = []
+        created: List[int] = []
+        async with database.AsyncSessionLocal() as db:
+            with tempfile.TemporaryDirectory() as tmp:
+                for i, idx in enumerate(workload):
+                    t0 = time.perf_counter()
+                    upload = UploadFile(file=io.BytesIO(recordings[idx]), filename=f"rec_{idx}.mp3")
+                    spooled = await uploads.spool_upload(upload, os.path.join(tmp, f"{i}.mp3"))
+                    hit = await transcription_cache.lookup(db, spooled.sha256, cfg_key) if use_cache else None
+                    if hit is None:
+                        created.append(await fake_pipeline(db, spooled.sha256, use_cache, calls))
+                    os.remove(spooled.path)
+                    latencies.append(time.perf_counter() - t0)
+            # Clean up benchmark rows (cache entries cascade).
+            for tid in created:
+                await db.delete(await db.get(database.Transcription, tid))
+            await db.commit()
+        return latencies, calls
+
+    async def run():
+        await database.create_db_and_tables()
+        for use_cache in (False, True):
+            before = dict(transcription_cache.get_stats())
+            latencies, calls = await replay(use_cache)
+            stats = transcription_cache.get_stats()
+            label = "cache" if use_cache else "no-cache"
+            print(
+                f"[bench] {label:<8} submissions={len(latencies)} mean={statistics.mean(latencies) * 1000:8.1f}ms "
+                f"p50={statistics.median(latencies) * 1000:8.1f}ms "
+                f"p95={sorted(latencies)[int(0.95 * (len(latencies) - 1))] * 1000:8.1f}ms "
+                f"total={sum(latencies):7.2f}s api_calls={calls['whisper'] + calls['llm']} "
+                f"hits={stats['hits'] - before['hits']} misses={stats['misses'] - before['misses']}",
+                flush=True,
+            )
+        await database.async_engine.dispose()
+
+    asyncio.run(run())
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
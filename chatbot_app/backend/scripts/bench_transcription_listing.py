@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import datetime
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(
+        description="Seed synthetic transcriptions and compare full-table, OFFSET and keyset listing latency."
+    )
+    ap.add_argument("--rows", type=int, default=100_000, help="Synthetic transcriptions to seed")
+    ap.add_argument("--segments", type=int, default=40, help="Segments per row (controls heavy column size)")
+    ap.add_argument("--page-size", type=int, default=50)
+    ap.add_argument("--pages", type=int, default=1000, help="How deep to walk with the cursor")
+    ap.add_argument("--skip-full", action="store_true", help="Skip the legacy load-everything query")
+    ap.add_argument("--keep", action="store_true", help="Keep the seeded rows afterwards")
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+
+    if not os.environ.get("DATABASE_URL"):
+        raise SystemExit("Set DATABASE_URL to a scratch Postgres database; the benchmark writes rows to it.")
+    os.environ.setdefault("OPENAI_API_KEY", "unused-by-benchmark")
+
+    backend_root = Path(__file__).resolve().parents[1]
+    sys.path.append(str(backend_root))
+
+    from sqlalchemy import delete, insert, select, text
+    from app import database  # type: ignore
+    from app.routers import transcription_router  # type: ignore
+
+    tag = f"bench-listing-{int(time.time())}"
+    rng = random.Random(args.seed)
+
+    def make_row(i: int, base: datetime.datetime) -> Dict:
+        segments = [
+            {"start": j * 4.0, "end": j * 4.0 + 3.5, "text": f"Segment {j} of synthetic call {i} mit etwas Text."}
+            for j in range(args.segments)
+        ]
+        processed = [dict(seg, speaker=rng.choice(["[AGENT]", "[DECISION_MAKER]"])) for seg in segments]
+        full_text = " ".join(seg["text"] for seg in segments)
+        return {
+            "created_at": base + datetime.timedelta(seconds=i),
+            "audio_source": f"{tag}/call_{i}.mp3",
+            "raw_transcription": full_text,
+            "processed_transcription": full_text,
+            "raw_segments": segments,
+            "processed_segments": processed,
+            "audio_file_path": f"call_{i}.mp3",
+        }
+
+    def percentile(values: List[float], pct: float) -> float:
+        ordered = sorted(values)
+        return ordered[int(pct * (len(ordered) - 1))]
+
+    async def seed():
+        base = datetime.datetime.utcnow() - datetime.timedelta(seconds=args.rows)
+        batch = 2000
+        t0 = time.perf_counter()
+        async with database.async_engine.begin() as conn:
+            for offset in range(0, args.rows, batch):
+                rows = [make_row(i, base) for i in range(offset, min(args.rows, offset + batch))]
+                await conn.execute(insert(database.Transcription), rows)
+        print(f"[bench] seeded {args.rows} rows in {time.perf_counter() - t0:.1f}s", flush=True)
+
+    async def run():
+        await database.create_db_and_tables()
+        await seed()
+        t = database.Transcription
+        try:
+            async with database.AsyncSessionLocal() as db:
+                await db.execute(text("ANALYZE transcriptions"))
+
+                if not args.skip_full:
+                    t0 = time.perf_counter()
+                    rows = (await db.execute(select(t).order_by(t.created_at.desc()))).scalars().all()
+                    elapsed = time.perf_counter() - t0
+                    print(f"[bench] full load       rows={len(rows):>7} time={elapsed * 1000:9.1f}ms", flush=True)
+                    del rows
+                    db.expunge_all()
+
+                depths = sorted({1, 10, 100, args.pages} & set(range(1, args.pages + 1)))
+
+                # OFFSET pagination for contrast: cost grows with the page number.
+                for depth in depths:
+                    stmt = (
+                        select(t.id, t.audio_source, t.created_at, t.audio_file_path)
+                        .order_by(t.created_at.desc(), t.id.desc())
+                        .offset((depth - 1) * args.page_size)
+                        .limit(args.page_size)
+                    )
+                    samples = []
+                    for _ in range(5):
+                        t0 = time.perf_counter()
+                        (await db.execute(stmt)).all()
+                        samples.append(time.perf_counter() - t0)
+                    print(f"[bench] offset  page={depth:<5} p50={statistics.median(samples) * 1000:7.2f}ms", flush=True)
+
+                # Keyset pagination as served by GET /transcriptions.
+                latencies: List[float] = []
+                cursor = None
+                for _ in range(args.pages):
+                    t0 = time.perf_counter()
+                    page, cursor = await transcription_router.list_transcription_summaries(db, args.page_size, cursor)
+                    latencies.append(time.perf_counter() - t0)
+                    if not cursor:
+                        break
+                for depth in depths:
+                    if depth <= len(latencies):
+                        window = latencies[max(0, depth - 5):depth]
+                        print(f"[bench] keyset  page={depth:<5} p50={statistics.median(window) * 1000:7.2f}ms", flush=True)
+                print(
+                    f"[bench] keyset  walked {len(latencies)} pages: p50={statistics.median(latencies) * 1000:.2f}ms "
+                    f"p95={percentile(latencies, 0.95) * 1000:.2f}ms",
+                    flush=True,
+                )
+        finally:
+            if not args.keep:
+                async with database.async_engine.begin() as conn:
+                    result = await conn.execute(delete(t).where(t.audio_source.like(f"{tag}/%")))
+                print(f"[bench] removed {result.rowcount} seeded rows", flush=True)
+            await database.async_engine.dispose()
+
+    asyncio.run(run())
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
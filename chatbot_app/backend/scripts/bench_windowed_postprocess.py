@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List
+
+
+ROLES = ["[AGENT]", "[GATEKEEPER]", "[DECISION_MAKER]"]
+WORDS = (
+    "ja genau also wir hatten letzte Woche gesprochen es geht um die Neukundengewinnung "
+    "können Sie mich mit Frau Groß verbinden der Chef ist im Urlaub nächste Woche wieder da"
+).split()
+
+
+def _make_segments(minutes: float, rng: random.Random) -> tuple[List[dict], List[str]]:
+    """Synthetic call: gatekeeper opening, then alternating agent/decision-maker turns."""
+    segments: List[dict] = []
+    truth: List[str] = []
+    t = 0.0
+    speaker = "[GATEKEEPER]"
+    while t < minutes * 60:
+        for _ in range(rng.randint(1, 4)):
+            duration = rng.uniform(1.5, 7.0)
+            words = max(2, int(duration * 2.5))
+            segments.append({
+                "start": round(t, 2),
+                "end": round(t + duration, 2),
+                "text": " ".join(rng.choice(WORDS) for _ in range(words)) + ".",
+            })
+            truth.append(speaker)
+            t += duration + rng.uniform(0.1, 0.4)
+        t += rng.uniform(0.3, 1.5)
+        if speaker == "[GATEKEEPER]" and t > 45:
+            speaker = "[AGENT]"
+        else:
+            speaker = "[DECISION_MAKER]" if speaker == "[AGENT]" else ("[AGENT]" if t > 45 else "[GATEKEEPER]")
+    return segments, truth
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(
+        description="Compare single-request and windowed transcript post-processing against a stub LLM."
+    )
+    ap.add_argument("--minutes", type=float, default=60.0, help="Length of the synthetic call")
+    ap.add_argument("--window-tokens", type=int, default=2500)
+    ap.add_argument("--overlap", type=int, default=4, help="Context segments shared by adjacent windows")
+    ap.add_argument("--workers", type=str, default="1,2,4,8", help="Comma-separated worker counts")
+    ap.add_argument("--base-ms", type=float, default=800.0, help="Stub latency per request")
+    ap.add_argument("--ms-per-token", type=float, default=0.5, help="Stub latency per output token")
+    ap.add_argument("--max-output-tokens", type=int, default=4096, help="Stub output limit; larger responses fail")
+    ap.add_argument("--swap-rate", type=float, default=0.3, help="Chance a window swaps two role labels")
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+
+    backend_root = Path(__file__).resolve().parents[1]
+    sys.path.append(str(backend_root))
+    from app.services import windowed_processing  # type: ignore
+
+    rng = random.Random(args.seed)
+    segments, truth = _make_segments(args.minutes, rng)
+    truth_by_start = {s["start"]: label for s, label in zip(segments, truth)}
+    total_tokens = windowed_processing.estimate_tokens(segments)
+    print(
+        f"[bench] {len(segments)} segments, ~{total_tokens} tokens "
+        f"(stub limit {args.max_output_tokens} output tokens)",
+        flush=True,
+    )
+
+    def make_stub(outputs: Dict[int, List[dict]], calls: List[int]):
+        lock = threading.Lock()
+
+        def stub_llm(index: int, window: List[dict]) -> List[dict]:
+            tokens = windowed_processing.estimate_tokens(window)
+            with lock:
+                calls[0] += 1
+            if tokens > args.max_output_tokens:
+                time.sleep((args.base_ms + args.ms_per_token * args.max_output_tokens) / 1000)
+                raise ValueError(f"response truncated at {args.max_output_tokens} tokens")
+            time.sleep((args.base_ms + args.ms_per_token * tokens) / 1000)
+            # A window without the earlier context sometimes swaps two roles.
+            window_rng = random.Random(args.seed * 1000 + index)
+            swap = dict(zip(ROLES, ROLES))
+            if window_rng.random() < args.swap_rate:
+                a, b = window_rng.sample(ROLES, 2)
+                swap[a], swap[b] = b, a
+            out = [
+                {"start": s["start"], "end": s["end"], "speaker": swap[truth_by_start[s["start"]]], "text": s["text"].capitalize()}
+                for s in window
+            ]
+            outputs[index] = out
+            return out
+
+        return stub_llm
+
+    def accuracy(merged: List[dict]) -> float:
+        correct = sum(1 for seg in merged if truth_by_start.get(seg["start"]) == seg["speaker"])
+        return correct / len(segments)
+
+    # Single request for the whole transcript, as before.
+    calls = [0]
+    stub = make_stub({}, calls)
+    t0 = time.perf_counter()
+    try:
+        stub(0, segments)
+        outcome = "ok"
+    except ValueError as e:
+        outcome = f"failed ({e})"
+    print(f"[bench] single-request    wall={time.perf_counter() - t0:7.2f}s calls={calls[0]} {outcome}", flush=True)
+
+    plan = windowed_processing.plan_windows(segments, args.window_tokens, args.overlap)
+    for workers in [int(w) for w in args.workers.split(",") if w.strip()]:
+        outputs: Dict[int, List[dict]] = {}
+        calls = [0]
+        t0 = time.perf_counter()
+        merged = windowed_processing.process_windowed(
+            segments,
+            process_window=make_stub(outputs, calls),
+            max_tokens=args.window_tokens,
+            overlap_segments=args.overlap,
+            max_workers=workers,
+        )
+        elapsed = time.perf_counter() - t0
+        unreconciled = windowed_processing.merge_windows(
+            segments, plan, [outputs[i] for i in range(len(plan))], reconcile=False
+        )
+        aligned = [seg["start"] for seg in merged] == [seg["start"] for seg in segments]
+        print(
+            f"[bench] windowed workers={workers:<2} wall={elapsed:7.2f}s windows={len(plan)} calls={calls[0]} "
+            f"timeline_intact={aligned} speaker_acc={accuracy(merged):.3f} "
+            f"(without reconciliation {accuracy(unreconciled):.3f})",
+            flush=True,
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(
+        description="Copy the Chroma journey collection into a local (memory-mapped numpy) vector store."
+    )
+    ap.add_argument("--target", default=None, help="Store directory (default: LOCAL_VECTOR_STORE_PATH or <CHROMA_DB_PATH>/<collection>.local)")
+    ap.add_argument("--batch-size", type=int, default=5000)
+    args = ap.parse_args()
+
+    backend_root = Path(__file__).resolve().parents[1]
+    sys.path.append(str(backend_root))
+    from app.config import settings  # type: ignore
+    from app.services import vector_db  # type: ignore
+    from app.services.vector_store import ChromaVectorStore, LocalVectorStore, copy_store  # type: ignore
+
+    target = args.target or settings.LOCAL_VECTOR_STORE_PATH or os.path.join(
+        settings.CHROMA_DB_PATH, f"{settings.CHROMA_COLLECTION_NAME}.local"
+    )
+    source = ChromaVectorStore(settings.CHROMA_DB_PATH, settings.CHROMA_COLLECTION_NAME, vector_db.openai_ef)
+    store = LocalVectorStore(target, ivf_min_rows=settings.LOCAL_VECTOR_IVF_MIN_ROWS, nprobe=settings.LOCAL_VECTOR_IVF_NPROBE)
+    t0 = time.perf_counter()
+    copied = copy_store(source, store, batch_size=args.batch_size)
+    print(f"Copied {copied} journeys to {target} in {time.perf_counter() - t0:.1f}s. Set VECTOR_STORE_BACKEND=local to use it.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
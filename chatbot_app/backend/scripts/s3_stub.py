@@ -0,0 +1,177 @@
+"""
+Minimal S3-compatible server (path-style) for the storage benchmarks.
+
+Supports HeadBucket, HeadObject, GetObject with Range, PutObject, multipart
+uploads (create, upload part, complete, abort) and verifies Content-MD5 like
+S3 does. Every request waits ``latency_ms``; request and response bodies are
+throttled to ``mbps`` per connection, which is how a single object-storage
+stream behaves. Requests and bytes are counted in the returned ``counters``.
+"""
+from __future__ import annotations
+
+import base64
+import hashlib
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict
+from urllib.parse import parse_qs, unquote, urlsplit
+
+
+def make_s3_stub(objects: Dict[str, bytes], latency_ms: float, mbps: float, bucket: str):
+    counters = {
+        "head_bucket": 0, "head_object": 0, "get_object": 0, "put_object": 0,
+        "upload_part": 0, "complete": 0, "abort": 0, "egress_bytes": 0, "ingress_bytes": 0,
+    }
+    uploads: Dict[str, Dict[int, bytes]] = {}
+    lock = threading.Lock()
+
+    def throttle(nbytes: int):
+        time.sleep(latency_ms / 1000 + nbytes / (mbps * 125_000))
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _target(self):
+            parts = urlsplit(self.path)
+            bucket_name, _, key = unquote(parts.path).lstrip("/").partition("/")
+            return bucket_name, key, {k: v[0] for k, v in parse_qs(parts.query, keep_blank_values=True).items()}
+
+        def _count(self, name: str, egress: int = 0, ingress: int = 0):
+            with lock:
+                counters[name] += 1
+                counters["egress_bytes"] += egress
+                counters["ingress_bytes"] += ingress
+
+        def _reply(self, status: int, body: bytes = b"", headers: Dict[str, str] = None):
+            self.send_response(status)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if body and self.command != "HEAD":
+                self.wfile.write(body)
+
+        def _body(self) -> bytes:
+            return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+        def _md5_ok(self, data: bytes) -> bool:
+            sent = self.headers.get("Content-MD5")
+            return sent is None or sent == base64.b64encode(hashlib.md5(data).digest()).decode("ascii")
+
+        def do_HEAD(self):
+            bucket_name, key, _ = self._target()
+            throttle(0)
+            if not key:
+                self._count("head_bucket")
+                self._reply(200 if bucket_name == bucket else 404)
+                return
+            self._count("head_object")
+            body = objects.get(key)
+            if body is None:
+                self._reply(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Content-Type", "audio/mpeg")
+            self.send_header("ETag", f'"{hash(key) & 0xffffffff:x}"')
+            self.end_headers()
+
+        def do_GET(self):
+            _, key, _ = self._target()
+            body = objects.get(key)
+            if body is None:
+                throttle(0)
+                self._reply(404)
+                return
+            start, end, status = 0, len(body) - 1, 200
+            header = self.headers.get("Range")
+            if header:
+                first, _, last = header.split("=", 1)[1].partition("-")
+                start, end, status = int(first), min(int(last) if last else len(body) - 1, len(body) - 1), 206
+            data = body[start:end + 1]
+            self._count("get_object", egress=len(data))
+            throttle(len(data))
+            headers = {"Content-Type": "audio/mpeg"}
+            if status == 206:
+                headers["Content-Range"] = f"bytes {start}-{end}/{len(body)}"
+            self._reply(status, data, headers)
+
+        def do_PUT(self):
+            _, key, query = self._target()
+            data = self._body()
+            throttle(len(data))
+            if not self._md5_ok(data):
+                self._reply(400, b"<Error><Code>BadDigest</Code></Error>")
+                return
+            etag = f'"{hashlib.md5(data).hexdigest()}"'
+            if "uploadId" in query:
+                self._count("upload_part", ingress=len(data))
+                with lock:
+                    parts = uploads.get(query["uploadId"])
+                    if parts is None:
+                        self._reply(404, b"<Error><Code>NoSuchUpload</Code></Error>")
+                        return
+                    parts[int(query["partNumber"])] = data
+            else:
+                self._count("put_object", ingress=len(data))
+                objects[key] = data
+            self._reply(200, headers={"ETag": etag})
+
+        def do_POST(self):
+            _, key, query = self._target()
+            payload = self._body()
+            throttle(0)
+            if "uploads" in query:
+                upload_id = uuid.uuid4().hex
+                with lock:
+                    uploads[upload_id] = {}
+                self._reply(200, (
+                    f"<InitiateMultipartUploadResult><Bucket>{bucket}</Bucket><Key>{key}</Key>"
+                    f"<UploadId>{upload_id}</UploadId></InitiateMultipartUploadResult>"
+                ).encode())
+                return
+            with lock:
+                parts = uploads.pop(query.get("uploadId", ""), None)
+            if parts is None:
+                self._reply(404, b"<Error><Code>NoSuchUpload</Code></Error>")
+                return
+            numbers = [int(n) for n in re.findall(rb"<PartNumber>(\d+)</PartNumber>", payload)]
+            chunks = [parts[n] for n in numbers]
+            objects[key] = b"".join(chunks)
+            etag = hashlib.md5(b"".join(hashlib.md5(c).digest() for c in chunks)).hexdigest()
+            self._count("complete")
+            self._reply(200, (
+                f"<CompleteMultipartUploadResult><Bucket>{bucket}</Bucket><Key>{key}</Key>"
+                f"<ETag>\"{etag}-{len(chunks)}\"</ETag></CompleteMultipartUploadResult>"
+            ).encode())
+
+        def do_DELETE(self):
+            _, key, query = self._target()
+            throttle(0)
+            with lock:
+                if "uploadId" in query:
+                    uploads.pop(query["uploadId"], None)
+                    counters["abort"] += 1
+                else:
+                    objects.pop(key, None)
+            self._reply(204)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, counters
+
+
+if __name__ == "__main__":
+    # Out-of-process mode, so the stub does not compete for the caller's GIL:
+    #   python s3_stub.py BUCKET LATENCY_MS MBPS  -> prints the port, serves until killed.
+    import sys
+
+    server, _ = make_s3_stub({}, float(sys.argv[2]), float(sys.argv[3]), sys.argv[1])
+    print(server.server_address[1], flush=True)
+    threading.Event().wait()
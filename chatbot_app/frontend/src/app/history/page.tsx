@@ -12,8 +12,8 @@ import { PlayCircle } from "lucide-react";
 import { TranscriptionItem } from "@/lib/stores/useTranscribeStore";
 
 export default function HistoryPage() {
-  const { history, audioUrl, fetchAndSetAudioUrl, error, setError } = useTranscribeStore();
-  const { getHistory } = useTranscribeApi();
+  const { history, historyCursor, isLoading, audioUrl, fetchAndSetAudioUrl, error, setError } = useTranscribeStore();
+  const { getHistory, loadMoreHistory } = useTranscribeApi();
 
   useEffect(() => {
     getHistory();
@@ -88,6 +88,13 @@ export default function HistoryPage() {
                 ))}
               </TableBody>
             </Table>
+            {historyCursor && (
+              <div className="flex justify-center mt-4">
+                <Button variant="outline" size="sm" onClick={loadMoreHistory} disabled={isLoading}>
+                  {isLoading ? "Loading..." : "Load more"}
+                </Button>
+              </div>
+            )}
           </CardContent>
         </Card>
       </div>
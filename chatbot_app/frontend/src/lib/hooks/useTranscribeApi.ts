@@ -19,12 +19,97 @@ export function useTranscribeApi() {
     startCinematicExperience,
     advanceCinematicStage,
     setHistory,
+    appendHistory,
   } = useTranscribeStore();
 
   // Use same-origin /api/* so Next rewrites proxy to backend (avoids CORS issues).
   // This relies on `next.config.ts` rewrites().
   const apiBase = "";
 
+  // Applies one task status payload (from SSE or polling) to the store.
+  // Returns true once the task reached a terminal state.
+  const applyTaskUpdate = (data: any, onDone: () => void): boolean => {
+    const { cinematicStage } = useTranscribeStore.getState();
+
+    // Reflect backend progress/message when available
+    if (typeof data.progress === 'number') {
+      useTranscribeStore.setState({ progress: data.progress });
+    }
+    if (typeof data.message === 'string' && data.message.length > 0) {
+      useTranscribeStore.setState({ progressMessage: data.message });
+    }
+
+    const result = data.result;
+    const isPartial = result && result.status === 'PARTIAL_TRANSCRIPT';
+
+    // Long recordings are transcribed in chunks; show the text as it arrives
+    // without leaving the TRANSCRIBING stage.
+    if (isPartial && cinematicStage === 'TRANSCRIBING' && Array.isArray(result.raw_segments)) {
+      const partialFormatted = result.raw_segments.map(
+        (seg: { text: string }) => seg.text.trim()
+      ).join(' ');
+      setTranscription(partialFormatted, result.raw_segments);
+    }
+
+    // Consider RAW ready once the complete raw_segments arrive and we are still in TRANSCRIBING stage
+    const shouldIngestRaw = (
+      cinematicStage === 'TRANSCRIBING' &&
+      result && !isPartial && Array.isArray(result.raw_segments)
+    );
+    if (shouldIngestRaw) {
+      const transcriptionSegments = result.raw_segments || [];
+      const rawFormatted = transcriptionSegments.map(
+        (seg: { text: string }) => seg.text.trim()
+      ).join(' ');
+      setTranscription(rawFormatted, transcriptionSegments);
+      setTranscriptionId(result.transcription_id);
+      if (result.transcription_id) {
+        fetchAndSetAudioUrl(result.transcription_id);
+      }
+      advanceCinematicStage();
+    }
+
+    // If the backend now includes a transcription_id and we don't have one yet, set it and fetch audio
+    if (
+      result && result.transcription_id && !useTranscribeStore.getState().transcriptionId
+    ) {
+      setTranscriptionId(result.transcription_id);
+      fetchAndSetAudioUrl(result.transcription_id);
+    }
+
+    if (data.status === "SUCCESS") {
+      // Defensive: ensure raw transcript is set even if intermediate event was missed
+      if (result.raw_segments && useTranscribeStore.getState().transcriptionSegments.length === 0) {
+        const rawFormatted = result.raw_segments.map((seg: { text: string }) => seg.text.trim()).join(' ');
+        setTranscription(rawFormatted, result.raw_segments);
+      }
+      // Ensure audio is available once the transcription_id exists
+      if (result.transcription_id && !useTranscribeStore.getState().transcriptionId) {
+        setTranscriptionId(result.transcription_id);
+        fetchAndSetAudioUrl(result.transcription_id);
+      }
+      const processedSegments = result.processed_segments || [];
+      const processedFormatted = processedSegments.map(
+          (seg: { speaker: string, text: string }) => `${seg.speaker.replace(/\[|\]/g, '')}: ${seg.text.trim()}`
+      ).join('\n');
+      setProcessedTranscription(processedFormatted, processedSegments);
+      // Keep success message visible for a moment before hiding loader
+      useTranscribeStore.setState({ progress: 100, progressMessage: 'Transcription completed successfully.' });
+      setTimeout(() => {
+        setIsLoading(false);
+        useTranscribeStore.setState({ cinematicStage: 'DONE' });
+        onDone();
+      }, 1200);
+      return true;
+    } else if (data.status === "ERROR") {
+      onDone();
+      setError(data.message);
+      setIsLoading(false);
+      return true;
+    }
+    return false;
+  };
+
   const pollTaskStatus = async (taskId: string) => {
     let isRequestInFlight = false;
     const interval = setInterval(async () => {
@@ -32,8 +117,6 @@ export function useTranscribeApi() {
         return; // Avoid overlapping polls
       }
       isRequestInFlight = true;
-      const { cinematicStage } = useTranscribeStore.getState();
-      let rawTranscriptReceived = false;
 
       try {
         const response = await fetch(`${apiBase}/api/tasks/${taskId}`);
@@ -43,73 +126,7 @@ export function useTranscribeApi() {
         }
 
         const data = await response.json();
-
-        // Reflect backend progress/message when available
-        if (typeof data.progress === 'number') {
-          useTranscribeStore.setState({ progress: data.progress });
-        }
-        if (typeof data.message === 'string' && data.message.length > 0) {
-          useTranscribeStore.setState({ progressMessage: data.message });
-        }
-
-        const result = data.result;
-        // Consider RAW ready if raw_segments exist and we are still in TRANSCRIBING stage
-        const shouldIngestRaw = (
-          cinematicStage === 'TRANSCRIBING' &&
-          result && Array.isArray(result.raw_segments) &&
-          useTranscribeStore.getState().transcriptionSegments.length === 0
-        );
-        if (shouldIngestRaw) {
-          rawTranscriptReceived = true;
-          const transcriptionSegments = result.raw_segments || [];
-          const rawFormatted = transcriptionSegments.map(
-            (seg: { text: string }) => seg.text.trim()
-          ).join(' ');
-          setTranscription(rawFormatted, transcriptionSegments);
-          setTranscriptionId(result.transcription_id);
-          if (result.transcription_id) {
-            fetchAndSetAudioUrl(result.transcription_id);
-          }
-      advanceCinematicStage();
-        }
-
-        // If the backend now includes a transcription_id and we don't have one yet, set it and fetch audio
-        if (
-          result && result.transcription_id && !useTranscribeStore.getState().transcriptionId
-        ) {
-          setTranscriptionId(result.transcription_id);
-          fetchAndSetAudioUrl(result.transcription_id);
-        }
-
-        if (data.status === "SUCCESS") {
-          const result = data.result;
-          // Defensive: ensure raw transcript is set even if intermediate event was missed
-          if (result.raw_segments && useTranscribeStore.getState().transcriptionSegments.length === 0) {
-            const rawFormatted = result.raw_segments.map((seg: { text: string }) => seg.text.trim()).join(' ');
-            setTranscription(rawFormatted, result.raw_segments);
-          }
-          // Ensure audio is available once the transcription_id exists
-          if (result.transcription_id && !useTranscribeStore.getState().transcriptionId) {
-            setTranscriptionId(result.transcription_id);
-            fetchAndSetAudioUrl(result.transcription_id);
-          }
-          const processedSegments = result.processed_segments || [];
-          const processedFormatted = processedSegments.map(
-              (seg: { speaker: string, text: string }) => `${seg.speaker.replace(/\[|\]/g, '')}: ${seg.text.trim()}`
-          ).join('\n');
-          setProcessedTranscription(processedFormatted, processedSegments);
-          // Keep success message visible for a moment before hiding loader
-          useTranscribeStore.setState({ progress: 100, progressMessage: 'Transcription completed successfully.' });
-          setTimeout(() => {
-            setIsLoading(false);
-            useTranscribeStore.setState({ cinematicStage: 'DONE' });
-            clearInterval(interval);
-          }, 1200);
-        } else if (data.status === "ERROR") {
-          clearInterval(interval);
-          setError(data.message);
-          setIsLoading(false);
-        }
+        applyTaskUpdate(data, () => clearInterval(interval));
 
       } catch (error) {
         console.error(error);
@@ -122,6 +139,37 @@ export function useTranscribeApi() {
     }, 500);
   };
 
+  // Subscribes to pushed task updates; falls back to polling if the stream can't be used.
+  const streamTaskStatus = (taskId: string) => {
+    const eventSource = new EventSource(`${apiBase}/api/tasks/${taskId}/events`);
+    let finished = false;
+    let lastResult: any = null;
+
+    eventSource.addEventListener('task_update', (e: MessageEvent) => {
+      const data = JSON.parse(e.data);
+      // The server omits `result` when it hasn't changed since the previous event.
+      if (data.result === undefined) {
+        data.result = lastResult;
+      } else {
+        lastResult = data.result;
+      }
+      finished = applyTaskUpdate(data, () => eventSource.close()) || finished;
+    });
+
+    eventSource.addEventListener('stream_end', () => {
+      finished = true;
+      eventSource.close();
+    });
+
+    eventSource.onerror = (err) => {
+      eventSource.close();
+      if (!finished) {
+        console.warn("Task event stream failed, falling back to polling:", err);
+        pollTaskStatus(taskId);
+      }
+    };
+  };
+
   const handleSubmit = async () => {
     startCinematicExperience();
 
@@ -145,7 +193,7 @@ export function useTranscribeApi() {
 
       const result = await response.json();
       if (result.task_id) {
-        await pollTaskStatus(result.task_id);
+        streamTaskStatus(result.task_id);
       } else {
         throw new Error("Did not receive a task ID from the server.");
       }
@@ -188,17 +236,27 @@ export function useTranscribeApi() {
     }
   };
 
+  // Fetches one page of the history list; the backend returns the cursor for
+  // the next page in the X-Next-Cursor header.
+  const fetchHistoryPage = async (cursor: string | null) => {
+    const params = new URLSearchParams();
+    if (cursor) params.set("cursor", cursor);
+    const query = params.toString();
+    const response = await fetch(`${apiBase}/api/transcriptions${query ? `?${query}` : ""}`);
+    if (!response.ok) {
+      const err = await response.json();
+      throw new Error(err.detail || "Failed to fetch transcription history.");
+    }
+    const data: TranscriptionItem[] = await response.json();
+    return { data, nextCursor: response.headers.get("X-Next-Cursor") };
+  };
+
   const getHistory = useCallback(async () => {
     setIsLoading(true);
     setError("");
     try {
-      const response = await fetch(`${apiBase}/api/transcriptions`);
-      if (!response.ok) {
-        const err = await response.json();
-        throw new Error(err.detail || "Failed to fetch transcription history.");
-      }
-      const data: TranscriptionItem[] = await response.json();
-      setHistory(data);
+      const { data, nextCursor } = await fetchHistoryPage(null);
+      setHistory(data, nextCursor);
     } catch (err: any) {
       setError(err.message);
     } finally {
@@ -206,5 +264,20 @@ export function useTranscribeApi() {
     }
   }, [setIsLoading, setError, setHistory, setAudioUrl, setTranscription, setProcessedTranscription, setTranscriptionId]);
 
-  return { handleSubmit, handleCorrectCompanyName, getHistory };
+  const loadMoreHistory = useCallback(async () => {
+    const { historyCursor } = useTranscribeStore.getState();
+    if (!historyCursor) return;
+    setIsLoading(true);
+    setError("");
+    try {
+      const { data, nextCursor } = await fetchHistoryPage(historyCursor);
+      appendHistory(data, nextCursor);
+    } catch (err: any) {
+      setError(err.message);
+    } finally {
+      setIsLoading(false);
+    }
+  }, [setIsLoading, setError, appendHistory]);
+
+  return { handleSubmit, handleCorrectCompanyName, getHistory, loadMoreHistory };
 }
\ No newline at end of file
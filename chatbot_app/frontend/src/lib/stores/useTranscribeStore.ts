@@ -41,6 +41,7 @@ interface TranscribeState {
   cinematicStage: CinematicStage;
   cinematicMessages: string[];
   history: TranscriptionItem[];
+  historyCursor: string | null;
   seekToTime: number | null;
   currentTime: number;
   hasPlaybackStarted: boolean;
@@ -61,7 +62,8 @@ interface TranscribeState {
   setError: (error: string) => void;
   startCinematicExperience: () => void;
   advanceCinematicStage: () => void;
-  setHistory: (history: TranscriptionItem[]) => void;
+  setHistory: (history: TranscriptionItem[], nextCursor?: string | null) => void;
+  appendHistory: (items: TranscriptionItem[], nextCursor: string | null) => void;
   setSeekToTime: (time: number | null) => void;
   setCurrentTime: (time: number) => void;
   setHasPlaybackStarted: (started: boolean) => void;
@@ -89,6 +91,7 @@ const initialState = {
   cinematicStage: 'DONE' as CinematicStage,
   cinematicMessages: [],
   history: [],
+  historyCursor: null,
   seekToTime: null,
   currentTime: 0,
   hasPlaybackStarted: false,
@@ -190,7 +193,11 @@ export const useTranscribeStore = create<TranscribeState>()((set) => ({
     }
     return {};
   }),
-  setHistory: (history) => set({ history }),
+  setHistory: (history, nextCursor = null) => set({ history, historyCursor: nextCursor }),
+  appendHistory: (items, nextCursor) => set(state => ({
+    history: [...state.history, ...items],
+    historyCursor: nextCursor,
+  })),
   setSeekToTime: (time) => set({ seekToTime: time }),
   setCurrentTime: (time) => set({ currentTime: time }),
   setHasPlaybackStarted: (started) => set({ hasPlaybackStarted: started }),
@@ -199,6 +206,7 @@ export const useTranscribeStore = create<TranscribeState>()((set) => ({
     ...initialState,
     cinematicStage: 'DONE' as CinematicStage,
     // Preserve history across resets
-    history: state.history
+    history: state.history,
+    historyCursor: state.historyCursor,
   })),
 }));
\ No newline at end of file
@@ -21,6 +21,8 @@ PROCESSED_DIR = OUTPUT_DIR / "processed"
 OPENAI_TRANSCRIPTIONS_DIR = OUTPUT_DIR / "openai_transcriptions"
 BATCHES_DIR = CUSTOMER_JOURNEY_POC_DIR / "batches"
 BATCH_SUMMARIES_DIR = CUSTOMER_JOURNEY_POC_DIR / "batch_summaries"
+# Content-addressed cache of embedding vectors, keyed by (model, sha256 of the text).
+EMBEDDINGS_CACHE_PATH = OUTPUT_DIR / "embeddings_cache.sqlite3"
 
 # --- Logs ---
 LOGS_DIR = OUTPUT_DIR / "logs"
@@ -0,0 +1,187 @@
+"""
+Embedding throughput against a local fake of /v1/embeddings: the old one
+request per row loop vs. scripts.pipeline.embeddings.BatchEmbedder on a cold
+cache, on an unchanged rerun, and on a rerun with some transcripts edited.
+
+The fake answers after a fixed per-request latency plus a per-token cost,
+rejects empty inputs and inputs above 8191 tokens with HTTP 400 like the
+real endpoint, and returns deterministic vectors, so the outputs of all runs
+can be compared.
+
+Usage:
+python data_pipelines/scripts/bench_embeddings.py --transcripts 300
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import hashlib
+import json
+import random
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import List, Optional
+
+import httpx
+import numpy as np
+import openai
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from data_pipelines.scripts.pipeline.embeddings import MAX_INPUT_TOKENS, BatchEmbedder, EmbeddingCache  # noqa: E402
+
+DIMENSIONS = 1536
+WORDS = "ja also genau termin angebot kunde rückruf woche preis vertrag heute morgen gerne danke natürlich".split()
+
+
+def fake_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+def fake_vector(text: str) -> np.ndarray:
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(DIMENSIONS).astype("float32")
+    return vector / np.linalg.norm(vector)
+
+
+def make_server(base_latency: float, per_token_seconds: float) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _reply(self, status: int, payload: dict):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            inputs = request["input"] if isinstance(request["input"], list) else [request["input"]]
+            with server.lock:
+                server.requests += 1
+            if not all(isinstance(text, str) and text for text in inputs):
+                self._reply(400, {"error": {"message": "'$.input' is invalid.", "type": "invalid_request_error", "param": None, "code": None}})
+                return
+            tokens = [fake_tokens(text) for text in inputs]
+            time.sleep(base_latency + sum(tokens) * per_token_seconds)
+            too_long = [i for i, count in enumerate(tokens) if count > MAX_INPUT_TOKENS]
+            if too_long:
+                self._reply(400, {"error": {
+                    "message": f"This model's maximum context length is {MAX_INPUT_TOKENS} tokens (input {too_long[0]}).",
+                    "type": "invalid_request_error", "param": None, "code": None,
+                }})
+                return
+            data = []
+            for index, text in enumerate(inputs):
+                vector = fake_vector(text)
+                embedding = base64.b64encode(vector.tobytes()).decode() if request.get("encoding_format") == "base64" else vector.tolist()
+                data.append({"object": "embedding", "index": index, "embedding": embedding})
+            self._reply(200, {
+                "object": "list", "data": data, "model": request["model"],
+                "usage": {"prompt_tokens": sum(tokens), "total_tokens": sum(tokens)},
+            })
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.requests = 0
+    return server
+
+
+def make_corpus(count: int, rng: random.Random) -> List[Optional[str]]:
+    """Transcripts of roughly 300-6000 tokens, plus the odd duplicate, empty and too-long one."""
+    texts: List[Optional[str]] = []
+    for i in range(count):
+        length = rng.randint(300, 6000) * 4
+        words: List[str] = []
+        while sum(len(w) + 1 for w in words) < length:
+            words.append(rng.choice(WORDS))
+        texts.append(f"Call {i}: " + " ".join(words))
+    for i in range(0, count, 20):
+        texts[i + 1] = texts[i]
+    texts[3] = ""
+    texts[7] = None
+    texts[11] = "zu lang " * (MAX_INPUT_TOKENS * 4 // 8 + 500)
+    return texts
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--transcripts", type=int, default=300)
+    ap.add_argument("--base-latency", type=float, default=0.15, help="Fake server seconds per request")
+    ap.add_argument("--per-token-us", type=float, default=2.0, help="Fake server microseconds per input token")
+    ap.add_argument("--max-workers", type=int, default=8)
+    ap.add_argument("--batch-tokens", type=int, default=100_000)
+    ap.add_argument("--requests-per-minute", type=int, default=3000)
+    ap.add_argument("--tokens-per-minute", type=int, default=0)
+    ap.add_argument("--edited", type=float, default=0.1, help="Share of transcripts changed before the last rerun")
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+
+    rng = random.Random(args.seed)
+    texts = make_corpus(args.transcripts, rng)
+    server = make_server(args.base_latency, args.per_token_us / 1e6)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = openai.OpenAI(
+        api_key="bench", base_url=f"http://127.0.0.1:{server.server_address[1]}/v1", http_client=httpx.Client(timeout=120), max_retries=0
+    )
+    total_tokens = sum(fake_tokens(t) for t in texts if t)
+    print(f"[bench] {len(texts)} transcripts, ~{total_tokens / 1000:.0f}k tokens", flush=True)
+
+    def report(name: str, seconds: float, requests: int, extra: str = ""):
+        print(f"[bench] {name:<22} {seconds:6.2f}s  {len(texts) / seconds:7.1f} transcripts/s  {requests:4d} requests {extra}", flush=True)
+
+    # The loop the embedding steps used before: one request per row, in order.
+    before = server.requests
+    t0 = time.perf_counter()
+    baseline = []
+    for text in texts:
+        try:
+            baseline.append(client.embeddings.create(model="text-embedding-3-small", input=text).data[0].embedding)
+        except Exception:
+            baseline.append(None)
+    serial_seconds = time.perf_counter() - t0
+    report("per-row (before)", serial_seconds, server.requests - before)
+
+    cache = EmbeddingCache(Path(tempfile.mkdtemp(prefix="bench_embeddings_")) / "cache.sqlite3")
+
+    def run(name: str, corpus: List[Optional[str]]):
+        embedder = BatchEmbedder(
+            client=client, cache=cache, max_workers=args.max_workers, max_batch_tokens=args.batch_tokens,
+            requests_per_minute=args.requests_per_minute, tokens_per_minute=args.tokens_per_minute,
+        )
+        before = server.requests
+        t0 = time.perf_counter()
+        vectors = embedder.embed(corpus, desc=name)
+        seconds = time.perf_counter() - t0
+        report(name, seconds, server.requests - before, f"({serial_seconds / seconds:.0f}x) | {embedder.summary()}")
+        return vectors
+
+    cold = run("batched, cold cache", texts)
+    mismatches = sum(
+        1 for a, b in zip(baseline, cold)
+        if (a is None) != (b is None) or (a is not None and not np.allclose(a, b, atol=1e-6))
+    )
+    print(f"[bench] vectors differing from the per-row run: {mismatches}", flush=True)
+    assert mismatches == 0
+    warm = run("batched, rerun", texts)
+    assert warm == cold
+
+    edited = list(texts)
+    for i in rng.sample(range(20, len(texts)), int(len(texts) * args.edited)):
+        edited[i] = edited[i] + " Nachtrag."
+    run(f"batched, {args.edited:.0%} edited", edited)
+    cache.close()
+    server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
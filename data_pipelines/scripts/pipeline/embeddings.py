@@ -0,0 +1,285 @@
+"""
+Batched, concurrent embeddings with a local cache, shared by the embedding
+steps (4_embed_transcripts, 4b_embed_journeys).
+
+Texts are grouped into requests bounded by token count and input count, the
+requests run on a thread pool under a requests/tokens-per-minute limiter, and
+every vector is stored in a SQLite file keyed by (model, sha256 of the text),
+so a rerun only pays for texts that changed.
+"""
+import argparse
+import hashlib
+import sqlite3
+import threading
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import openai
+from tqdm import tqdm
+
+from data_pipelines import config
+
+try:
+    import tiktoken
+except ImportError:  # optional; token counts are estimated without it
+    tiktoken = None
+
+DEFAULT_MODEL = "text-embedding-3-small"
+
+# Limits of the /v1/embeddings endpoint: tokens per input, inputs per request.
+MAX_INPUT_TOKENS = 8191
+MAX_BATCH_INPUTS = 2048
+# Well below the 300k tokens the API accepts per request, so a large run
+# still splits into enough requests to keep the workers busy.
+DEFAULT_BATCH_TOKENS = 100_000
+DEFAULT_MAX_WORKERS = 8
+# Tier 1 limits for text-embedding-3-small.
+DEFAULT_REQUESTS_PER_MINUTE = 3000
+DEFAULT_TOKENS_PER_MINUTE = 1_000_000
+
+_encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """cl100k_base token count (the encoding of the text-embedding-3 models), or a conservative estimate without tiktoken."""
+    global _encoding
+    if tiktoken is None:
+        return len(text) // 2 + 1
+    if _encoding is None:
+        _encoding = tiktoken.get_encoding("cl100k_base")
+    return len(_encoding.encode(text, disallowed_special=()))
+
+
+def text_digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Embedding vectors in a local SQLite file, keyed by (model, sha256 of the text)."""
+
+    def __init__(self, path: Path = config.EMBEDDINGS_CACHE_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path))
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL, text_sha256 TEXT NOT NULL, vector BLOB NOT NULL,"
+            " PRIMARY KEY (model, text_sha256)) WITHOUT ROWID"
+        )
+        self._conn.commit()
+
+    def get_many(self, model: str, digests: Iterable[str]) -> Dict[str, List[float]]:
+        digests = list(digests)
+        found: Dict[str, List[float]] = {}
+        for start in range(0, len(digests), 500):
+            chunk = digests[start:start + 500]
+            rows = self._conn.execute(
+                f"SELECT text_sha256, vector FROM embeddings WHERE model = ? AND text_sha256 IN ({','.join('?' * len(chunk))})",
+                [model, *chunk],
+            )
+            for digest, blob in rows:
+                found[digest] = array("d", blob).tolist()
+        return found
+
+    def put_many(self, model: str, vectors: Dict[str, List[float]]):
+        # Stored as float64 so cached vectors are identical to the ones the API returned.
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (model, text_sha256, vector) VALUES (?, ?, ?)",
+            [(model, digest, array("d", vector).tobytes()) for digest, vector in vectors.items()],
+        )
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+
+class RateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute budgets shared by worker threads
+    (0 disables a budget). Both refill continuously; a request larger than the
+    whole token budget waits for a full bucket instead of forever.
+    """
+
+    def __init__(self, requests_per_minute: int = 0, tokens_per_minute: int = 0):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._requests = float(requests_per_minute)
+        self._tokens = float(tokens_per_minute)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int) -> float:
+        """Blocks until one request of ``tokens`` tokens fits both budgets; returns the seconds waited."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                elapsed, self._updated = now - self._updated, now
+                self._requests = min(self.requests_per_minute, self._requests + elapsed * self.requests_per_minute / 60)
+                self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60)
+                needed = min(tokens, self.tokens_per_minute)
+                wait = 0.0
+                if self.requests_per_minute and self._requests < 1:
+                    wait = (1 - self._requests) * 60 / self.requests_per_minute
+                if self.tokens_per_minute and self._tokens < needed:
+                    wait = max(wait, (needed - self._tokens) * 60 / self.tokens_per_minute)
+                if wait == 0.0:
+                    if self.requests_per_minute:
+                        self._requests -= 1
+                    if self.tokens_per_minute:
+                        self._tokens -= needed
+                    return waited
+            time.sleep(wait)
+            waited += wait
+
+    def refund(self, tokens: int):
+        """Returns tokens charged by ``acquire`` that the request did not use (token counts may be estimates)."""
+        if self.tokens_per_minute and tokens > 0:
+            with self._lock:
+                self._tokens = min(self.tokens_per_minute, self._tokens + tokens)
+
+
+class BatchEmbedder:
+    """
+    Embeds a list of texts with as few, as concurrent requests as the limits
+    allow. Identical texts are embedded once, cached texts not at all. Texts
+    that are empty or that the API rejects get None, as the per-row
+    ``get_embedding`` it replaces did.
+    """
+
+    def __init__(
+        self,
+        model: str = DEFAULT_MODEL,
+        client=None,
+        cache: Optional[EmbeddingCache] = None,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        max_batch_tokens: int = DEFAULT_BATCH_TOKENS,
+        max_batch_inputs: int = MAX_BATCH_INPUTS,
+        requests_per_minute: int = DEFAULT_REQUESTS_PER_MINUTE,
+        tokens_per_minute: int = DEFAULT_TOKENS_PER_MINUTE,
+    ):
+        self.model = model
+        self.client = client or openai.OpenAI()
+        self.cache = cache
+        self.max_workers = max(1, max_workers)
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_inputs = max(1, min(max_batch_inputs, MAX_BATCH_INPUTS))
+        self.limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        self.stats = {"texts": 0, "unique": 0, "cached": 0, "embedded": 0, "failed": 0, "requests": 0, "tokens": 0, "rate_limit_wait_seconds": 0.0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, **deltas):
+        with self._stats_lock:
+            for key, value in deltas.items():
+                self.stats[key] += value
+
+    def _batches(self, items: List[Tuple[str, str, int]]) -> List[List[Tuple[str, str, int]]]:
+        """Greedy packing in input order; an input above the token budget gets a request of its own."""
+        batches: List[List[Tuple[str, str, int]]] = []
+        current: List[Tuple[str, str, int]] = []
+        current_tokens = 0
+        for item in items:
+            if current and (current_tokens + item[2] > self.max_batch_tokens or len(current) >= self.max_batch_inputs):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(item)
+            current_tokens += item[2]
+        if current:
+            batches.append(current)
+        return batches
+
+    def _embed_batch(self, batch: List[Tuple[str, str, int]]) -> Dict[str, List[float]]:
+        estimated = sum(tokens for _, _, tokens in batch)
+        waited = self.limiter.acquire(estimated)
+        self._count(requests=1, rate_limit_wait_seconds=waited)
+        try:
+            response = self.client.embeddings.create(model=self.model, input=[text for _, text, _ in batch])
+        except openai.BadRequestError as e:
+            # One bad input (usually too long) fails the whole request; split to isolate it.
+            if len(batch) == 1:
+                print(f"An error occurred during embedding: {e}")
+                self._count(failed=1)
+                return {}
+            middle = len(batch) // 2
+            return {**self._embed_batch(batch[:middle]), **self._embed_batch(batch[middle:])}
+        except Exception as e:
+            # The client has already retried rate limits and server errors.
+            print(f"An error occurred during embedding of {len(batch)} texts: {e}")
+            self._count(failed=len(batch))
+            return {}
+        if response.usage is not None:
+            self.limiter.refund(estimated - response.usage.total_tokens)
+            self._count(tokens=response.usage.total_tokens)
+        return {batch[item.index][0]: list(item.embedding) for item in response.data}
+
+    def embed(self, texts: List[Optional[str]], desc: str = "Generating embeddings") -> List[Optional[List[float]]]:
+        digests: List[Optional[str]] = []
+        unique: Dict[str, str] = {}
+        for text in texts:
+            if not isinstance(text, str) or not text.strip():
+                digests.append(None)
+                continue
+            digest = text_digest(text)
+            digests.append(digest)
+            unique.setdefault(digest, text)
+
+        vectors = self.cache.get_many(self.model, unique) if self.cache else {}
+        self._count(texts=len(texts), unique=len(unique), cached=len(vectors))
+        pending = []
+        for digest, text in unique.items():
+            if digest in vectors:
+                continue
+            tokens = count_tokens(text)
+            if tiktoken is not None and tokens > MAX_INPUT_TOKENS:
+                # Exact count, so the API would reject it; don't pay for that request on every run.
+                print(f"Skipping a text of {tokens} tokens; the model accepts at most {MAX_INPUT_TOKENS}.")
+                self._count(failed=1)
+                continue
+            pending.append((digest, text, tokens))
+
+        batches = self._batches(pending)
+        if batches:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(batches))) as ex, tqdm(total=len(pending), desc=desc) as bar:
+                futures = {ex.submit(self._embed_batch, batch): batch for batch in batches}
+                for future in as_completed(futures):
+                    fresh = future.result()
+                    # Written as each request finishes, so an interrupted run keeps what it paid for.
+                    if self.cache and fresh:
+                        self.cache.put_many(self.model, fresh)
+                    vectors.update(fresh)
+                    self._count(embedded=len(fresh))
+                    bar.update(len(futures[future]))
+        return [vectors.get(digest) if digest else None for digest in digests]
+
+    def summary(self) -> str:
+        s = self.stats
+        return (
+            f"{s['texts']} texts ({s['unique']} unique): {s['cached']} from cache, {s['embedded']} embedded, "
+            f"{s['failed']} failed | {s['requests']} requests, {s['tokens']} tokens, "
+            f"{s['rate_limit_wait_seconds']:.1f}s waiting for the rate limit"
+        )
+
+
+def add_embedding_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="Embedding model.")
+    parser.add_argument("--max_workers", type=int, default=DEFAULT_MAX_WORKERS, help="Concurrent embedding requests.")
+    parser.add_argument("--batch_tokens", type=int, default=DEFAULT_BATCH_TOKENS, help="Maximum tokens per embedding request.")
+    parser.add_argument("--requests_per_minute", type=int, default=DEFAULT_REQUESTS_PER_MINUTE, help="Request rate limit (0 = none).")
+    parser.add_argument("--tokens_per_minute", type=int, default=DEFAULT_TOKENS_PER_MINUTE, help="Token rate limit (0 = none).")
+    parser.add_argument("--cache_path", default=str(config.EMBEDDINGS_CACHE_PATH), help="SQLite file caching vectors by (model, text hash).")
+    parser.add_argument("--no_cache", action="store_true", help="Embed every text again without reading or writing the cache.")
+
+
+def embedder_from_args(args: argparse.Namespace) -> BatchEmbedder:
+    return BatchEmbedder(
+        model=args.model,
+        cache=None if args.no_cache else EmbeddingCache(Path(args.cache_path)),
+        max_workers=args.max_workers,
+        max_batch_tokens=args.batch_tokens,
+        requests_per_minute=args.requests_per_minute,
+        tokens_per_minute=args.tokens_per_minute,
+    )
@@ -2,10 +2,12 @@ import os
 import glob
 import json
 import pandas as pd
-import openai
-from tqdm import tqdm
 import argparse
+import sys
 from dotenv import load_dotenv
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..', '..')))
+from data_pipelines.scripts.pipeline.embeddings import add_embedding_arguments, embedder_from_args
 from datetime import datetime
 
 # Load environment variables from .env file
@@ -16,19 +18,6 @@ if "OPENAI_API_KEY" not in os.environ:
     print("OPENAI_API_KEY environment variable not found.")
     os.environ["OPENAI_API_KEY"] = input("Please enter your OpenAI API key: ")
 
-openai.api_key = os.environ["OPENAI_API_KEY"]
-
-def get_embedding(text):
-    try:
-        response = openai.embeddings.create(
-            model="text-embedding-3-small",
-            input=text
-        )
-        return response.data[0].embedding
-    except Exception as e:
-        print(f"An error occurred during embedding: {e}")
-        return None
-
 def main():
     parser = argparse.ArgumentParser(description="Generate embeddings for processed transcripts.")
     parser.add_argument(
@@ -52,6 +41,7 @@ def main():
         default=None,
         help="Limit the number of customer journeys to process."
     )
+    add_embedding_arguments(parser)
     args = parser.parse_args()
 
     # --- 2. Load Transcripts ---
@@ -147,8 +137,9 @@ def main():
     # --- 3. Generate Embeddings ---
     print(f"Found {len(df)} items to embed.")
 
-    tqdm.pandas(desc="Generating embeddings")
-    df['embedding'] = df[embedding_column].progress_apply(get_embedding)
+    embedder = embedder_from_args(args)
+    df['embedding'] = embedder.embed(df[embedding_column].tolist(), desc="Generating embeddings")
+    print(embedder.summary())
 
     # --- 4. Save Results ---
     df.to_csv(args.output_file, index=False)
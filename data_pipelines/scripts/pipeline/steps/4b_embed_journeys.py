@@ -2,11 +2,13 @@ import os
 import glob
 import json
 import pandas as pd
-import openai
-from tqdm import tqdm
 import argparse
+import sys
 from dotenv import load_dotenv
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..', '..')))
+from data_pipelines.scripts.pipeline.embeddings import add_embedding_arguments, embedder_from_args
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -15,19 +17,6 @@ if "OPENAI_API_KEY" not in os.environ:
     print("OPENAI_API_KEY environment variable not found.")
     os.environ["OPENAI_API_KEY"] = input("Please enter your OpenAI API key: ")
 
-openai.api_key = os.environ["OPENAI_API_KEY"]
-
-def get_embedding(text):
-    try:
-        response = openai.embeddings.create(
-            model="text-embedding-3-small",
-            input=text
-        )
-        return response.data[0].embedding
-    except Exception as e:
-        print(f"An error occurred during embedding: {e}")
-        return None
-
 def main():
     parser = argparse.ArgumentParser(description="Generate embeddings for customer journeys.")
     parser.add_argument(
@@ -40,6 +29,7 @@ def main():
         default='output/journeys_with_embeddings.csv', 
         help="Path to save the final CSV file with journey embeddings."
     )
+    add_embedding_arguments(parser)
     args = parser.parse_args()
 
     # --- 2. Load and Aggregate Transcripts by Journey ---
@@ -77,8 +67,9 @@ def main():
     # --- 3. Generate Embeddings for Journeys ---
     print(f"Found {len(df)} customer journeys to embed.")
 
-    tqdm.pandas(desc="Generating journey embeddings")
-    df['embedding'] = df['full_journey'].progress_apply(get_embedding)
+    embedder = embedder_from_args(args)
+    df['embedding'] = embedder.embed(df['full_journey'].tolist(), desc="Generating journey embeddings")
+    print(embedder.summary())
 
     # --- 4. Save Results ---
     df.to_csv(args.output_file, index=False)
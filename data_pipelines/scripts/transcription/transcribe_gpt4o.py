@@ -425,9 +425,12 @@ def _append_log(log_path: str, row: dict) -> None:
 
 
 def _preprocess_audio(in_path: str, out_path: str, resample_hz: int, mono_channels: int,
-                      trim_sec: float | None, trim_db: float | None) -> str:
-    """Re-encode to PCM 16-bit with resample/mono and optional reverse tail-trim.
+                      trim_sec: float | None, trim_db: float | None,
+                      codec: str = "pcm", bitrate_kbps: int = 24) -> str:
+    """Re-encode with resample/mono and optional reverse tail-trim.
 
+    codec "pcm" writes 16-bit PCM (WAV); "opus" writes Opus/OGG at bitrate_kbps,
+    which is a fraction of the size for upload and the API request.
     If trim_sec/trim_db provided, uses the robust reverse+silenceremove method.
     Returns path to processed file (out_path).
     """
@@ -435,10 +438,14 @@ def _preprocess_audio(in_path: str, out_path: str, resample_hz: int, mono_channe
     base_cmd = [
         "ffmpeg", "-y", "-nostdin", "-hide_banner", "-loglevel", "error",
         "-i", in_path,
+        "-vn",
         "-ar", str(resample_hz),
         "-ac", str(mono_channels),
-        "-c:a", "pcm_s16le",
     ]
+    if codec == "opus":
+        base_cmd += ["-c:a", "libopus", "-b:a", f"{bitrate_kbps}k", "-application", "voip", "-f", "ogg"]
+    else:
+        base_cmd += ["-c:a", "pcm_s16le"]
     if trim_sec and trim_db:
         af = f"areverse,silenceremove=start_periods=1:start_duration={trim_sec}:start_threshold={trim_db}dB,areverse"
         base_cmd += ["-af", af]
@@ -756,6 +763,8 @@ def main(argv: Optional[List[str]] = None) -> int:
     parser.add_argument("--pp-mono", type=int, default=1, help="Preprocess channels (default 1)")
     parser.add_argument("--pp-trim-sec", type=float, default=0.5, help="Tail trim duration seconds (reverse trim). 0 to disable")
     parser.add_argument("--pp-trim-db", type=float, default=-55.0, help="Tail trim threshold dB (e.g., -50 .. -60)")
+    parser.add_argument("--pp-codec", choices=["pcm", "opus"], default="pcm", help="Preprocess output codec: 16-bit WAV (default) or compact Opus/OGG")
+    parser.add_argument("--pp-bitrate-kbps", type=int, default=24, help="Opus bitrate in kbps when --pp-codec opus (default 24)")
     # Tail guard (for responses that include segment confidences such as whisper-1 verbose_json)
     parser.add_argument("--tail-guard", action="store_true", help="Drop last segment if confidence indicates no speech")
     parser.add_argument("--tg-max-no-speech", type=float, default=0.8, help="Drop if last.no_speech_prob >= this")
@@ -974,13 +983,15 @@ def main(argv: Optional[List[str]] = None) -> int:
             proc_path = tmp_path
             if args.preprocess:
                 try:
-                    outp = os.path.join(td, "proc.wav")
+                    outp = os.path.join(td, "proc.ogg" if args.pp_codec == "opus" else "proc.wav")
                     trim_sec = args.pp_trim_sec if args.pp_trim_sec and args.pp_trim_sec > 0 else None
                     proc_path = _preprocess_audio(
-                        tmp_path, outp, args.pp_sr, args.pp_mono, trim_sec, args.pp_trim_db
+                        tmp_path, outp, args.pp_sr, args.pp_mono, trim_sec, args.pp_trim_db,
+                        codec=args.pp_codec, bitrate_kbps=args.pp_bitrate_kbps,
                     )
                 except Exception as e:
                     proc_path = tmp_path
+            processed_size_bytes = os.path.getsize(proc_path) if proc_path != tmp_path else None
 
             api_t0 = time.perf_counter()
 
@@ -1139,6 +1150,7 @@ def main(argv: Optional[List[str]] = None) -> int:
                 "b2_key": key,
                 "output_path": (out_json_path if not args.no_local_save else (f"s3://{bucket}/{b2_transcript_key}" if b2_transcript_key else out_json_path)),
                 "size_bytes": size_bytes,
+                "processed_size_bytes": processed_size_bytes,
                 "wall_ms_total": round((t1 - t0) * 1000, 2),
                 "wall_ms_api": round((api_t1 - api_t0) * 1000, 2),
                 "status": "ok" if (data is not None and err_msg is None) else "error",
@@ -1181,6 +1193,7 @@ def main(argv: Optional[List[str]] = None) -> int:
                         "b2_transcript_json_key": b2_transcript_key,
                         "b2_transcript_txt_key": b2_transcript_txt_key,
                         "size_bytes": size_bytes,
+                        "processed_size_bytes": processed_size_bytes,
                         "wall_ms_total": row.get("wall_ms_total"),
                         "wall_ms_api": row.get("wall_ms_api"),
                         "error": err_msg,